@@ -7,6 +7,7 @@ from alembic import context
 from app.database import Base
 from app.models import *  # Import all models
 from app.config import settings
+from app.core.sharding import database_urls
 
 config = context.config
 config.set_main_option("sqlalchemy.url", settings.database_url)
@@ -16,8 +17,19 @@ if config.config_file_name is not None:
 
 target_metadata = Base.metadata
 
+def target_urls() -> list:
+    """Databases to migrate: every one in turn (the directory, then each of
+    SHARD_URLS), or just ``-x shard=N`` / ``-x shard=directory``"""
+    shard = context.get_x_argument(as_dictionary=True).get("shard")
+    if shard is None:
+        return database_urls()
+    if shard == "directory":
+        return [settings.database_url]
+    return [settings.shard_urls[int(shard)]]
+
 def run_migrations_offline() -> None:
-    url = config.get_main_option("sqlalchemy.url")
+    # Every database has the same schema; the script is the same for all
+    url = target_urls()[0]
     context.configure(
         url=url,
         target_metadata=target_metadata,
@@ -35,16 +47,18 @@ def do_run_migrations(connection: Connection) -> None:
         context.run_migrations()
 
 async def run_async_migrations() -> None:
-    connectable = async_engine_from_config(
-        config.get_section(config.config_ini_section, {}),
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
+    for url in target_urls():
+        connectable = async_engine_from_config(
+            config.get_section(config.config_ini_section, {}),
+            prefix="sqlalchemy.",
+            poolclass=pool.NullPool,
+            url=url,
+        )
 
-    async with connectable.connect() as connection:
-        await connection.run_sync(do_run_migrations)
+        async with connectable.connect() as connection:
+            await connection.run_sync(do_run_migrations)
 
-    await connectable.dispose()
+        await connectable.dispose()
 
 def run_migrations_online() -> None:
     asyncio.run(run_async_migrations())
@@ -0,0 +1,43 @@
+"""add_sync_tombstones
+
+Revision ID: c3e9a1f4d2b7
+Revises: 5a1775e4aedf
+Create Date: 2026-10-19 09:12:41.503218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e9a1f4d2b7'
+down_revision: Union[str, Sequence[str], None] = '5a1775e4aedf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity_type', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('created_by_user_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['created_by_user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tombstones_user_created_at', 'tombstones', ['created_by_user_id', 'created_at'], unique=False)
+    op.create_index('ix_tasks_user_updated_at', 'tasks', ['created_by_user_id', 'updated_at'], unique=False)
+    op.create_index('ix_categories_user_updated_at', 'categories', ['created_by_user_id', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_categories_user_updated_at', table_name='categories')
+    op.drop_index('ix_tasks_user_updated_at', table_name='tasks')
+    op.drop_index('ix_tombstones_user_created_at', table_name='tombstones')
+    op.drop_table('tombstones')
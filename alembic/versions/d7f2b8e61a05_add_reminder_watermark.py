@@ -0,0 +1,38 @@
+"""add_reminder_watermark
+
+Revision ID: d7f2b8e61a05
+Revises: c3e9a1f4d2b7
+Create Date: 2026-10-19 11:02:17.284611
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7f2b8e61a05'
+down_revision: Union[str, Sequence[str], None] = 'c3e9a1f4d2b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('watermarks',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('value', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_index('ix_tasks_completed_due_date', 'tasks', ['is_completed', 'due_date'], unique=False)
+    op.create_index('ix_tasks_completed_updated_at', 'tasks', ['is_completed', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_completed_updated_at', table_name='tasks')
+    op.drop_index('ix_tasks_completed_due_date', table_name='tasks')
+    op.drop_table('watermarks')
@@ -0,0 +1,45 @@
+"""add_reminder_outbox
+
+Revision ID: e4a9c7d3b182
+Revises: d7f2b8e61a05
+Create Date: 2026-10-19 14:21:40.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a9c7d3b182'
+down_revision: Union[str, Sequence[str], None] = 'd7f2b8e61a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reminder_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('task_id', sa.Integer(), nullable=False),
+    sa.Column('due_date', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('reminded_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['task_id'], ['tasks.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('task_id', 'due_date', name='uq_reminder_outbox_task_due_date')
+    )
+    op.create_index('ix_reminder_outbox_pending', 'reminder_outbox', ['next_attempt_at'], unique=False,
+                    postgresql_where=sa.text('reminded_at IS NULL'), sqlite_where=sa.text('reminded_at IS NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reminder_outbox_pending', table_name='reminder_outbox',
+                  postgresql_where=sa.text('reminded_at IS NULL'), sqlite_where=sa.text('reminded_at IS NULL'))
+    op.drop_table('reminder_outbox')
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     database_url: str
@@ -9,6 +9,76 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
+    gzip_minimum_size: int = 1024
+    gzip_compress_level: int = 6
+    batch_max_requests: int = 20
+    batch_max_cost: int = 40
+    batch_max_concurrency: int = 5
+    events_backend: str = "memory"  # "memory" or "redis"
+    events_queue_size: int = 100
+    events_history_size: int = 500
+    events_history_users: int = 10000  # users whose history is kept, least recently active dropped first
+    events_keepalive_seconds: int = 15
+    sync_lag_seconds: int = 5
+    sync_tombstone_retention_days: int = 30
+    tombstone_purge_interval_seconds: int = 3600
+    reminder_batch_size: int = 1000
+    reminder_concurrency: int = 10
+    reminder_horizon_seconds: int = 3600
+    reminder_max_scheduled: int = 10000
+    reminder_shards: int = 8
+    reminder_interval_seconds: int = 30
+    celery_task_always_eager: bool = False
+    reminder_sink: str = "log"  # "log", "webhook" or "email"
+    reminder_webhook_url: Optional[str] = None
+    reminder_email_sender: str = "reminders@todo.local"
+    reminder_max_attempts: int = 5
+    reminder_delivery_batches: int = 10  # per tick, so one tick's work stays bounded
+    reminder_worker_in_app: bool = False  # run the reminder worker inside the API process
+    leader_lock_backend: str = "auto"  # "auto", "advisory", "file" or "memory"
+    leader_lock_path: Optional[str] = None
+    leader_failover_seconds: int = 10
+    metrics_enabled: bool = True  # per-request query counts, Server-Timing and /metrics
+    metrics_token: Optional[str] = None  # bearer token /metrics requires; it isn't served without one
+    query_guard_mode: str = "off"  # "off", "log" (production), "warn" (development) or "raise" (tests)
+    query_guard_repeat_threshold: int = 5  # same statement this often in one request looks like N+1
+    slow_query_threshold_ms: Optional[int] = 500  # log statements slower than this; None turns it off
+    slow_query_explain_sample_rate: float = 0.1  # share of slow SELECTs whose plan is captured
+    slow_query_explain_interval_seconds: int = 300  # at most one plan per statement fingerprint per interval
+    slow_query_explain_concurrency: int = 2  # plan captures in flight at once
+    profiling_token: Optional[str] = None  # requests sending it in X-Profile get a cProfile report back
+    profiling_sample_rate: float = 0.0  # share of requests profiled in the background
+    profiling_dir: Optional[str] = None  # where profiles are written (default: <tmp>/todo-profiles)
+    profiling_report_lines: int = 60
+    warmup_enabled: bool = True  # open connections, compile hot statements and build schemas on startup
+    warmup_connections: int = 2
+    coalescing_enabled: bool = True  # identical concurrent list reads of a user share one computation
+    admission_enabled: bool = True  # per-class concurrency limits in front of the routers
+    admission_limits: Dict[str, int] = {}  # concurrent requests per process by class; unset classes get a share of the pool
+    admission_queue_sizes: Dict[str, int] = {"auth": 20, "reads": 100, "writes": 50, "bulk": 4}  # waiters beyond those
+    admission_queue_target_ms: int = 50  # max wait once the queue has stayed non-empty for an interval
+    admission_queue_interval_ms: int = 500  # max wait otherwise
+    admission_retry_after_seconds: int = 1
+    group_commit_enabled: bool = False  # batch concurrent task creates into shared INSERTs and commits
+    group_commit_max_rows: int = 100  # write as soon as this many rows are queued
+    group_commit_max_delay_ms: float = 2  # or this long after the first one
+    idempotency_backend: str = "memory"  # "memory" or "redis"; where Idempotency-Key responses are stored
+    idempotency_ttl_seconds: int = 86400  # how long a stored response is replayed
+    idempotency_lock_seconds: int = 60  # a request that died holding its key frees it after this long
+    idempotency_wait_seconds: int = 10  # duplicates wait this long for the first request before a 409
+    idempotency_memory_max_entries: int = 10000  # responses the memory backend keeps per process, oldest evicted first
+    shard_urls: List[str] = []  # databases user data is split across by user id; empty keeps it all in DATABASE_URL
+    shard_directory: Dict[int, int] = {}  # user id -> shard index, overriding the hash (e.g. for a moved user)
+    db_pool_size: Optional[int] = None  # per process; SQLAlchemy's default (5) if unset
+    db_max_overflow: Optional[int] = None  # per process; SQLAlchemy's default (10) if unset
+    # python -m app.serve
+    serve_host: str = "127.0.0.1"
+    serve_port: int = 8000
+    serve_workers: Optional[int] = None  # default: one per CPU
+    serve_db_connection_budget: Optional[int] = None  # connections for all workers together, split evenly
+    serve_max_requests: Optional[int] = None  # recycle a worker after this many requests
+    serve_max_requests_jitter: int = 0  # randomize each worker's limit by up to this much
+    serve_graceful_timeout: int = 30  # seconds in-flight requests get on shutdown
     
     model_config = ConfigDict(env_file=".env")
 
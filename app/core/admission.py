@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import orjson
+from prometheus_client import Counter, Gauge
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+from app.database import pool_capacity
+
+logger = logging.getLogger(__name__)
+
+# Summed over live workers when app.serve runs several
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight", "Requests admitted and running, by class", ["class"], multiprocess_mode="livesum"
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth", "Requests waiting to be admitted, by class", ["class"], multiprocess_mode="livesum"
+)
+ADMISSION_SHED = Counter(
+    "admission_shed_total", "Requests answered 503 instead of admitted, by class and reason", ["class", "reason"]
+)
+
+# Never queued: liveness must answer while everything else is saturated, and
+# event streams hold their request open without using the database
+EXEMPT_PATHS = ("/health", "/metrics", "/events")
+# Checked in order; anything else (including /sync polling) is "reads" or
+# "writes" by method
+PATH_CLASSES = (("/auth", "auth"), ("/batch", "bulk"))
+# Default limits, as shares of the connection pool, so that admitted
+# requests fit in the pool and a spike queues here rather than on checkout.
+# Rounding down leaves a few connections for background work such as the
+# reminder worker.
+POOL_SHARES = {"reads": 0.5, "writes": 0.25, "auth": 0.125, "bulk": 0.125}
+# Logins spend most of their time hashing the password in a thread, without
+# a connection, so auth isn't held to its pool share: a burst of logins (say,
+# clients reconnecting after a deploy) is admitted rather than shed
+AUTH_MIN_LIMIT = 16
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def _under(path: str, prefix: str) -> bool:
+    return path == prefix or path.startswith(prefix + "/")
+
+
+def admission_class(scope: Scope) -> Optional[str]:
+    """The class a request is admitted under, or None if it bypasses admission"""
+    path = scope["path"]
+    if any(_under(path, prefix) for prefix in EXEMPT_PATHS):
+        return None
+    for prefix, name in PATH_CLASSES:
+        if _under(path, prefix):
+            return name
+    return "reads" if scope["method"] in READ_METHODS else "writes"
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionQueue:
+    """At most ``limit`` concurrent requests, with up to ``queue_size`` waiting.
+
+    Queueing follows adaptive CoDel: while the queue has drained within the
+    last ``interval`` seconds a waiter may wait that long, but once it has
+    stayed non-empty for longer, new waiters only get ``target`` seconds.
+    A burst is absorbed; a sustained overload is shed quickly instead of
+    building a queue whose every request would time out anyway.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, target: float, interval: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.target = target
+        self.interval = interval
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_empty = time.monotonic()
+
+    def _timeout(self) -> float:
+        if time.monotonic() - self._last_empty > self.interval:
+            return self.target
+        return self.interval
+
+    def _update_gauges(self) -> None:
+        if not self._waiters:
+            self._last_empty = time.monotonic()
+        ADMISSION_IN_FLIGHT.labels(self.name).set(self.active)
+        ADMISSION_QUEUE_DEPTH.labels(self.name).set(len(self._waiters))
+
+    async def acquire(self) -> None:
+        """Wait for a slot; raises Overloaded if the request should be shed"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self._update_gauges()
+            return
+        if len(self._waiters) >= self.queue_size:
+            raise Overloaded("queue_full")
+
+        timeout = self._timeout()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_gauges()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Handed a slot just as the timeout fired
+                return
+            self._waiters.remove(waiter)
+            self._update_gauges()
+            raise Overloaded("timeout")
+        except asyncio.CancelledError:
+            if waiter.done():
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+                self._update_gauges()
+            raise
+
+    def release(self) -> None:
+        if self._waiters:
+            # The slot passes straight to the oldest waiter
+            self._waiters.popleft().set_result(None)
+        else:
+            self.active -= 1
+        self._update_gauges()
+
+
+def default_limits(connections: int) -> Dict[str, int]:
+    """Per-class limits for a pool of ``connections``"""
+    # A request holds one connection, except a batch: its session plus one
+    # per concurrently running read item. Batches get their share first and
+    # the other classes split what they leave.
+    per_batch = 1 + settings.batch_max_concurrency
+    limits = {"bulk": max(1, int(connections * POOL_SHARES["bulk"] / per_batch))}
+    rest = connections - limits["bulk"] * per_batch
+    other_shares = sum(share for name, share in POOL_SHARES.items() if name != "bulk")
+    for name, share in POOL_SHARES.items():
+        if name != "bulk":
+            limits[name] = max(1, int(rest * share / other_shares))
+    limits["auth"] = max(AUTH_MIN_LIMIT, limits["auth"])
+    return limits
+
+
+def build_queues() -> Dict[str, AdmissionQueue]:
+    target = settings.admission_queue_target_ms / 1000
+    interval = settings.admission_queue_interval_ms / 1000
+    limits = {**default_limits(pool_capacity()), **settings.admission_limits}
+    return {
+        name: AdmissionQueue(name, limit, settings.admission_queue_sizes.get(name, 0), target, interval)
+        for name, limit in limits.items()
+    }
+
+
+class AdmissionMiddleware:
+    """Limit concurrent requests per class so a spike queues (briefly) here
+    instead of on the database pool, and is shed with 503 + Retry-After once
+    waiting would no longer help"""
+
+    def __init__(self, app: ASGIApp, queues: Optional[Dict[str, AdmissionQueue]] = None) -> None:
+        self.app = app
+        self.queues = queues if queues is not None else build_queues()
+        self._retry_after = str(settings.admission_retry_after_seconds).encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (scope.get("state") or {}).get("admitted"):
+            await self.app(scope, receive, send)
+            return
+        name = admission_class(scope)
+        queue = self.queues.get(name) if name else None
+        if queue is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await queue.acquire()
+        except Overloaded as e:
+            ADMISSION_SHED.labels(name, e.reason).inc()
+            logger.warning(f"Shed {scope['method']} {scope['path']} ({name}: {e.reason})")
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            queue.release()
+
+    async def _reject(self, send: Send) -> None:
+        body = orjson.dumps({"detail": "Server is overloaded, retry later"})
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", self._retry_after),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,117 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+from urllib.parse import parse_qsl
+
+from fastapi import Request, Response
+from prometheus_client import Counter
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.core.metrics import route_template
+
+# Dedup ratio: rate(...{outcome="shared"}) / rate(...) summed over outcomes
+COALESCED_REQUESTS = Counter(
+    "coalesced_requests_total", "Coalescable reads, by whether they ran or shared another's result",
+    ["route", "outcome"],
+)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class SingleFlight:
+    """Run identical concurrent reads once and share the serialized response.
+
+    Keys are grouped by user so a write can drop all of that user's
+    in-flight entries: requests already waiting still get the result they
+    joined, requests arriving after the write start a fresh computation.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[int, Dict[Hashable, asyncio.Future]] = {}
+
+    def invalidate(self, user_id: int) -> None:
+        self._inflight.pop(user_id, None)
+
+    async def run(
+        self, user_id: int, key: Hashable, compute: Callable[[], Awaitable[Response]]
+    ) -> Tuple[Response, bool]:
+        """The response, and whether it was shared from another request"""
+        entries = self._inflight.setdefault(user_id, {})
+        future = entries.get(key)
+        if future is not None:
+            try:
+                status_code, body, media_type = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The request computing it went away: compute our own
+                return await compute(), False
+            return Response(content=body, status_code=status_code, media_type=media_type), True
+
+        future = asyncio.get_running_loop().create_future()
+        entries[key] = future
+        try:
+            response = await compute()
+            future.set_result((response.status_code, response.body, response.media_type))
+            return response, False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            # Identical requests fail identically (e.g. an invalid fieldset)
+            future.set_exception(e)
+            # Nobody else may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        finally:
+            entries = self._inflight.get(user_id)
+            if entries is not None and entries.get(key) is future:
+                del entries[key]
+                if not entries:
+                    del self._inflight[user_id]
+
+
+single_flight = SingleFlight()
+
+
+async def coalesce(request: Request, user_id: int, compute: Callable[[], Awaitable[Response]]) -> Response:
+    """Serve ``compute()``, sharing it with identical concurrent requests of ``user_id``.
+
+    Requests are identical when they hit the same route with the same
+    query parameters, in any order. ``compute`` must return a rendered
+    ``Response`` (see ``app.core.responses.render``).
+    """
+    if not settings.coalescing_enabled:
+        return await compute()
+    route = route_template(request.scope)
+    query = tuple(sorted(parse_qsl(request.scope["query_string"].decode("latin-1"), keep_blank_values=True)))
+    response, shared = await single_flight.run(user_id, (request.method, route, query), compute)
+    COALESCED_REQUESTS.labels(route, "shared" if shared else "computed").inc()
+    return response
+
+
+class InvalidateOnWriteMiddleware:
+    """Drop a user's in-flight reads when a write of theirs is answered.
+
+    Runs when the response starts, after the write committed and before
+    the client can send a follow-up read, so reads never join a
+    computation older than their own writes.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_invalidating(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Recorded by get_current_user
+                user_id = (scope.get("state") or {}).get("user_id")
+                if user_id is not None:
+                    single_flight.invalidate(user_id)
+            await send(message)
+
+        await self.app(scope, receive, send_invalidating)
@@ -1,7 +1,8 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_async_session
+from app.database import get_async_session, get_shared_session
+from app.core.sharding import session_maker_for, sharding_enabled
 from app.core.security import verify_token
 from app.crud.user import get_user_by_email
 from app.models.user import User
@@ -9,9 +10,16 @@ from app.models.user import User
 security = HTTPBearer()
 
 async def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_async_session)
 ) -> User:
+    # Sub-requests of a batch were already authenticated by the batch itself
+    batch_user = getattr(request.state, "current_user", None)
+    if batch_user is not None:
+        request.state.user_id = batch_user.id
+        return batch_user
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -26,9 +34,25 @@ async def get_current_user(
     if user is None:
         raise credentials_exception
     
+    # Lets the slow-query log say whose request ran a statement
+    request.state.user_id = user.id
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_user_session(
+    request: Request,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> AsyncSession:
+    """Session on the database holding the current user's data: their shard
+    when sharding is on, otherwise the request's session"""
+    # A batch's sub-requests share the batch's session, already on the shard
+    if not sharding_enabled() or get_shared_session(request) is not None:
+        yield db
+        return
+    async with session_maker_for(current_user.id)() as session:
+        yield session
@@ -0,0 +1,251 @@
+import asyncio
+import contextlib
+import itertools
+import logging
+import time
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Set
+
+import orjson
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "events"
+EVENTS_SEQUENCE_KEY = "events:seq"
+# Delay before resubscribing after losing Redis, doubled up to the maximum
+RECONNECT_DELAY = 0.5
+MAX_RECONNECT_DELAY = 30
+
+
+@dataclass
+class Event:
+    id: int
+    user_id: int
+    type: str  # e.g. "task.created", "category.deleted"
+    data: dict
+
+    def encode(self) -> bytes:
+        """Server-Sent Events wire format"""
+        return b"id: %d\nevent: %s\ndata: %s\n\n" % (self.id, self.type.encode(), orjson.dumps(self.data))
+
+
+@dataclass(eq=False)
+class Subscription:
+    user_id: int
+    queue: asyncio.Queue
+    # Set when the client fell too far behind (queue full) or asked to resume
+    # from an event no longer in history; it then has to resync from scratch
+    reset: bool = False
+
+    def push(self, event: Event) -> None:
+        if self.reset:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.reset = True
+
+    async def get(self) -> Event:
+        return await self.queue.get()
+
+
+@dataclass
+class _History:
+    events: Deque[Event]
+    evicted_id: int = 0  # newest event id that fell out of the buffer
+
+
+class EventBroker:
+    """In-process fan-out of change events to each user's subscribers.
+
+    Every subscriber gets a bounded queue so a slow client can't hold an
+    unbounded backlog, and the last few events per user are kept so a
+    reconnecting client can resume from ``Last-Event-ID``. History is kept
+    for at most ``history_users`` users; beyond that the least recently
+    active user without a subscriber loses theirs, and has to resync if
+    they come back with an older id.
+    """
+
+    def __init__(self, queue_size: int, history_size: int, history_users: Optional[int] = None) -> None:
+        self.queue_size = queue_size
+        self.history_size = history_size
+        self.history_users = history_users
+        self._subscribers: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._history: "OrderedDict[int, _History]" = OrderedDict()
+        # Newest event id in any history dropped for the user cap
+        self._forgotten_id = 0
+        self._listeners: List[Callable[[Event], None]] = []
+        # Ids start from the clock so ids issued by a previous process are
+        # always older than anything this process can replay
+        self._first_id = time.time_ns() // 1000
+        self._ids = itertools.count(self._first_id)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, user_id: int, type: str, data: dict) -> None:
+        self.dispatch(Event(next(self._ids), user_id, type, data))
+
+    def dispatch(self, event: Event) -> None:
+        history = self._history.get(event.user_id)
+        if history is None:
+            self._forget_idle_users()
+            history = self._history[event.user_id] = _History(deque(maxlen=self.history_size))
+        else:
+            self._history.move_to_end(event.user_id)
+        if len(history.events) == self.history_size:
+            history.evicted_id = history.events[0].id
+        history.events.append(event)
+        for subscription in self._subscribers.get(event.user_id, ()):
+            subscription.push(event)
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Event listener failed on {event.type}: {e}")
+
+    def _forget_idle_users(self) -> None:
+        """Make room for one more user's history"""
+        if self.history_users is None:
+            return
+        while self._history and len(self._history) >= self.history_users:
+            # Least recently active first, preferring users nobody listens for
+            user_id = next(
+                (user_id for user_id in self._history if user_id not in self._subscribers), next(iter(self._history))
+            )
+            history = self._history.pop(user_id)
+            if history.events:
+                self._forgotten_id = max(self._forgotten_id, history.events[-1].id)
+
+    def reset_subscribers(self) -> None:
+        """Make every current subscriber resync, e.g. after events were lost"""
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.reset = True
+
+    def subscribe(self, user_id: int, last_event_id: Optional[int] = None) -> Subscription:
+        subscription = Subscription(user_id, asyncio.Queue(self.queue_size))
+        if last_event_id is not None:
+            history = self._history.get(user_id)
+            # Without a history it may have been dropped, with events newer than the id
+            evicted_id = history.evicted_id if history else self._forgotten_id
+            if last_event_id < self._first_id - 1 or last_event_id < evicted_id:
+                subscription.reset = True
+            elif history:
+                for event in history.events:
+                    if event.id > last_event_id:
+                        subscription.push(event)
+        self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def add_listener(self, listener: Callable[[Event], None]) -> None:
+        """Call ``listener`` synchronously with every event, for all users"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Event], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.user_id]
+
+
+class RedisEventBroker(EventBroker):
+    """Broker that fans events out across replicas through Redis pub/sub.
+
+    Ids come from a Redis counter so they are ordered across replicas, and
+    every replica keeps its own resume history from the shared channel.
+    """
+
+    def __init__(self, redis_url: str, queue_size: int, history_size: int, history_users: Optional[int] = None) -> None:
+        super().__init__(queue_size, history_size, history_users)
+        self.redis_url = redis_url
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def _client(self):
+        if self._redis is None:
+            # Imported here so replicas on the in-memory broker don't pay for it
+            import redis.asyncio as redis
+            self._redis = redis.from_url(self.redis_url)
+        return self._redis
+
+    async def publish(self, user_id: int, type: str, data: dict) -> None:
+        try:
+            event_id = await self._client().incr(EVENTS_SEQUENCE_KEY)
+            payload = {"id": event_id, "user_id": user_id, "type": type, "data": data}
+            await self._client().publish(EVENTS_CHANNEL, orjson.dumps(payload))
+        except Exception as e:
+            logger.error(f"Failed to publish {type} event for user {user_id}: {e}")
+
+    async def _subscribe(self):
+        pubsub = self._client().pubsub()
+        await pubsub.subscribe(EVENTS_CHANNEL)
+        # Anything up to the current counter value may have been missed
+        self._first_id = int(await self._client().get(EVENTS_SEQUENCE_KEY) or 0) + 1
+        return pubsub
+
+    async def start(self) -> None:
+        if self._listener is not None:
+            return
+        pubsub = await self._subscribe()
+        self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self, pubsub) -> None:
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = await self._subscribe()
+                    delay = RECONNECT_DELAY
+                    logger.info("Resubscribed to the events channel")
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        self.dispatch(Event(**orjson.loads(message["data"])))
+                    except Exception as e:
+                        logger.error(f"Dropping malformed event: {e}")
+                raise ConnectionError("subscription ended")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if pubsub is not None:
+                    logger.error(f"Lost the events channel, resubscribing in {delay}s: {e}")
+                    # Events published until we're back are gone; streams
+                    # notice the reset at their next event or keepalive
+                    self.reset_subscribers()
+                    with contextlib.suppress(Exception):
+                        await pubsub.reset()
+                else:
+                    logger.error(f"Failed to resubscribe to the events channel, retrying in {delay}s: {e}")
+                pubsub = None
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+def create_broker() -> EventBroker:
+    if settings.events_backend == "redis":
+        return RedisEventBroker(
+            settings.redis_url, settings.events_queue_size, settings.events_history_size, settings.events_history_users
+        )
+    return EventBroker(settings.events_queue_size, settings.events_history_size, settings.events_history_users)
+
+
+broker = create_broker()
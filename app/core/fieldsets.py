@@ -0,0 +1,40 @@
+from functools import lru_cache
+from typing import Optional, Tuple, Type
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ConfigDict, create_model
+
+
+def parse_fields(raw: Optional[str], schema: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """Parse a ``?fields=a,b,c`` value into field names, in schema order.
+
+    Returns None when no fieldset was requested (the full schema applies).
+    """
+    if raw is None:
+        return None
+    requested = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = sorted(requested - schema.model_fields.keys())
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields requested"
+        )
+    return tuple(name for name in schema.model_fields if name in requested)
+
+
+@lru_cache(maxsize=256)
+def sparse_model(schema: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """Build (once per fieldset) a response model holding only ``fields`` of ``schema``"""
+    definitions = {
+        name: (schema.model_fields[name].annotation, schema.model_fields[name])
+        for name in fields
+    }
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **definitions
+    )
+
+
+def response_model_for(schema: Type[BaseModel], fields: Optional[Tuple[str, ...]]) -> Type[BaseModel]:
+    return schema if fields is None else sparse_model(schema, fields)
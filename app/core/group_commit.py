@@ -0,0 +1,139 @@
+import asyncio
+import contextvars
+import logging
+import weakref
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from prometheus_client import Histogram
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.database import Base
+
+logger = logging.getLogger(__name__)
+
+GROUP_COMMIT_ROWS = Histogram(
+    "group_commit_rows", "Rows written per group commit", ["table"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+Pending = Tuple[Dict[str, Any], asyncio.Future]
+
+
+class GroupCommitter:
+    """Batch single-row INSERTs from concurrent requests into one transaction.
+
+    ``insert`` queues a row and waits. Rows are written once ``max_rows``
+    are queued or ``max_delay`` seconds after the first one, with one
+    multi-row ``INSERT ... RETURNING`` and a single commit, so many creates
+    share one round trip and one fsync. If the batch fails it is retried
+    row by row, each in its own savepoint of one transaction, so only the
+    rows that are actually bad fail.
+
+    The write happens on its own session, outside the caller's transaction:
+    a caller that is cancelled while waiting may still have its row written.
+    """
+
+    def __init__(
+        self, session_maker: async_sessionmaker, model: Type[Base], max_rows: int, max_delay: float
+    ) -> None:
+        self.session_maker = session_maker
+        self.model = model
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._pending: List[Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._writes: set = set()
+
+    async def insert(self, values: Dict[str, Any]) -> Base:
+        """Insert one row; returns the written instance, detached"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((values, future))
+        if len(self._pending) >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            # A fresh context, so the write isn't counted against whichever
+            # request happened to start the batch
+            self._timer = loop.call_later(self.max_delay, self._flush, context=contextvars.Context())
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        write = asyncio.get_running_loop().create_task(self._write(batch), context=contextvars.Context())
+        # Keep a reference until it's done; the event loop only holds a weak one
+        self._writes.add(write)
+        write.add_done_callback(self._writes.discard)
+
+    async def _write(self, batch: List[Pending]) -> None:
+        GROUP_COMMIT_ROWS.labels(self.model.__tablename__).observe(len(batch))
+        try:
+            async with self.session_maker() as session:
+                async with session.begin():
+                    result = await session.scalars(
+                        insert(self.model).returning(self.model, sort_by_parameter_order=True),
+                        [values for values, _ in batch],
+                    )
+                    rows = result.all()
+        except Exception as e:
+            if len(batch) == 1:
+                _resolve(batch[0][1], error=e)
+                return
+            logger.info(f"Group commit of {len(batch)} {self.model.__tablename__} rows failed ({e!r}), retrying row by row")
+            await self._write_each(batch)
+            return
+        for (_, future), row in zip(batch, rows):
+            _resolve(future, row)
+
+    async def _write_each(self, batch: List[Pending]) -> None:
+        written = []
+        try:
+            async with self.session_maker() as session:
+                async with session.begin():
+                    for values, future in batch:
+                        try:
+                            async with session.begin_nested():
+                                row = await session.scalar(insert(self.model).returning(self.model), values)
+                        except Exception as e:
+                            _resolve(future, error=e)
+                        else:
+                            written.append((future, row))
+        except Exception as e:
+            # The transaction failed as a whole: nothing was written
+            for _, future in batch:
+                _resolve(future, error=e)
+            return
+        for future, row in written:
+            _resolve(future, row)
+
+
+def _resolve(future: asyncio.Future, row: Any = None, error: Optional[BaseException] = None) -> None:
+    if future.done():
+        # The caller went away
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(row)
+
+
+_committers: "weakref.WeakKeyDictionary[AsyncEngine, Dict[type, GroupCommitter]]" = weakref.WeakKeyDictionary()
+
+
+def group_committer(bind: AsyncEngine, model: Type[Base]) -> GroupCommitter:
+    """The committer for ``model`` rows on ``bind``, created on first use"""
+    per_model = _committers.setdefault(bind, {})
+    if model not in per_model:
+        per_model[model] = GroupCommitter(
+            async_sessionmaker(bind, class_=AsyncSession, expire_on_commit=False),
+            model,
+            max_rows=settings.group_commit_max_rows,
+            max_delay=settings.group_commit_max_delay_ms / 1000,
+        )
+    return per_model[model]
@@ -0,0 +1,285 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from prometheus_client import Counter
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.core.security import verify_token
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_REQUESTS = Counter(
+    "idempotent_requests_total", "Write requests sent with an Idempotency-Key, by outcome", ["outcome"]
+)
+
+IDEMPOTENT_METHODS = ("POST", "PATCH", "DELETE")
+MAX_KEY_LENGTH = 255
+# Redis has no way to wake waiters on a key; they poll at this interval
+POLL_INTERVAL = 0.05
+
+# A record is {"fingerprint": ...} while its request runs, and gains
+# "status", "headers" and "body" (base64) once the response is stored
+Record = dict
+
+
+class IdempotencyStore:
+    """In-process store of idempotent responses, for single-process deployments and tests.
+
+    ``claim`` atomically marks a key as in flight, or returns what is already
+    there. Claims expire after ``lock_ttl`` so a crashed request doesn't hold
+    its key forever; stored responses expire after ``ttl``. At most
+    ``max_entries`` are kept, the oldest going first, so memory stays bounded
+    whatever the write rate. Each process has its own store: with several
+    ``app.serve`` workers a retry only hits it if it lands on the same one.
+    """
+
+    def __init__(self, ttl: float, lock_ttl: float, max_entries: Optional[int] = None) -> None:
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.max_entries = max_entries
+        self._records: "OrderedDict[str, Tuple[float, Record]]" = OrderedDict()
+        self._done: Dict[str, asyncio.Event] = {}
+
+    def _get(self, key: str) -> Optional[Record]:
+        entry = self._records.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def _put(self, key: str, record: Record, ttl: float) -> None:
+        now = time.monotonic()
+        self._records[key] = (now + ttl, record)
+        self._records.move_to_end(key)
+        # Drop expired entries from the front, where most expire first, and
+        # the oldest ones beyond the cap
+        while self._records:
+            oldest = next(iter(self._records))
+            over_cap = self.max_entries is not None and len(self._records) > self.max_entries
+            if not over_cap and self._records[oldest][0] > now:
+                break
+            del self._records[oldest]
+
+    async def claim(self, key: str, fingerprint: str) -> Optional[Record]:
+        record = self._get(key)
+        if record is not None:
+            return record
+        self._put(key, {"fingerprint": fingerprint}, self.lock_ttl)
+        self._done[key] = asyncio.Event()
+        return None
+
+    async def complete(self, key: str, record: Record) -> None:
+        self._put(key, record, self.ttl)
+        self._notify(key)
+
+    async def release(self, key: str) -> None:
+        self._records.pop(key, None)
+        self._notify(key)
+
+    def _notify(self, key: str) -> None:
+        done = self._done.pop(key, None)
+        if done is not None:
+            done.set()
+
+    async def wait(self, key: str, timeout: float) -> None:
+        """Return once the request holding ``key`` finished, or after ``timeout``"""
+        done = self._done.get(key)
+        if done is None:
+            return
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class RedisIdempotencyStore(IdempotencyStore):
+    """Store shared by all replicas, so a retry landing on another one is replayed too"""
+
+    def __init__(self, redis_url: str, ttl: float, lock_ttl: float) -> None:
+        super().__init__(ttl, lock_ttl)
+        self.redis_url = redis_url
+        self._redis = None
+
+    def _client(self):
+        if self._redis is None:
+            # Imported here so replicas on the in-memory store don't pay for it
+            import redis.asyncio as redis
+            self._redis = redis.from_url(self.redis_url)
+        return self._redis
+
+    async def claim(self, key: str, fingerprint: str) -> Optional[Record]:
+        while True:
+            claimed = await self._client().set(
+                key, orjson.dumps({"fingerprint": fingerprint}), px=int(self.lock_ttl * 1000), nx=True
+            )
+            if claimed:
+                return None
+            value = await self._client().get(key)
+            if value is not None:
+                return orjson.loads(value)
+            # Expired between the two calls; try to claim it again
+
+    async def complete(self, key: str, record: Record) -> None:
+        await self._client().set(key, orjson.dumps(record), px=int(self.ttl * 1000))
+
+    async def release(self, key: str) -> None:
+        await self._client().delete(key)
+
+    async def wait(self, key: str, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            value = await self._client().get(key)
+            if value is None or "status" in orjson.loads(value):
+                return
+            await asyncio.sleep(POLL_INTERVAL)
+
+
+def create_store() -> IdempotencyStore:
+    if settings.idempotency_backend == "redis":
+        return RedisIdempotencyStore(settings.redis_url, settings.idempotency_ttl_seconds, settings.idempotency_lock_seconds)
+    return IdempotencyStore(
+        settings.idempotency_ttl_seconds, settings.idempotency_lock_seconds, settings.idempotency_memory_max_entries
+    )
+
+
+def _owner(headers: Headers) -> Optional[str]:
+    # Keys are per user; the token is only decoded here, the route still
+    # authenticates the request itself
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return verify_token(token)
+
+
+def _fingerprint(scope: Scope, body: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in (scope["method"].encode(), scope["path"].encode(), scope["query_string"], body):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class IdempotencyMiddleware:
+    """Honor ``Idempotency-Key`` on POST, PATCH and DELETE.
+
+    The first request with a key runs normally and its response is stored;
+    a retry with the same key and the same request gets the stored response
+    back without reaching the route. A duplicate that arrives while the
+    first is still running waits for it (up to ``IDEMPOTENCY_WAIT_SECONDS``,
+    then 409). Reusing a key for a different request is a 422. Server errors
+    aren't stored, so the request can be retried for real.
+    """
+
+    def __init__(self, app: ASGIApp, store: Optional[IdempotencyStore] = None) -> None:
+        self.app = app
+        self.store = store if store is not None else create_store()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in IDEMPOTENT_METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        key = headers.get("idempotency-key")
+        owner = _owner(headers) if key else None
+        if owner is None:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await _respond(send, 400, f"Idempotency-Key is longer than {MAX_KEY_LENGTH} characters")
+            return
+
+        body = await _read_body(receive)
+        fingerprint = _fingerprint(scope, body)
+        store_key = f"idempotency:{owner}:{key}"
+        deadline = time.monotonic() + settings.idempotency_wait_seconds
+        while True:
+            record = await self.store.claim(store_key, fingerprint)
+            if record is None:
+                await self._run(scope, body, send, store_key, fingerprint)
+                return
+            if record["fingerprint"] != fingerprint:
+                IDEMPOTENT_REQUESTS.labels("mismatch").inc()
+                await _respond(send, 422, "Idempotency-Key was already used for a different request")
+                return
+            if "status" in record:
+                IDEMPOTENT_REQUESTS.labels("replayed").inc()
+                await _replay(send, record)
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                IDEMPOTENT_REQUESTS.labels("in_progress").inc()
+                await _respond(send, 409, "A request with this Idempotency-Key is still in progress")
+                return
+            await self.store.wait(store_key, remaining)
+
+    async def _run(self, scope: Scope, body: bytes, send: Send, store_key: str, fingerprint: str) -> None:
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+        body_sent = False
+
+        async def receive_body() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return {"type": "http.disconnect"}
+
+        async def send_and_capture(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, send_and_capture)
+        except BaseException:
+            await self.store.release(store_key)
+            raise
+        if start is None or start["status"] >= 500:
+            await self.store.release(store_key)
+            return
+        IDEMPOTENT_REQUESTS.labels("stored").inc()
+        await self.store.complete(store_key, {
+            "fingerprint": fingerprint,
+            "status": start["status"],
+            "headers": [[name.decode("latin-1"), value.decode("latin-1")] for name, value in start.get("headers", [])],
+            "body": base64.b64encode(b"".join(chunks)).decode(),
+        })
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+async def _replay(send: Send, record: Record) -> None:
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in record["headers"]]
+    headers.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": record["status"], "headers": headers})
+    await send({"type": "http.response.body", "body": base64.b64decode(record["body"])})
+
+
+async def _respond(send: Send, status: int, detail: str) -> None:
+    body = orjson.dumps({"detail": detail})
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
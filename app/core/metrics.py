@@ -0,0 +1,141 @@
+import hmac
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+from prometheus_client import Histogram
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling a request", ["method", "route"]
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds", "Time a request spent waiting on SQL statements", ["method", "route"]
+)
+REQUEST_APP_DURATION = Histogram(
+    "http_request_app_duration_seconds", "Time a request spent outside SQL statements", ["method", "route"]
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_queries", "SQL statements executed per request", ["method", "route"],
+    buckets=(0, 1, 2, 3, 4, 5, 8, 13, 21, 34, 55, 89),
+)
+
+
+# A run of bind placeholders, e.g. an expanded IN list: (?, ?, ?) or ($1, $2)
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%s|\$\d+|:\w+))+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_fingerprint(statement: str) -> str:
+    """Statement text with whitespace and expanded IN lists collapsed, so the
+    same query shape maps to the same string whatever its parameters"""
+    return _WHITESPACE.sub(" ", _PLACEHOLDER_LIST.sub("(?)", statement)).strip()
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+    # Statements per fingerprint; only collected when the query guard is on
+    shapes: Optional[Counter] = None
+    # The request being measured, for the slow-query log
+    scope: Optional[Scope] = None
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def record_query(statement: str, duration: float) -> None:
+    """Attribute one SQL statement to the request being handled, if any"""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += duration
+        if stats.shapes is not None:
+            stats.shapes[statement_fingerprint(statement)] += 1
+
+
+def route_template(scope: Scope) -> str:
+    # FastAPI leaves the matched route in the scope; label by its template
+    # (e.g. /tasks/{task_id}) so the label set stays bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def server_timing(stats: RequestStats, total: float) -> str:
+    db_ms = stats.db_seconds * 1000
+    total_ms = total * 1000
+    return (
+        f'db;dur={db_ms:.2f};desc="{stats.queries} queries", '
+        f"app;dur={max(total_ms - db_ms, 0):.2f}, total;dur={total_ms:.2f}"
+    )
+
+
+class MetricsMiddleware:
+    """Count SQL statements and split DB time from Python time per request.
+
+    Statements are attributed through a context variable filled by the
+    engine hooks from ``instrument_engine``. The split goes out as a
+    ``Server-Timing`` header and into Prometheus histograms labeled by route
+    template. Sub-requests (``/batch``) are measured on their own and also
+    added to the enclosing request.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        outer = _request_stats.get()
+        stats = RequestStats(scope=scope)
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(stats, time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            total = time.perf_counter() - start
+            _request_stats.reset(token)
+            if outer is not None:
+                outer.queries += stats.queries
+                outer.db_seconds += stats.db_seconds
+            labels = (scope["method"], route_template(scope))
+            REQUEST_DURATION.labels(*labels).observe(total)
+            REQUEST_DB_DURATION.labels(*labels).observe(stats.db_seconds)
+            REQUEST_APP_DURATION.labels(*labels).observe(max(total - stats.db_seconds, 0))
+            REQUEST_QUERIES.labels(*labels).observe(stats.queries)
+
+
+def require_metrics_token(authorization: Optional[str] = Header(None)) -> None:
+    """Guard for /metrics: hidden unless METRICS_TOKEN is set, and scrapers
+    must send it as a bearer token"""
+    token = settings.metrics_token
+    if not token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, value = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(value.encode(), token.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
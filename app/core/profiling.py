@@ -0,0 +1,145 @@
+import asyncio
+import cProfile
+import hmac
+import io
+import logging
+import marshal
+import os
+import pstats
+import random
+import re
+import tempfile
+import time
+from typing import Optional
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.core.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+_SLUG = re.compile(r"[^A-Za-z0-9]+")
+
+
+def profiles_dir() -> str:
+    return settings.profiling_dir or os.path.join(tempfile.gettempdir(), "todo-profiles")
+
+
+def text_report(profiler: cProfile.Profile, title: str) -> str:
+    """Functions by cumulative time, as printed by ``python -m pstats``"""
+    stream = io.StringIO()
+    stream.write(f"{title}\n\n")
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(settings.profiling_report_lines)
+    return stream.getvalue()
+
+
+def dump(profiler: cProfile.Profile) -> bytes:
+    """The profile in the format ``pstats.Stats.dump_stats`` writes (snakeviz, ``python -m pstats``)"""
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+
+def save(profiler: cProfile.Profile, method: str, route: str, elapsed: float) -> str:
+    directory = profiles_dir()
+    os.makedirs(directory, exist_ok=True)
+    slug = _SLUG.sub("_", route).strip("_") or "root"
+    path = os.path.join(directory, f"{time.time_ns() // 1_000_000}-{method}-{slug}-{elapsed * 1000:.0f}ms.prof")
+    with open(path, "wb") as f:
+        f.write(dump(profiler))
+    return path
+
+
+class ProfilingMiddleware:
+    """Profile single requests with cProfile, on demand or sampled.
+
+    A request carrying ``X-Profile: <PROFILING_TOKEN>`` (or
+    ``?profile=<token>``) is profiled and answered with the report instead
+    of its response: the top functions by cumulative time as text, or the
+    pstats dump with ``X-Profile-Format: pstats``. Separately,
+    ``PROFILING_SAMPLE_RATE`` of requests are profiled with their response
+    untouched and written to ``PROFILING_DIR``, tagged with the route.
+
+    cProfile sees the whole event loop thread, so work of other requests
+    running while this one awaits shows up too; profiles are taken one at a
+    time. The middleware is only installed when a token or sample rate is
+    configured.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._lock = asyncio.Lock()
+
+    def _requested(self, scope: Scope) -> bool:
+        token = settings.profiling_token
+        if not token:
+            return False
+        value = Headers(scope=scope).get("x-profile")
+        if value is None and b"profile=" in scope.get("query_string", b""):
+            value = parse_qs(scope["query_string"].decode("latin-1")).get("profile", [None])[0]
+        return value is not None and hmac.compare_digest(value.encode(), token.encode())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self._requested(scope):
+            await self._profile_and_report(scope, receive, send)
+        elif (
+            settings.profiling_sample_rate
+            and random.random() < settings.profiling_sample_rate
+            and not self._lock.locked()
+        ):
+            await self._profile_sampled(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def _run_profiled(self, scope: Scope, receive: Receive, send: Send) -> tuple:
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.disable()
+        return profiler, time.perf_counter() - start
+
+    async def _profile_sampled(self, scope: Scope, receive: Receive, send: Send) -> None:
+        async with self._lock:
+            profiler, elapsed = await self._run_profiled(scope, receive, send)
+        try:
+            save(profiler, scope["method"], route_template(scope), elapsed)
+        except OSError as e:
+            logger.error(f"Could not save a sampled profile: {e}")
+
+    async def _profile_and_report(self, scope: Scope, receive: Receive, send: Send) -> None:
+        status: Optional[int] = None
+
+        async def discard(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        async with self._lock:
+            profiler, elapsed = await self._run_profiled(scope, receive, discard)
+
+        method, route = scope["method"], route_template(scope)
+        path = None
+        if settings.profiling_dir:
+            path = save(profiler, method, route, elapsed)
+        if Headers(scope=scope).get("x-profile-format") == "pstats":
+            body, media_type = dump(profiler), "application/octet-stream"
+        else:
+            title = f"{method} {route} -> {status} in {elapsed * 1000:.1f} ms"
+            body, media_type = text_report(profiler, title).encode(), "text/plain; charset=utf-8"
+        headers = [
+            (b"content-type", media_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+            (b"x-profile-route", route.encode()),
+        ]
+        if path:
+            headers.append((b"x-profile-path", path.encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
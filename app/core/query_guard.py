@@ -0,0 +1,98 @@
+import logging
+import warnings
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, TypeVar
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.core.metrics import RequestStats, _request_stats, current_request_stats, route_template
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryBudgetWarning(UserWarning):
+    pass
+
+
+def query_budget(max_queries: int) -> Callable[[F], F]:
+    """Declare how many SQL statements a route may run; apply below ``@router.<method>``"""
+    def decorator(endpoint: F) -> F:
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorator
+
+
+def find_problems(stats: RequestStats, budget: Optional[int]) -> List[str]:
+    problems = []
+    if budget is not None and stats.queries > budget:
+        problems.append(f"ran {stats.queries} queries, budget is {budget}")
+    for shape, count in (stats.shapes or {}).items():
+        if count >= settings.query_guard_repeat_threshold:
+            problems.append(f"ran the same statement {count} times (N+1?): {shape[:200]}")
+    return problems
+
+
+def report(name: str, problems: List[str]) -> None:
+    """raise in tests, warn in development, only log in production"""
+    message = f"{name} " + "; ".join(problems)
+    mode = settings.query_guard_mode
+    if mode == "raise":
+        raise QueryBudgetExceeded(message)
+    if mode == "warn":
+        warnings.warn(message, QueryBudgetWarning, stacklevel=2)
+    else:
+        logger.warning(message)
+
+
+@contextmanager
+def track_queries(name: str, budget: Optional[int] = None) -> Iterator[RequestStats]:
+    """Guard a unit of work outside a request (a worker tick, a test block)"""
+    stats = RequestStats(shapes=Counter())
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+    if settings.query_guard_mode != "off":
+        problems = find_problems(stats, budget)
+        if problems:
+            report(name, problems)
+
+
+class QueryGuardMiddleware:
+    """Check each request against its route's ``query_budget`` and for N+1 patterns.
+
+    Sits inside MetricsMiddleware and reuses its per-request statement
+    counts, so it is inert when metrics are disabled. The check runs when
+    the response starts, which lets ``raise`` mode turn an over-budget
+    request into a 500 instead of a silently slow 200.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stats = current_request_stats()
+        if scope["type"] != "http" or stats is None or settings.query_guard_mode == "off":
+            await self.app(scope, receive, send)
+            return
+
+        stats.shapes = Counter()
+
+        async def send_checked(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                budget = getattr(scope.get("endpoint"), "query_budget", None)
+                problems = find_problems(stats, budget)
+                if problems:
+                    report(f"{scope['method']} {route_template(scope)}", problems)
+            await send(message)
+
+        await self.app(scope, receive, send_checked)
@@ -0,0 +1,109 @@
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+
+import msgpack
+import orjson
+from fastapi import Response
+from pydantic import TypeAdapter
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+@lru_cache(maxsize=None)
+def get_type_adapter(tp: Any) -> TypeAdapter:
+    """Build (once) the pydantic adapter used to serialize a response type"""
+    return TypeAdapter(tp)
+
+
+def render(tp: Any, content: Any, status_code: int = 200) -> Response:
+    """Serialize trusted ORM data straight to JSON bytes.
+
+    Returning a ``Response`` makes FastAPI skip its own response_model pass
+    (validate, dump to dicts, re-encode), so each row is read exactly once and
+    encoded by pydantic-core without building intermediate dicts.
+    """
+    adapter = get_type_adapter(tp)
+    body = adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+    return Response(content=body, status_code=status_code, media_type=JSON_MEDIA_TYPE)
+
+
+def _parse_accept(accept: str) -> List[Tuple[str, float]]:
+    media_ranges = []
+    for item in accept.split(","):
+        media_type, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        media_ranges.append((media_type.strip().lower(), quality))
+    return media_ranges
+
+
+def prefers_msgpack(accept: Optional[str]) -> bool:
+    """True when the Accept header ranks msgpack at least as high as JSON"""
+    if not accept:
+        return False
+    msgpack_q = 0.0
+    json_q = 0.0
+    for media_type, quality in _parse_accept(accept):
+        if media_type in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, quality)
+        elif media_type == JSON_MEDIA_TYPE:
+            json_q = max(json_q, quality)
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+
+class MsgPackMiddleware:
+    """Transcode JSON responses to msgpack for clients that ask for it.
+
+    Only requests whose Accept header prefers msgpack pay for the transcode;
+    everyone else goes straight through to the app.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not prefers_msgpack(Headers(scope=scope).get("accept")):
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                content_type = Headers(raw=message["headers"]).get("content-type", "")
+                if content_type.startswith(JSON_MEDIA_TYPE):
+                    start_message = message
+                else:
+                    passthrough = True
+                    await send(message)
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            raw = b"".join(chunks)
+            body = msgpack.packb(orjson.loads(raw)) if raw else raw
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["content-type"] = MSGPACK_MEDIA_TYPES[0]
+            headers["content-length"] = str(len(body))
+            headers.add_vary_header("Accept")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
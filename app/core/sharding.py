@@ -0,0 +1,68 @@
+"""User data split across several databases by user id.
+
+With ``SHARD_URLS`` set, ``DATABASE_URL`` becomes the directory database:
+it holds every user (logins, unique emails, id allocation) and app-wide
+rows such as leader locks. Each user's tasks, categories, tombstones and
+reminders live on one shard, chosen by ``shard_for``. A user's row is also
+copied to their shard when they register, so foreign keys and the
+reminder owner lookup stay local to the shard.
+
+Without ``SHARD_URLS`` everything stays in ``DATABASE_URL`` and none of
+this is used.
+"""
+import asyncio
+from typing import Awaitable, Callable, List, TypeVar
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import settings
+from app.database import shard_session_maker
+from app.models.user import User
+
+T = TypeVar("T")
+
+
+def sharding_enabled() -> bool:
+    return bool(settings.shard_urls)
+
+
+def shard_for(user_id: int) -> int:
+    """Index of the shard owning ``user_id``'s data: the directory entry if
+    there is one, otherwise the user id modulo the shard count"""
+    if user_id in settings.shard_directory:
+        return settings.shard_directory[user_id]
+    return user_id % len(settings.shard_urls)
+
+
+def session_maker_for(user_id: int) -> async_sessionmaker:
+    return shard_session_maker(shard_for(user_id))
+
+
+def data_urls() -> List[str]:
+    """The databases holding user data: the shards, or the one database"""
+    return list(settings.shard_urls) or [settings.database_url]
+
+
+def database_urls() -> List[str]:
+    """Every database holding the schema: the directory first, then the shards"""
+    return [settings.database_url, *settings.shard_urls]
+
+
+async def scatter(work: Callable[[async_sessionmaker], Awaitable[T]]) -> List[T]:
+    """Run ``work`` against every shard concurrently; results in shard order"""
+    return list(await asyncio.gather(*(
+        work(shard_session_maker(index)) for index in range(len(settings.shard_urls))
+    )))
+
+
+async def replicate_user(user: User) -> None:
+    """Copy a newly registered user to their shard; a no-op if already there"""
+    async with session_maker_for(user.id)() as session:
+        insert = postgresql.insert if session.bind.dialect.name == "postgresql" else sqlite.insert
+        await session.execute(
+            insert(User)
+            .values(id=user.id, email=user.email, hashed_password=user.hashed_password, is_active=user.is_active)
+            .on_conflict_do_nothing(index_elements=["id"])
+        )
+        await session.commit()
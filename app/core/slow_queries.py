@@ -0,0 +1,168 @@
+import asyncio
+import contextvars
+import logging
+import random
+import re
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Set
+
+from prometheus_client import Counter
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+from app.core.metrics import current_request_stats, route_template, statement_fingerprint
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than the slow-query threshold", ["route"])
+
+# Latest plans kept for inspection, one per fingerprint
+MAX_PLANS = 100
+
+# Set while capturing a plan, so the EXPLAIN itself isn't logged
+_capturing: ContextVar[bool] = ContextVar("slow_query_capturing", default=False)
+
+# SELECTs with side effects: row locks (e.g. claim_reminders' FOR UPDATE SKIP
+# LOCKED, which other deliverers would then skip) and function calls
+_LOCKING_CLAUSE = re.compile(r"\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE|KEY\s+SHARE)\b", re.IGNORECASE)
+_CALL = re.compile(r"([A-Za-z_][\w.]*)\s*\(")
+# Words followed by "(" that aren't calls, and functions that only read.
+# Anything else (pg_try_advisory_lock, nextval, setval, ...) might write.
+_NOT_CALLS = {
+    "all", "and", "any", "as", "exists", "filter", "from", "in", "join", "not", "on", "or", "over",
+    "select", "some", "using", "values", "where", "within",
+}
+_READ_ONLY_FUNCTIONS = {
+    "abs", "avg", "cast", "coalesce", "count", "date_trunc", "extract", "greatest", "least", "length",
+    "lower", "max", "min", "now", "nullif", "round", "row_number", "sum", "upper",
+}
+
+
+def safe_to_analyze(statement: str) -> bool:
+    """Whether running ``statement`` again, as EXPLAIN ANALYZE does, can't change anything"""
+    if _LOCKING_CLAUSE.search(statement):
+        return False
+    for name in _CALL.findall(statement):
+        name = name.lower()
+        if name not in _NOT_CALLS and name not in _READ_ONLY_FUNCTIONS:
+            return False
+    return True
+
+
+def parameter_shape(parameters: Any, executemany: bool = False) -> str:
+    """Types of the bound parameters, never their values, e.g. ``(int, str, NoneType)``"""
+    if executemany:
+        rows = list(parameters)
+        return f"{len(rows)} x {parameter_shape(rows[0]) if rows else '()'}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in parameters or ()) + ")"
+
+
+class SlowQueryLog:
+    """Log statements slower than ``threshold`` seconds and capture a sample of their plans.
+
+    Each slow statement is logged with its route, user id and parameter
+    shape. A ``sample_rate`` share of slow SELECTs also get their plan
+    captured on a separate connection: ``EXPLAIN (ANALYZE, BUFFERS)`` on
+    Postgres (plain ``EXPLAIN`` for statements that lock rows or call
+    functions that might write, see ``safe_to_analyze``), ``EXPLAIN QUERY
+    PLAN`` on SQLite. Plans are captured at most
+    once per statement fingerprint every ``explain_interval`` seconds, with
+    at most ``concurrency`` captures in flight, so a slow hot query costs
+    one extra execution per interval rather than one per request.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        threshold: Optional[float] = None,
+        sample_rate: Optional[float] = None,
+        explain_interval: Optional[float] = None,
+        concurrency: Optional[int] = None
+    ) -> None:
+        self.engine = engine
+        self.threshold = threshold if threshold is not None else settings.slow_query_threshold_ms / 1000
+        self.sample_rate = sample_rate if sample_rate is not None else settings.slow_query_explain_sample_rate
+        self.explain_interval = (
+            explain_interval if explain_interval is not None else settings.slow_query_explain_interval_seconds
+        )
+        self.concurrency = concurrency if concurrency is not None else settings.slow_query_explain_concurrency
+        self.plans: "OrderedDict[str, str]" = OrderedDict()
+        self._explained_at: Dict[str, float] = {}
+        self._pending: Set[asyncio.Task] = set()
+
+    def observe(self, statement: str, parameters: Any, duration: float, executemany: bool = False) -> None:
+        """Called by the engine hooks after every statement"""
+        if duration < self.threshold or _capturing.get():
+            return
+        stats = current_request_stats()
+        scope = stats.scope if stats is not None else None
+        route = f"{scope['method']} {route_template(scope)}" if scope else "-"
+        user_id = (scope.get("state") or {}).get("user_id") if scope else None
+        fingerprint = statement_fingerprint(statement)
+        SLOW_QUERIES.labels(route).inc()
+        logger.warning(
+            f"Slow query ({duration * 1000:.1f} ms) route={route} user={user_id} "
+            f"params={parameter_shape(parameters, executemany)}: {fingerprint[:1000]}"
+        )
+        if not executemany and self._should_explain(fingerprint, statement):
+            self._capture(fingerprint, statement, parameters)
+
+    def _should_explain(self, fingerprint: str, statement: str) -> bool:
+        # Plans are only captured for SELECTs; _explain decides whether one
+        # may be run again to measure it
+        if statement.lstrip()[:6].upper() != "SELECT":
+            return False
+        if len(self._pending) >= self.concurrency or random.random() >= self.sample_rate:
+            return False
+        now = time.monotonic()
+        last = self._explained_at.get(fingerprint)
+        if last is not None and now - last < self.explain_interval:
+            return False
+        if len(self._explained_at) > 10 * MAX_PLANS:
+            self._explained_at = {
+                key: at for key, at in self._explained_at.items() if now - at < self.explain_interval
+            }
+        self._explained_at[fingerprint] = now
+        return True
+
+    def _capture(self, fingerprint: str, statement: str, parameters: Any) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Engine used outside the event loop (e.g. migrations): no plan
+            return
+        # A fresh context, so the EXPLAIN isn't counted against the request
+        task = loop.create_task(self._explain(fingerprint, statement, parameters), context=contextvars.Context())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _explain(self, fingerprint: str, statement: str, parameters: Any) -> None:
+        if self.engine.dialect.name == "postgresql":
+            # ANALYZE executes the statement; plain EXPLAIN only plans it
+            explain = "EXPLAIN (ANALYZE, BUFFERS) " if safe_to_analyze(statement) else "EXPLAIN "
+        else:
+            explain = "EXPLAIN QUERY PLAN "
+        _capturing.set(True)
+        try:
+            async with self.engine.connect() as conn:
+                rows = (await conn.exec_driver_sql(explain + statement, parameters)).fetchall()
+                await conn.rollback()
+        except Exception as e:
+            logger.error(f"Could not capture the plan of a slow query: {e}")
+            return
+        # Postgres returns one line per row, SQLite (id, parent, notused, detail)
+        plan = "\n".join(str(row[-1]) for row in rows)
+        self.plans[fingerprint] = plan
+        self.plans.move_to_end(fingerprint)
+        while len(self.plans) > MAX_PLANS:
+            self.plans.popitem(last=False)
+        logger.warning(f"Plan of slow query {fingerprint[:200]}:\n{plan}")
+
+    async def drain(self) -> None:
+        """Wait for the plan captures in flight"""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import time
+from typing import List
+
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.responses import get_type_adapter
+from app.crud import category as crud_category
+from app.crud import task as crud_task
+from app.crud.user import get_user_by_email
+from app.schemas.category import Category, CategoryWithTaskCount
+from app.schemas.sync import SyncResponse
+from app.schemas.task import Task, TaskFilter
+
+logger = logging.getLogger(__name__)
+
+# What the hot routes pass to render() when no fieldset is requested
+RESPONSE_TYPES = [List[Task], List[Category], List[CategoryWithTaskCount], SyncResponse]
+
+# No user has this id, so the warmup reads return nothing
+NO_USER = 0
+
+
+async def open_connections(engine: AsyncEngine, count: int) -> int:
+    """Check out ``count`` connections at once and return them to the pool"""
+    size = getattr(engine.pool, "size", None)
+    if size is not None:
+        # Connections beyond the pool size would be closed on return
+        count = min(count, size())
+    if count <= 0:
+        return 0
+    connections = await asyncio.gather(*(engine.connect() for _ in range(count)))
+    for connection in connections:
+        await connection.close()
+    return count
+
+
+async def compile_hot_statements(engine: AsyncEngine) -> None:
+    """Run the hot reads once so their SQL is compiled into the engine's cache"""
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as db:
+        await get_user_by_email(db, "")
+        await crud_task.get_tasks(db, NO_USER, TaskFilter())
+        await crud_task.get_task(db, NO_USER, NO_USER)
+        await crud_category.get_categories(db, NO_USER)
+        await crud_category.get_categories_with_task_count(db, NO_USER)
+        await crud_category.get_category(db, NO_USER, NO_USER)
+
+
+def build_schemas(app: FastAPI) -> None:
+    app.openapi()
+    for tp in RESPONSE_TYPES:
+        get_type_adapter(tp)
+
+
+async def warmup(app: FastAPI, engine: AsyncEngine, connections: int) -> None:
+    """Pay the costs the first requests would otherwise pay, before taking traffic.
+
+    Opens ``connections`` pool connections, compiles the statements behind
+    the hot routes and builds the OpenAPI schema and the response
+    serializers. A failing step is logged and skipped: a cold start is
+    better than no start.
+    """
+    start = time.perf_counter()
+    try:
+        opened = await open_connections(engine, connections)
+        await compile_hot_statements(engine)
+    except Exception as e:
+        opened = 0
+        logger.warning(f"Database warmup failed, continuing cold: {e}")
+    build_schemas(app)
+    logger.info(f"Warmed up in {(time.perf_counter() - start) * 1000:.0f} ms ({opened} connections open)")
@@ -1,15 +1,20 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, func
+from sqlalchemy.orm import load_only
 from app.models.category import Category
 from app.models.task import Task
+from app.models.tombstone import Tombstone
 from app.schemas.category import CategoryCreate, CategoryUpdate, CategoryWithTaskCount
-from typing import List, Optional
+from app.core.events import broker
+from typing import Any, List, Optional, Sequence
+from datetime import datetime
 
 async def create_category(db: AsyncSession, category: CategoryCreate, user_id: int) -> Category:
     db_category = Category(**category.model_dump(), created_by_user_id=user_id)
     db.add(db_category)
     await db.commit()
     await db.refresh(db_category)
+    await broker.publish(user_id, "category.created", {"id": db_category.id})
     return db_category
 
 async def get_category(db: AsyncSession, category_id: int, user_id: int) -> Optional[Category]:
@@ -22,10 +27,14 @@ async def get_categories(
     db: AsyncSession, 
     user_id: int, 
     skip: int = 0, 
-    limit: int = 100
+    limit: int = 100,
+    fields: Optional[Sequence[str]] = None
 ) -> List[Category]:
+    query = select(Category)
+    if fields is not None:
+        query = query.options(load_only(Category.id, *(getattr(Category, name) for name in fields)))
     result = await db.execute(
-        select(Category)
+        query
         .where(Category.created_by_user_id == user_id)
         .offset(skip)
         .limit(limit)
@@ -36,8 +45,12 @@ async def get_categories_with_task_count(
     db: AsyncSession, 
     user_id: int, 
     skip: int = 0, 
-    limit: int = 100
-) -> List[CategoryWithTaskCount]:
+    limit: int = 100,
+    fields: Optional[Sequence[str]] = None
+) -> List[Any]:
+    if fields is not None:
+        return await _get_category_columns_with_task_count(db, user_id, skip, limit, fields)
+
     # Query categories with task count
     result = await db.execute(
         select(
@@ -65,6 +78,30 @@ async def get_categories_with_task_count(
     
     return categories_with_count
 
+async def _get_category_columns_with_task_count(
+    db: AsyncSession,
+    user_id: int,
+    skip: int,
+    limit: int,
+    fields: Sequence[str]
+) -> List[Any]:
+    # Sparse variant: select only the requested columns and return the rows as-is
+    columns = [getattr(Category, name) for name in fields if name != "task_count"]
+    if "task_count" in fields:
+        columns.append(func.count(Task.id).label("task_count"))
+    query = select(*columns).select_from(Category)
+    if "task_count" in fields:
+        query = query.outerjoin(
+            Task, and_(Task.category_id == Category.id, Task.created_by_user_id == user_id)
+        ).group_by(Category.id)
+    result = await db.execute(
+        query
+        .where(Category.created_by_user_id == user_id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.all()
+
 async def update_category(db: AsyncSession, category_id: int, user_id: int, category_update: CategoryUpdate) -> Optional[Category]:
     db_category = await get_category(db, category_id, user_id)
     if not db_category:
@@ -76,6 +113,7 @@ async def update_category(db: AsyncSession, category_id: int, user_id: int, cate
     
     await db.commit()
     await db.refresh(db_category)
+    await broker.publish(user_id, "category.updated", {"id": category_id})
     return db_category
 
 async def delete_category(db: AsyncSession, category_id: int, user_id: int) -> bool:
@@ -91,11 +129,24 @@ async def delete_category(db: AsyncSession, category_id: int, user_id: int) -> b
     )
     
     await db.delete(db_category)
+    db.add(Tombstone(entity_type="category", entity_id=category_id, created_by_user_id=user_id))
     await db.commit()
+    # Clients should also clear category_id on the category's tasks
+    await broker.publish(user_id, "category.deleted", {"id": category_id})
     return True
 
 async def get_category_by_name(db: AsyncSession, name: str, user_id: int) -> Optional[Category]:
     result = await db.execute(
         select(Category).where(and_(Category.name == name, Category.created_by_user_id == user_id))
     )
-    return result.scalar_one_or_none()
\ No newline at end of file
+    return result.scalar_one_or_none()
+
+async def get_categories_updated_since(
+    db: AsyncSession, user_id: int, since: Optional[datetime] = None, after_id: int = 0, limit: Optional[int] = None
+) -> List[Category]:
+    # Range scan on ix_categories_user_updated_at, paged by id
+    query = select(Category).where(and_(Category.created_by_user_id == user_id, Category.id > after_id))
+    if since is not None:
+        query = query.where(Category.updated_at >= since)
+    result = await db.execute(query.order_by(Category.id).limit(limit))
+    return result.scalars().all()
\ No newline at end of file
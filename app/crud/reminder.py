@@ -0,0 +1,52 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.reminder import ReminderOutbox
+from app.models.task import Task
+from app.models.user import User
+from typing import List, Sequence, Tuple
+from datetime import datetime
+
+async def enqueue_reminders(db: AsyncSession, keys: Sequence[Tuple[int, datetime]], now: datetime) -> int:
+    """Add an outbox row per (task_id, due_date) not already there; the caller commits.
+    
+    Returns the number of rows added. Keys already in the outbox (seen by an
+    earlier or concurrent scan) are skipped by the unique constraint.
+    """
+    if not keys:
+        return 0
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    result = await db.execute(
+        insert(ReminderOutbox)
+        .values([{"task_id": task_id, "due_date": due_date, "next_attempt_at": now} for task_id, due_date in keys])
+        .on_conflict_do_nothing(index_elements=["task_id", "due_date"])
+    )
+    return result.rowcount
+
+async def claim_reminders(
+    db: AsyncSession,
+    now: datetime,
+    limit: int,
+    max_attempts: int
+) -> List[Tuple[ReminderOutbox, Task, str]]:
+    """Lock up to ``limit`` undelivered reminders that are ready for another attempt.
+    
+    Rows come with their task and the owner's email. On Postgres rows locked
+    by another deliverer are skipped (FOR UPDATE SKIP LOCKED), so several
+    delivery loops can drain the outbox side by side; the locks are held
+    until the caller commits.
+    """
+    result = await db.execute(
+        select(ReminderOutbox, Task, User.email)
+        .join(Task, Task.id == ReminderOutbox.task_id)
+        .join(User, User.id == Task.created_by_user_id)
+        .where(
+            ReminderOutbox.reminded_at.is_(None),
+            ReminderOutbox.next_attempt_at <= now,
+            ReminderOutbox.attempts < max_attempts,
+        )
+        .order_by(ReminderOutbox.next_attempt_at)
+        .limit(limit)
+        .with_for_update(of=ReminderOutbox, skip_locked=True)
+    )
+    return result.all()
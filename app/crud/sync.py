@@ -0,0 +1,22 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, and_
+from app.models.tombstone import Tombstone
+from typing import List, Optional
+from datetime import datetime
+
+async def get_tombstones_since(
+    db: AsyncSession, user_id: int, since: datetime, after_id: int = 0, limit: Optional[int] = None
+) -> List[Tombstone]:
+    # Range scan on ix_tombstones_user_created_at, paged by id
+    result = await db.execute(
+        select(Tombstone)
+        .where(and_(Tombstone.created_by_user_id == user_id, Tombstone.created_at >= since, Tombstone.id > after_id))
+        .order_by(Tombstone.id)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+async def purge_tombstones(db: AsyncSession, older_than: datetime) -> int:
+    result = await db.execute(Tombstone.__table__.delete().where(Tombstone.created_at < older_than))
+    await db.commit()
+    return result.rowcount
@@ -1,34 +1,71 @@
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncResult
 from sqlalchemy import select, and_, or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import contains_eager, load_only
+from sqlalchemy.orm.attributes import set_committed_value
 from app.models.task import Task
 from app.models.category import Category
+from app.models.tombstone import Tombstone
 from app.schemas.task import TaskCreate, TaskUpdate, TaskFilter
-from typing import List, Optional
-from datetime import datetime
+from app.core.events import broker
+from app.core.group_commit import group_committer
+from app.config import settings
+from typing import List, Optional, Sequence, Tuple
+from datetime import datetime, timedelta
+
+# updated_at comes from the database clock (second resolution on SQLite), so
+# look a little further back for edits to avoid missing ones near a boundary
+OVERDUE_EDIT_OVERLAP = timedelta(seconds=5)
+
+def _select_tasks(fields: Optional[Sequence[str]] = None, join_category: bool = True):
+    # Fetch the category in the same statement (outer join + contains_eager)
+    # and project only the requested columns when a fieldset is given
+    query = select(Task)
+    if fields is not None:
+        columns = [getattr(Task, name) for name in fields if name != "category"]
+        query = query.options(load_only(Task.id, *columns))
+    if join_category and (fields is None or "category" in fields):
+        query = query.outerjoin(Task.category).options(contains_eager(Task.category))
+    return query
+
+def _task_event_data(task: Task) -> dict:
+    return {
+        "id": task.id,
+        "due_date": task.due_date.isoformat() if task.due_date else None,
+        "is_completed": task.is_completed,
+        "category_id": task.category_id,
+    }
 
 async def create_task(db: AsyncSession, task: TaskCreate, user_id: int) -> Task:
     # Validate category if provided
+    category = None
     if task.category_id:
         category_result = await db.execute(
             select(Category).where(and_(Category.id == task.category_id, Category.created_by_user_id == user_id))
         )
-        if not category_result.scalar_one_or_none():
+        category = category_result.scalar_one_or_none()
+        if not category:
             raise ValueError("Category not found or doesn't belong to user")
     
-    db_task = Task(**task.model_dump(), created_by_user_id=user_id)
-    db.add(db_task)
-    await db.commit()
-    await db.refresh(db_task)
+    if settings.group_commit_enabled:
+        # Written together with concurrent creates, in one transaction on a
+        # connection of the committer's. End ours first: holding it while
+        # waiting would leave a full pool with nothing for the committer.
+        await db.commit()
+        db_task = await group_committer(db.bind, Task).insert(dict(task.model_dump(), created_by_user_id=user_id))
+    else:
+        db_task = Task(**task.model_dump(), created_by_user_id=user_id)
+        db.add(db_task)
+        await db.commit()
+        await db.refresh(db_task)
     
-    # Load the category relationship
-    await db.refresh(db_task, ["category"])
+    # The category was loaded by the check above; no second refresh needed
+    set_committed_value(db_task, "category", category)
+    await broker.publish(user_id, "task.created", _task_event_data(db_task))
     return db_task
 
 async def get_task(db: AsyncSession, task_id: int, user_id: int) -> Optional[Task]:
     result = await db.execute(
-        select(Task)
-        .options(selectinload(Task.category))
+        _select_tasks()
         .where(and_(Task.id == task_id, Task.created_by_user_id == user_id))
     )
     return result.scalar_one_or_none()
@@ -38,9 +75,10 @@ async def get_tasks(
     user_id: int, 
     filters: TaskFilter,
     skip: int = 0, 
-    limit: int = 100
+    limit: int = 100,
+    fields: Optional[Sequence[str]] = None
 ) -> List[Task]:
-    query = select(Task).options(selectinload(Task.category)).where(Task.created_by_user_id == user_id)
+    query = _select_tasks(fields).where(Task.created_by_user_id == user_id)
     
     if filters.is_completed is not None:
         query = query.where(Task.is_completed == filters.is_completed)
@@ -65,12 +103,16 @@ async def update_task(db: AsyncSession, task_id: int, user_id: int, task_update:
     
     # Validate category if being updated
     update_data = task_update.model_dump(exclude_unset=True)
-    if 'category_id' in update_data and update_data['category_id'] is not None:
-        category_result = await db.execute(
-            select(Category).where(and_(Category.id == update_data['category_id'], Category.created_by_user_id == user_id))
-        )
-        if not category_result.scalar_one_or_none():
-            raise ValueError("Category not found or doesn't belong to user")
+    category = db_task.category
+    if 'category_id' in update_data:
+        category = None
+        if update_data['category_id'] is not None:
+            category_result = await db.execute(
+                select(Category).where(and_(Category.id == update_data['category_id'], Category.created_by_user_id == user_id))
+            )
+            category = category_result.scalar_one_or_none()
+            if not category:
+                raise ValueError("Category not found or doesn't belong to user")
     
     for field, value in update_data.items():
         setattr(db_task, field, value)
@@ -78,8 +120,9 @@ async def update_task(db: AsyncSession, task_id: int, user_id: int, task_update:
     await db.commit()
     await db.refresh(db_task)
     
-    # Load the category relationship
-    await db.refresh(db_task, ["category"])
+    # Reuse the category loaded with the task (or by the check above)
+    set_committed_value(db_task, "category", category)
+    await broker.publish(user_id, "task.updated", _task_event_data(db_task))
     return db_task
 
 async def delete_task(db: AsyncSession, task_id: int, user_id: int) -> bool:
@@ -88,14 +131,15 @@ async def delete_task(db: AsyncSession, task_id: int, user_id: int) -> bool:
         return False
     
     await db.delete(db_task)
+    db.add(Tombstone(entity_type="task", entity_id=task_id, created_by_user_id=user_id))
     await db.commit()
+    await broker.publish(user_id, "task.deleted", {"id": task_id})
     return True
 
 async def get_overdue_tasks(db: AsyncSession) -> List[Task]:
     now = datetime.utcnow()
     result = await db.execute(
-        select(Task)
-        .options(selectinload(Task.category))
+        _select_tasks()
         .where(
             and_(
                 Task.due_date < now,
@@ -105,12 +149,101 @@ async def get_overdue_tasks(db: AsyncSession) -> List[Task]:
     )
     return result.scalars().all()
 
-async def get_tasks_by_category(db: AsyncSession, category_id: int, user_id: int, skip: int = 0, limit: int = 100) -> List[Task]:
+async def get_tasks_by_category(
+    db: AsyncSession,
+    category_id: int,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[Sequence[str]] = None,
+    category: Optional[Category] = None
+) -> List[Task]:
+    # Every row shares the same category, so reuse it when the caller already
+    # loaded it instead of joining it back in
+    reuse_category = category is not None and (fields is None or "category" in fields)
     result = await db.execute(
-        select(Task)
-        .options(selectinload(Task.category))
+        _select_tasks(fields, join_category=not reuse_category)
         .where(and_(Task.category_id == category_id, Task.created_by_user_id == user_id))
         .offset(skip)
         .limit(limit)
     )
-    return result.scalars().all()
\ No newline at end of file
+    tasks = result.scalars().all()
+    if reuse_category:
+        for task in tasks:
+            set_committed_value(task, "category", category)
+    return tasks
+
+async def get_tasks_updated_since(
+    db: AsyncSession, user_id: int, since: Optional[datetime] = None, after_id: int = 0, limit: Optional[int] = None
+) -> List[Task]:
+    # Range scan on ix_tasks_user_updated_at; pages are keyed by id, which
+    # doesn't move when a row is updated between two pages
+    query = _select_tasks().where(and_(Task.created_by_user_id == user_id, Task.id > after_id))
+    if since is not None:
+        query = query.where(Task.updated_at >= since)
+    result = await db.execute(query.order_by(Task.id).limit(limit))
+    return result.scalars().all()
+
+def _newly_overdue_condition(since: Optional[datetime], until: datetime):
+    if since is None:
+        # First scan: everything currently overdue
+        condition = Task.due_date <= until
+    else:
+        condition = or_(
+            and_(Task.due_date > since, Task.due_date <= until),
+            and_(Task.updated_at >= since - OVERDUE_EDIT_OVERLAP, Task.due_date <= since),
+        )
+    return and_(Task.is_completed == False, condition)
+
+async def stream_newly_overdue_tasks(
+    db: AsyncSession,
+    since: Optional[datetime],
+    until: datetime,
+    batch_size: int = 1000,
+    shard: Optional[Tuple[int, int]] = None
+) -> AsyncResult:
+    """Incomplete tasks that became overdue in (since, until], as (id, due_date) rows.
+    
+    Tasks whose due date was edited back to before ``since`` (or that were
+    reopened) never cross the window, so tasks updated after ``since`` with a
+    due date already past are included too. Rows are fetched ``batch_size`` at a time; iterate with
+    ``result.partitions()``. ``shard`` is (index, count): only tasks of users
+    whose id falls in that shard are returned.
+    """
+    query = select(Task.id, Task.due_date).where(_newly_overdue_condition(since, until))
+    if shard is not None:
+        index, count = shard
+        query = query.where(Task.created_by_user_id % count == index)
+    return await db.stream(query.execution_options(yield_per=batch_size))
+
+async def get_upcoming_due_dates(
+    db: AsyncSession,
+    after: Tuple[datetime, int],
+    until: datetime,
+    limit: int
+) -> List[Tuple[datetime, int]]:
+    """(due_date, id) of incomplete tasks due after the ``after`` key and up to ``until``.
+    
+    Keyset-paginated on (due_date, id) so a window cut off by ``limit`` can
+    be resumed from its last row without skipping tasks sharing a due date.
+    """
+    after_due, after_id = after
+    result = await db.execute(
+        select(Task.due_date, Task.id)
+        .where(
+            Task.is_completed == False,
+            Task.due_date <= until,
+            or_(Task.due_date > after_due, and_(Task.due_date == after_due, Task.id > after_id)),
+        )
+        .order_by(Task.due_date, Task.id)
+        .limit(limit)
+    )
+    return result.all()
+
+async def get_due_task_keys(db: AsyncSession, task_ids: Sequence[int], until: datetime) -> List[Tuple[int, datetime]]:
+    """(id, due_date) of the tasks among ``task_ids`` that are still incomplete and due by ``until``"""
+    result = await db.execute(
+        select(Task.id, Task.due_date)
+        .where(Task.id.in_(task_ids), Task.is_completed == False, Task.due_date <= until)
+    )
+    return result.all()
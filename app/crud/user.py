@@ -1,5 +1,6 @@
+import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from app.models.user import User
 from app.schemas.user import UserCreate
 from app.core.security import get_password_hash, verify_password
@@ -10,17 +11,25 @@ async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     return result.scalar_one_or_none()
 
 async def create_user(db: AsyncSession, user: UserCreate) -> User:
-    hashed_password = get_password_hash(user.password)
+    # bcrypt takes hundreds of ms; hash off the event loop
+    hashed_password = await asyncio.to_thread(get_password_hash, user.password)
     db_user = User(email=user.email, hashed_password=hashed_password)
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
     return db_user
 
+async def delete_user(db: AsyncSession, user_id: int) -> None:
+    await db.execute(delete(User).where(User.id == user_id))
+    await db.commit()
+
 async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
     user = await get_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    # End the lookup's transaction so the pooled connection isn't held while
+    # the password is checked off the event loop
+    await db.commit()
+    if not await asyncio.to_thread(verify_password, password, user.hashed_password):
         return None
     return user
\ No newline at end of file
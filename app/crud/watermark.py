@@ -0,0 +1,14 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.watermark import Watermark
+from typing import Optional
+from datetime import datetime
+
+async def get_watermark(db: AsyncSession, name: str) -> Optional[Watermark]:
+    return await db.get(Watermark, name)
+
+def set_watermark(db: AsyncSession, name: str, value: datetime, current: Optional[Watermark] = None) -> None:
+    """Stage the new watermark value (``current`` is what get_watermark returned); the caller commits"""
+    if current is None:
+        db.add(Watermark(name=name, value=value))
+    else:
+        current.value = value
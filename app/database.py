@@ -1,21 +1,110 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import time
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import DateTime, func
+from sqlalchemy import DateTime, event, func
 from datetime import datetime
+from typing import Dict, Optional
 from app.config import settings
+from app.core.metrics import record_query
+from app.core.slow_queries import SlowQueryLog
 
-# Support both PostgreSQL and SQLite
-if settings.database_url.startswith("sqlite"):
-    engine = create_async_engine(settings.database_url, echo=True, connect_args={"check_same_thread": False})
-else:
-    engine = create_async_engine(settings.database_url, echo=True)
+# SQLAlchemy's QueuePool defaults, used when DB_POOL_SIZE / DB_MAX_OVERFLOW are unset
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
 
-async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+_engine: Optional[AsyncEngine] = None
+_session_maker: Optional[async_sessionmaker] = None
+# Engines of the user-data shards (SHARD_URLS), by index
+_shard_engines: Dict[int, AsyncEngine] = {}
+_shard_session_makers: Dict[int, async_sessionmaker] = {}
+
+def instrument_engine(engine: AsyncEngine, slow_query_log: Optional[SlowQueryLog] = None) -> None:
+    """Attribute each statement and its duration to the request being handled,
+    and pass slow ones to ``slow_query_log``"""
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started_at = time.perf_counter()
+    
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._query_started_at
+        record_query(statement, duration)
+        if slow_query_log is not None:
+            slow_query_log.observe(statement, parameters, duration, executemany)
+
+def create_app_engine(database_url: Optional[str] = None) -> AsyncEngine:
+    database_url = database_url or settings.database_url
+    options = {}
+    # Support both PostgreSQL and SQLite
+    if database_url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+    # Set per worker by app.serve from the global connection budget
+    if settings.db_pool_size is not None:
+        options["pool_size"] = settings.db_pool_size
+    if settings.db_max_overflow is not None:
+        options["max_overflow"] = settings.db_max_overflow
+    return create_async_engine(database_url, echo=True, **options)
+
+def _create_instrumented_engine(database_url: Optional[str] = None) -> AsyncEngine:
+    engine = create_app_engine(database_url)
+    slow_query_log = SlowQueryLog(engine) if settings.slow_query_threshold_ms is not None else None
+    if settings.metrics_enabled or slow_query_log is not None:
+        instrument_engine(engine, slow_query_log)
+    return engine
+
+def pool_capacity() -> int:
+    """Connections each engine of this process may open: pool size plus overflow"""
+    pool_size = settings.db_pool_size if settings.db_pool_size is not None else DEFAULT_POOL_SIZE
+    max_overflow = settings.db_max_overflow if settings.db_max_overflow is not None else DEFAULT_MAX_OVERFLOW
+    return pool_size + max_overflow
+
+def get_engine() -> AsyncEngine:
+    """The app's engine, created on first use: by the lifespan when serving,
+    by whatever needs it first in workers and scripts"""
+    global _engine, _session_maker
+    if _engine is None:
+        _engine = _create_instrumented_engine()
+        _session_maker = async_sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+    return _engine
+
+def shard_session_maker(index: int) -> async_sessionmaker:
+    """Session factory for shard ``index`` of ``SHARD_URLS``, its engine created on first use"""
+    if index not in _shard_session_makers:
+        engine = _create_instrumented_engine(settings.shard_urls[index])
+        _shard_engines[index] = engine
+        _shard_session_makers[index] = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    return _shard_session_makers[index]
+
+def async_session_maker() -> AsyncSession:
+    """A new session on the app's engine"""
+    if _session_maker is None:
+        get_engine()
+    return _session_maker()
+
+async def dispose_engine() -> None:
+    """Close the pools; the next get_engine() starts a new one"""
+    global _engine, _session_maker
+    if _engine is not None:
+        await _engine.dispose()
+        _engine, _session_maker = None, None
+    for engine in _shard_engines.values():
+        await engine.dispose()
+    _shard_engines.clear()
+    _shard_session_makers.clear()
 
 class Base(DeclarativeBase):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
-async def get_async_session() -> AsyncSession:
+def get_shared_session(request: Request) -> Optional[AsyncSession]:
+    """Session shared by all sub-requests of a batch, if this is one"""
+    return getattr(request.state, "db_session", None)
+
+async def get_async_session(request: Request) -> AsyncSession:
+    shared_session = get_shared_session(request)
+    if shared_session is not None:
+        yield shared_session
+        return
     async with async_session_maker() as session:
         yield session
\ No newline at end of file
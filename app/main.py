@@ -1,12 +1,80 @@
-from fastapi import FastAPI
-from app.routers import auth, tasks, categories
+import os
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Response
+from fastapi.responses import ORJSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+from starlette.middleware.gzip import GZipMiddleware
+from app.config import settings
+from app.database import dispose_engine, get_engine
+from app.core.admission import AdmissionMiddleware
+from app.core.coalescing import InvalidateOnWriteMiddleware
+from app.core.events import broker
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.metrics import MetricsMiddleware, require_metrics_token
+from app.core.profiling import ProfilingMiddleware
+from app.core.query_guard import QueryGuardMiddleware
+from app.core.responses import MsgPackMiddleware
+from app.core.warmup import warmup
+from app.routers import auth, tasks, categories, batch, events, sync
 
-app = FastAPI(title="FastAPI Todo", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The engine is created here rather than at import, so importing the app stays cheap
+    engine = get_engine()
+    if settings.warmup_enabled:
+        await warmup(app, engine, settings.warmup_connections)
+    await broker.start()
+    # Every replica runs an election; only the one holding the lock scans
+    reminder_election = None
+    if settings.reminder_worker_in_app:
+        from app.workers.task_reminder import create_reminder_election
+        reminder_election = create_reminder_election()
+        await reminder_election.start()
+    yield
+    if reminder_election:
+        # Lets the current tick finish before releasing the lock
+        await reminder_election.stop()
+    await broker.stop()
+    await dispose_engine()
+
+app = FastAPI(
+    title="FastAPI Todo",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
+
+# Innermost, so a user's reads stop sharing results as soon as their write is answered
+if settings.coalescing_enabled:
+    app.add_middleware(InvalidateOnWriteMiddleware)
+# Stores responses before encoding, so a replay is encoded for the retry's own Accept headers
+app.add_middleware(IdempotencyMiddleware)
+# Response encoding: msgpack transcoding runs inside gzip so the final body is compressed
+app.add_middleware(MsgPackMiddleware)
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=settings.gzip_minimum_size,
+    compresslevel=settings.gzip_compress_level,
+)
+# Inside metrics, so time spent queued counts towards request time
+if settings.admission_enabled:
+    app.add_middleware(AdmissionMiddleware)
+# Outermost, so compression and transcoding count towards request time; the
+# query guard reuses its statement counts
+if settings.metrics_enabled:
+    app.add_middleware(QueryGuardMiddleware)
+    app.add_middleware(MetricsMiddleware)
+# Outside everything else, so profiles include encoding and its own report isn't transcoded
+if settings.profiling_token or settings.profiling_sample_rate:
+    app.add_middleware(ProfilingMiddleware)
 
 # Include routers
 app.include_router(auth.router)
 app.include_router(tasks.router)
 app.include_router(categories.router)
+app.include_router(batch.router)
+app.include_router(events.router)
+app.include_router(sync.router)
 
 @app.get("/")
 async def root():
@@ -14,4 +82,14 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+if settings.metrics_enabled:
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+    async def metrics():
+        registry = REGISTRY
+        if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+            # Under app.serve --workers N, merge what every worker wrote
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
\ No newline at end of file
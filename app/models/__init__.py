@@ -1,5 +1,8 @@
 from .user import User
 from .task import Task
 from .category import Category
+from .tombstone import Tombstone
+from .watermark import Watermark
+from .reminder import ReminderOutbox
 
-__all__ = ["User", "Task", "Category"]
+__all__ = ["User", "Task", "Category", "Tombstone", "Watermark", "ReminderOutbox"]
@@ -1,4 +1,4 @@
-from sqlalchemy import String, Text, ForeignKey
+from sqlalchemy import String, Text, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base
 from typing import Optional, TYPE_CHECKING, List
@@ -9,6 +9,10 @@ if TYPE_CHECKING:
 
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (
+        # Delta sync: a user's categories changed since a point in time
+        Index("ix_categories_user_updated_at", "created_by_user_id", "updated_at"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(100), index=True)
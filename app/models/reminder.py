@@ -0,0 +1,27 @@
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Index, UniqueConstraint, text
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+from datetime import datetime
+from typing import Optional
+
+# One row per reminder owed, written in the same transaction as the overdue
+# scan that found it; the delivery loop sets reminded_at once it went out
+class ReminderOutbox(Base):
+    __tablename__ = "reminder_outbox"
+    __table_args__ = (
+        # A task is reminded once per due date, however many scans see it
+        UniqueConstraint("task_id", "due_date", name="uq_reminder_outbox_task_due_date"),
+        # Delivery claims: only undelivered rows are indexed
+        Index(
+            "ix_reminder_outbox_pending", "next_attempt_at",
+            postgresql_where=text("reminded_at IS NULL"), sqlite_where=text("reminded_at IS NULL"),
+        ),
+    )
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.id", ondelete="CASCADE"))
+    due_date: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    reminded_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    last_error: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
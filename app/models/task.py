@@ -1,4 +1,4 @@
-from sqlalchemy import String, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import String, Text, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base
 from datetime import datetime
@@ -10,6 +10,13 @@ if TYPE_CHECKING:
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Delta sync: a user's tasks changed since a point in time
+        Index("ix_tasks_user_updated_at", "created_by_user_id", "updated_at"),
+        # Reminder scans: incomplete tasks by due date, and recently edited ones
+        Index("ix_tasks_completed_due_date", "is_completed", "due_date"),
+        Index("ix_tasks_completed_updated_at", "is_completed", "updated_at"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     title: Mapped[str] = mapped_column(String(255), index=True)
@@ -0,0 +1,15 @@
+from sqlalchemy import String, Integer, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+# Left behind when a task or category is deleted so delta sync can report it
+class Tombstone(Base):
+    __tablename__ = "tombstones"
+    __table_args__ = (
+        Index("ix_tombstones_user_created_at", "created_by_user_id", "created_at"),
+    )
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    entity_type: Mapped[str] = mapped_column(String(20))  # "task" or "category"
+    entity_id: Mapped[int] = mapped_column(Integer)
+    created_by_user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
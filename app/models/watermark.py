@@ -0,0 +1,11 @@
+from sqlalchemy import String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+from datetime import datetime
+
+# Progress marker for incremental background scans, one row per scan
+class Watermark(Base):
+    __tablename__ = "watermarks"
+    
+    name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    value: Mapped[datetime] = mapped_column(DateTime(timezone=True))
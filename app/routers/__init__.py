@@ -1,5 +1,11 @@
 from .auth import router as auth_router
 from .tasks import router as tasks_router
 from .categories import router as categories_router
+from .batch import router as batch_router
+from .events import router as events_router
+from .sync import router as sync_router
 
-__all__ = ["auth_router", "tasks_router", "categories_router"]
\ No newline at end of file
+__all__ = [
+    "auth_router", "tasks_router", "categories_router",
+    "batch_router", "events_router", "sync_router"
+]
\ No newline at end of file
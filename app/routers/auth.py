@@ -1,13 +1,19 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_async_session
+from app.core.query_guard import query_budget
 from app.schemas.user import UserCreate, UserLogin, Token, User
-from app.crud.user import create_user, authenticate_user, get_user_by_email
+from app.crud.user import create_user, authenticate_user, delete_user, get_user_by_email
 from app.core.security import create_access_token, create_refresh_token
+from app.core.sharding import replicate_user, sharding_enabled
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 @router.post("/register", response_model=User, status_code=status.HTTP_201_CREATED)
+@query_budget(4)
 async def register(user: UserCreate, db: AsyncSession = Depends(get_async_session)):
     db_user = await get_user_by_email(db, email=user.email)
     if db_user:
@@ -15,9 +21,25 @@ async def register(user: UserCreate, db: AsyncSession = Depends(get_async_sessio
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    return await create_user(db=db, user=user)
+    db_user = await create_user(db=db, user=user)
+    if sharding_enabled():
+        # Their tasks and categories reference the user on their shard
+        try:
+            await replicate_user(db_user)
+        except Exception as e:
+            # Without the shard copy the user couldn't store anything; undo
+            # the registration so retrying it starts over
+            logger.error(f"Copying user {db_user.id} to their shard failed: {e}")
+            await delete_user(db, db_user.id)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Registration is temporarily unavailable, try again",
+                headers={"Retry-After": "1"},
+            )
+    return db_user
 
 @router.post("/login", response_model=Token)
+@query_budget(1)
 async def login(user_credentials: UserLogin, db: AsyncSession = Depends(get_async_session)):
     user = await authenticate_user(db, user_credentials.email, user_credentials.password)
     if not user:
@@ -0,0 +1,162 @@
+import asyncio
+from typing import List, Optional
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.dependencies import get_current_user, get_user_session
+from app.models.user import User
+from app.schemas.batch import BatchRequest, BatchRequestItem, BatchResponse, BatchResponseItem
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+ALLOWED_PREFIXES = ("/tasks", "/categories", "/auth")
+
+# Relative cost of a sub-request; logins and registrations pay for bcrypt
+READ_COST = 1
+WRITE_COST = 2
+AUTH_COST = 10
+
+
+def _item_cost(item: BatchRequestItem) -> int:
+    if item.path.startswith("/auth"):
+        return AUTH_COST
+    return READ_COST if item.method == "GET" else WRITE_COST
+
+
+def _validate_batch(batch: BatchRequest) -> None:
+    if not batch.requests:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Batch is empty")
+    if len(batch.requests) > settings.batch_max_requests:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch exceeds {settings.batch_max_requests} requests"
+        )
+    for item in batch.requests:
+        if not item.path.startswith(ALLOWED_PREFIXES):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Path not allowed in a batch: {item.path}"
+            )
+    if sum(_item_cost(item) for item in batch.requests) > settings.batch_max_cost:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch exceeds a total cost of {settings.batch_max_cost}"
+        )
+
+
+async def _dispatch(
+    request: Request,
+    item: BatchRequestItem,
+    user: User,
+    session: Optional[AsyncSession]
+) -> BatchResponseItem:
+    """Run one sub-request through the app in-process"""
+    path, _, query = item.path.partition("?")
+    body = orjson.dumps(item.body) if item.body is not None else b""
+    headers = [(b"accept", b"application/json"), (b"content-type", b"application/json")]
+    authorization = request.headers.get("authorization")
+    if authorization:
+        headers.append((b"authorization", authorization.encode("latin-1")))
+
+    # Handed to the sub-request so it skips JWT decoding / the user lookup
+    # and, for sequential items, reuses the batch's session
+    state = {"current_user": user}
+    # The batch was admitted as a whole; its items don't queue again
+    state["admitted"] = True
+    if session is not None:
+        state["db_session"] = session
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": item.method,
+        "scheme": request.url.scheme,
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": headers,
+        "client": request.scope.get("client"),
+        "server": request.scope.get("server"),
+        "state": state,
+    }
+
+    request_sent = False
+    response_status = None
+    chunks: List[bytes] = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal response_status
+        if message["type"] == "http.response.start":
+            response_status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception:
+        # The server error middleware re-raises after sending its 500
+        if response_status is None:
+            response_status = status.HTTP_500_INTERNAL_SERVER_ERROR
+    if session is not None and response_status >= 500:
+        await session.rollback()
+
+    return BatchResponseItem(status=response_status, body=_decode_body(b"".join(chunks)))
+
+
+def _decode_body(raw: bytes):
+    if not raw:
+        return None
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return raw.decode(errors="replace")
+
+
+@router.post("", response_model=BatchResponse)
+async def run_batch(
+    batch: BatchRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_user_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Run several API calls in one round trip.
+
+    The caller is authenticated once. Writes run in order on one shared
+    session; runs of consecutive reads run concurrently (bounded by
+    ``BATCH_MAX_CONCURRENCY``), each on its own session since a session
+    cannot be used concurrently.
+    """
+    _validate_batch(batch)
+    semaphore = asyncio.Semaphore(settings.batch_max_concurrency)
+
+    async def dispatch_read(item: BatchRequestItem) -> BatchResponseItem:
+        async with semaphore:
+            return await _dispatch(request, item, current_user, None)
+
+    responses: List[BatchResponseItem] = []
+    reads: List[BatchRequestItem] = []
+    for item in batch.requests + [None]:
+        if item is not None and item.method == "GET":
+            reads.append(item)
+            continue
+        if len(reads) == 1:
+            responses.append(await _dispatch(request, reads[0], current_user, db))
+        elif reads:
+            responses.extend(await asyncio.gather(*(dispatch_read(read) for read in reads)))
+        reads = []
+        if item is not None:
+            responses.append(await _dispatch(request, item, current_user, db))
+
+    return BatchResponse(responses=responses)
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
-from app.database import get_async_session
-from app.core.dependencies import get_current_user
+from app.core.query_guard import query_budget
+from app.core.dependencies import get_current_user, get_user_session
+from app.core.coalescing import coalesce
+from app.core.responses import render
+from app.core.fieldsets import parse_fields, response_model_for
 from app.schemas.user import User
 from app.schemas.category import Category, CategoryCreate, CategoryUpdate, CategoryWithTaskCount
 from app.schemas.task import Task
@@ -13,9 +16,10 @@ from app.crud import task as crud_task
 router = APIRouter(prefix="/categories", tags=["categories"])
 
 @router.post("/", response_model=Category, status_code=status.HTTP_201_CREATED)
+@query_budget(4)
 async def create_category(
     category_data: CategoryCreate,
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_user_session),
     current_user: User = Depends(get_current_user)
 ):
     """Create a new category"""
@@ -30,23 +34,35 @@ async def create_category(
     return await crud_category.create_category(db, category_data, current_user.id)
 
 @router.get("/", response_model=List[Category])
+@query_budget(2)
 async def read_categories(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     with_task_count: bool = Query(False, description="Include task count for each category"),
-    db: AsyncSession = Depends(get_async_session),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return"),
+    db: AsyncSession = Depends(get_user_session),
     current_user: User = Depends(get_current_user)
 ):
     """Get all categories for the current user"""
-    if with_task_count:
-        return await crud_category.get_categories_with_task_count(db, current_user.id, skip, limit)
-    else:
-        return await crud_category.get_categories(db, current_user.id, skip, limit)
+    async def list_categories():
+        if with_task_count:
+            selected = parse_fields(fields, CategoryWithTaskCount)
+            categories = await crud_category.get_categories_with_task_count(db, current_user.id, skip, limit, selected)
+            return render(List[response_model_for(CategoryWithTaskCount, selected)], categories)
+        else:
+            selected = parse_fields(fields, Category)
+            categories = await crud_category.get_categories(db, current_user.id, skip, limit, selected)
+            return render(List[response_model_for(Category, selected)], categories)
+    
+    # Identical concurrent requests (several tabs, retries) share one query
+    return await coalesce(request, current_user.id, list_categories)
 
 @router.get("/{category_id}", response_model=Category)
+@query_budget(2)
 async def read_category(
     category_id: int,
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_user_session),
     current_user: User = Depends(get_current_user)
 ):
     """Get a specific category"""
@@ -59,10 +75,11 @@ async def read_category(
     return category
 
 @router.put("/{category_id}", response_model=Category)
+@query_budget(4)
 async def update_category(
     category_id: int,
     category_update: CategoryUpdate,
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_user_session),
     current_user: User = Depends(get_current_user)
 ):
     """Update a category"""
@@ -84,9 +101,10 @@ async def update_category(
     return category
 
 @router.delete("/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(6)
 async def delete_category(
     category_id: int,
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_user_session),
     current_user: User = Depends(get_current_user)
 ):
     """Delete a category (tasks in this category will have their category set to None)"""
@@ -98,14 +116,17 @@ async def delete_category(
         )
 
 @router.get("/{category_id}/tasks", response_model=List[Task])
+@query_budget(3)
 async def read_category_tasks(
     category_id: int,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    db: AsyncSession = Depends(get_async_session),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return"),
+    db: AsyncSession = Depends(get_user_session),
     current_user: User = Depends(get_current_user)
 ):
     """Get all tasks in a specific category"""
+    selected = parse_fields(fields, Task)
     # First check if category exists and belongs to user
     category = await crud_category.get_category(db, category_id, current_user.id)
     if not category:
@@ -114,4 +135,5 @@ async def read_category_tasks(
             detail="Category not found"
         )
     
-    return await crud_task.get_tasks_by_category(db, category_id, current_user.id, skip, limit)
+    tasks = await crud_task.get_tasks_by_category(db, category_id, current_user.id, skip, limit, selected, category)
+    return render(List[response_model_for(Task, selected)], tasks)
@@ -0,0 +1,56 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import get_async_session
+from app.core.query_guard import query_budget
+from app.core.dependencies import get_current_active_user
+from app.core.events import broker, Subscription
+from app.models.user import User
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+RESET_EVENT = b"event: reset\ndata: {}\n\n"
+KEEPALIVE = b": keepalive\n\n"
+
+
+async def _event_stream(subscription: Subscription):
+    try:
+        while True:
+            if subscription.reset and subscription.queue.empty():
+                # Too far behind to resume: tell the client to resync with GET /tasks
+                yield RESET_EVENT
+                return
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=settings.events_keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE
+                continue
+            yield event.encode()
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@router.get("")
+@query_budget(1)
+async def stream_events(
+    last_event_id: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream the current user's task and category changes as Server-Sent Events"""
+    # Release the pooled connection used for authentication; the stream can
+    # stay open for hours and never touches the database again
+    await db.close()
+
+    resume_from = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    subscription = broker.subscribe(current_user.id, resume_from)
+    return StreamingResponse(
+        _event_stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,123 @@
+import base64
+import binascii
+from dataclasses import dataclass
+from datetime import datetime, timedelta, UTC
+from typing import Optional, Tuple
+
+import orjson
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.query_guard import query_budget
+from app.core.dependencies import get_current_active_user, get_user_session
+from app.core.responses import render
+from app.schemas.sync import SyncResponse
+from app.crud import category as crud_category
+from app.crud import sync as crud_sync
+from app.crud import task as crud_task
+from app.models.user import User
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+@dataclass
+class SyncPosition:
+    since: Optional[datetime]  # start of the window; None for a full sync
+    # Set while paging: the next sync's start, fixed by the first page, and
+    # the last task, category and tombstone id already returned
+    until: Optional[datetime] = None
+    after: Tuple[int, int, int] = (0, 0, 0)
+
+
+def encode_sync_token(point: datetime) -> str:
+    return base64.urlsafe_b64encode(point.isoformat().encode()).decode()
+
+
+def encode_page_token(position: SyncPosition) -> str:
+    payload = {
+        "since": position.since.isoformat() if position.since else None,
+        "until": position.until.isoformat(),
+        "after": position.after,
+    }
+    return base64.urlsafe_b64encode(orjson.dumps(payload)).decode()
+
+
+def _parse_point(value: str) -> datetime:
+    point = datetime.fromisoformat(value)
+    if point.tzinfo is None:
+        raise ValueError("naive sync point")
+    return point
+
+
+def decode_sync_token(token: str) -> SyncPosition:
+    try:
+        raw = base64.urlsafe_b64decode(token.encode())
+        if not raw.startswith(b"{"):
+            return SyncPosition(_parse_point(raw.decode()))
+        payload = orjson.loads(raw)
+        since = _parse_point(payload["since"]) if payload["since"] is not None else None
+        after = tuple(int(last_id) for last_id in payload["after"])
+        if len(after) != 3:
+            raise ValueError("bad page position")
+        return SyncPosition(since, _parse_point(payload["until"]), after)
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token")
+
+
+@router.get("", response_model=SyncResponse)
+@query_budget(4)
+async def sync_changes(
+    since: Optional[str] = Query(None, description="sync_token returned by the previous sync"),
+    limit: int = Query(500, ge=1, le=1000, description="Most tasks, categories and deletes each per page"),
+    db: AsyncSession = Depends(get_user_session),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get tasks and categories created, updated or deleted since the last sync.
+
+    At most ``limit`` rows of each kind are returned. With ``has_more`` set,
+    ``sync_token`` continues the same sync: call again with it until
+    ``has_more`` is false, then keep that last token for the next sync.
+    """
+    now = datetime.now(UTC)
+    position = decode_sync_token(since) if since else SyncPosition(None)
+    since_point = position.since
+    if since_point and since_point < now - timedelta(days=settings.sync_tombstone_retention_days):
+        # Tombstones this old may have been purged; deletes could be missed
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Sync token expired, sync again without one")
+
+    # The next token lags behind now so rows committed by transactions that
+    # are still in flight get picked up next time (clients apply changes
+    # idempotently, so the overlap only costs a few repeated rows). Later
+    # pages keep the first page's, so nothing changed meanwhile is skipped.
+    next_point = position.until or now - timedelta(seconds=settings.sync_lag_seconds)
+
+    # One extra row of each kind tells whether another page follows
+    after_task, after_category, after_deleted = position.after
+    tasks = await crud_task.get_tasks_updated_since(db, current_user.id, since_point, after_task, limit + 1)
+    categories = await crud_category.get_categories_updated_since(
+        db, current_user.id, since_point, after_category, limit + 1
+    )
+    deleted = await crud_sync.get_tombstones_since(
+        db, current_user.id, since_point, after_deleted, limit + 1
+    ) if since_point else []
+
+    has_more = any(len(rows) > limit for rows in (tasks, categories, deleted))
+    tasks, categories, deleted = tasks[:limit], categories[:limit], deleted[:limit]
+    if has_more:
+        after = tuple(
+            rows[-1].id if rows else last_id for rows, last_id in zip((tasks, categories, deleted), position.after)
+        )
+        sync_token = encode_page_token(SyncPosition(since_point, next_point, after))
+    else:
+        sync_token = encode_sync_token(next_point)
+
+    return render(SyncResponse, {
+        "tasks": tasks,
+        "categories": categories,
+        "deleted": deleted,
+        "sync_token": sync_token,
+        "full": since_point is None,
+        "has_more": has_more,
+    })
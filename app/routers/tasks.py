@@ -1,46 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
-from app.database import get_async_session
+from app.core.query_guard import query_budget
 from app.schemas.task import Task, TaskCreate, TaskUpdate, TaskFilter
 from app.crud.task import create_task, get_tasks, get_task, update_task, delete_task
-from app.core.dependencies import get_current_active_user
+from app.core.dependencies import get_current_active_user, get_user_session
+from app.core.coalescing import coalesce
+from app.core.responses import render
+from app.core.fieldsets import parse_fields, response_model_for
 from app.models.user import User
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
 @router.post("/", response_model=Task, status_code=status.HTTP_201_CREATED)
+@query_budget(4)
 async def create_new_task(
     task: TaskCreate,
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_user_session),
     current_user: User = Depends(get_current_active_user)
 ):
     return await create_task(db=db, task=task, user_id=current_user.id)
 
 @router.get("/", response_model=List[Task])
+@query_budget(2)
 async def read_tasks(
+    request: Request,
     is_completed: Optional[bool] = Query(None),
     due_date_from: Optional[datetime] = Query(None),
     due_date_to: Optional[datetime] = Query(None),
     category_id: Optional[int] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: AsyncSession = Depends(get_async_session),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return"),
+    db: AsyncSession = Depends(get_user_session),
     current_user: User = Depends(get_current_active_user)
 ):
-    filters = TaskFilter(
-        is_completed=is_completed,
-        due_date_from=due_date_from,
-        due_date_to=due_date_to,
-        category_id=category_id
-    )
-    return await get_tasks(db=db, user_id=current_user.id, filters=filters, skip=skip, limit=limit)
+    async def list_tasks():
+        filters = TaskFilter(
+            is_completed=is_completed,
+            due_date_from=due_date_from,
+            due_date_to=due_date_to,
+            category_id=category_id
+        )
+        selected = parse_fields(fields, Task)
+        tasks = await get_tasks(db=db, user_id=current_user.id, filters=filters, skip=skip, limit=limit, fields=selected)
+        return render(List[response_model_for(Task, selected)], tasks)
+    
+    # Identical concurrent requests (several tabs, retries) share one query
+    return await coalesce(request, current_user.id, list_tasks)
 
 @router.get("/{task_id}", response_model=Task)
+@query_budget(2)
 async def read_task(
     task_id: int,
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_user_session),
     current_user: User = Depends(get_current_active_user)
 ):
     task = await get_task(db=db, task_id=task_id, user_id=current_user.id)
@@ -49,10 +63,11 @@ async def read_task(
     return task
 
 @router.patch("/{task_id}", response_model=Task)
+@query_budget(4)
 async def update_existing_task(
     task_id: int,
     task_update: TaskUpdate,
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_user_session),
     current_user: User = Depends(get_current_active_user)
 ):
     updated_task = await update_task(db=db, task_id=task_id, user_id=current_user.id, task_update=task_update)
@@ -61,9 +76,10 @@ async def update_existing_task(
     return updated_task
 
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(4)
 async def delete_existing_task(
     task_id: int,
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_user_session),
     current_user: User = Depends(get_current_active_user)
 ):
     deleted = await delete_task(db=db, task_id=task_id, user_id=current_user.id)
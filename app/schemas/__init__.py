@@ -1,9 +1,11 @@
 from .user import UserCreate, User, UserLogin, Token
 from .task import TaskCreate, TaskUpdate, Task
 from .category import CategoryCreate, CategoryUpdate, Category, CategoryWithTaskCount
+from .batch import BatchRequest, BatchResponse
 
 __all__ = [
     "UserCreate", "User", "UserLogin", "Token",
     "TaskCreate", "TaskUpdate", "Task",
-    "CategoryCreate", "CategoryUpdate", "Category", "CategoryWithTaskCount"
+    "CategoryCreate", "CategoryUpdate", "Category", "CategoryWithTaskCount",
+    "BatchRequest", "BatchResponse"
 ]
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Any, List, Literal, Optional
+
+class BatchRequestItem(BaseModel):
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"]
+    path: str  # e.g. "/tasks/?is_completed=false"
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchRequestItem]
+
+class BatchResponseItem(BaseModel):
+    status: int
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchResponseItem]
@@ -0,0 +1,18 @@
+from pydantic import BaseModel, ConfigDict
+from typing import List
+from app.schemas.task import Task
+from app.schemas.category import Category
+
+class DeletedEntity(BaseModel):
+    entity_type: str  # "task" or "category"
+    entity_id: int
+    
+    model_config = ConfigDict(from_attributes=True)
+
+class SyncResponse(BaseModel):
+    tasks: List[Task]
+    categories: List[Category]
+    deleted: List[DeletedEntity]
+    sync_token: str
+    full: bool  # True for a sync started without a token: everything, not changes
+    has_more: bool = False  # another page follows; sync_token continues this sync
@@ -0,0 +1,177 @@
+"""Production entry point: ``python -m app.serve [--workers N] [--port 8000]``.
+
+Runs N uvicorn workers accepting on one socket bound by the parent, so a
+single port uses every core. Workers that exit (after ``--max-requests``,
+or on a crash) are replaced. SIGTERM or Ctrl+C stops accepting, gives
+in-flight requests ``--graceful-timeout`` seconds and runs each worker's
+lifespan shutdown.
+
+``--db-connection-budget`` is how many database connections the whole
+server may hold, e.g. Postgres ``max_connections`` minus what other
+clients need. It is split evenly into each worker's pool, with no
+overflow, so the server can never hold more than the budget.
+
+With several workers, Prometheus metrics are written to
+``PROMETHEUS_MULTIPROC_DIR`` (a temporary directory unless set) and
+``/metrics`` merges every worker's. The in-memory event broker can't reach
+other workers' subscribers, so it is refused; set ``EVENTS_BACKEND=redis``.
+Admission limits, read coalescing and the in-memory idempotency store stay
+per worker; the startup summary says so.
+"""
+import argparse
+import functools
+import logging
+import os
+import random
+import sys
+import tempfile
+from typing import List, Optional, Sequence, Tuple
+
+import uvicorn
+from uvicorn.supervisors.multiprocess import Multiprocess
+
+from app.config import settings
+from app.database import DEFAULT_MAX_OVERFLOW, DEFAULT_POOL_SIZE
+
+logger = logging.getLogger("uvicorn.error")
+
+APP = "app.main:app"
+
+
+def pool_per_worker(workers: int, budget: Optional[int]) -> Tuple[int, int]:
+    """(pool_size, max_overflow) for each worker's engine"""
+    if budget is None:
+        return (
+            settings.db_pool_size if settings.db_pool_size is not None else DEFAULT_POOL_SIZE,
+            settings.db_max_overflow if settings.db_max_overflow is not None else DEFAULT_MAX_OVERFLOW,
+        )
+    if budget < workers:
+        raise ValueError(f"A budget of {budget} connections can't give each of {workers} workers one")
+    return budget // workers, 0
+
+
+def multiprocess_metrics_dir() -> str:
+    """Directory the workers write their metrics to, emptied for this run.
+
+    Set in the environment before the workers start, so prometheus_client
+    picks it up on import in each of them.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="todo-metrics-")
+    os.makedirs(path, exist_ok=True)
+    # Samples left by a previous run's workers would be merged into this one's
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=settings.serve_host)
+    parser.add_argument("--port", type=int, default=settings.serve_port)
+    parser.add_argument("--workers", type=int, default=settings.serve_workers or os.cpu_count() or 1)
+    parser.add_argument("--db-connection-budget", type=int, default=settings.serve_db_connection_budget)
+    parser.add_argument("--max-requests", type=int, default=settings.serve_max_requests)
+    parser.add_argument("--max-requests-jitter", type=int, default=settings.serve_max_requests_jitter)
+    parser.add_argument("--graceful-timeout", type=int, default=settings.serve_graceful_timeout)
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args(argv)
+
+
+class Supervisor(Multiprocess):
+    """uvicorn's worker supervisor, refusing SIGTTIN: an extra worker would
+    open a pool beyond the connection budget the others were sized for"""
+
+    def handle_ttin(self) -> None:
+        logger.warning("Ignoring SIGTTIN: restart with --workers to change the worker count")
+
+
+def _run_worker(server: uvicorn.Server, jitter: int, sockets: Optional[List] = None) -> None:
+    # Stagger recycling, so workers started together don't all restart at once
+    if server.config.limit_max_requests is not None and jitter:
+        server.config.limit_max_requests += random.randint(0, jitter)
+    try:
+        server.run(sockets=sockets)
+    finally:
+        if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+            # Drop this worker's live gauges (admission in flight and queued)
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(os.getpid())
+
+
+def summary(
+    args: argparse.Namespace, pool_size: int, max_overflow: int, metrics_dir: Optional[str] = None
+) -> str:
+    per_worker = pool_size + max_overflow
+    if args.max_requests is None:
+        recycle = "never"
+    else:
+        recycle = f"after {args.max_requests}-{args.max_requests + args.max_requests_jitter} requests"
+    budget = f"budget {args.db_connection_budget}" if args.db_connection_budget is not None else "no budget set"
+    lines = [
+        f"Serving {APP} on http://{args.host}:{args.port} (supervisor pid {os.getpid()})",
+        f"  workers:          {args.workers}{' on a shared socket' if args.workers > 1 else ''}",
+        f"  db pool/worker:   {pool_size} + {max_overflow} overflow",
+        f"  db connections:   at most {per_worker * args.workers} ({budget})",
+        f"  recycle workers:  {recycle}",
+        f"  graceful timeout: {args.graceful_timeout}s",
+    ]
+    if args.workers > 1:
+        per_process = ["admission limits and queues", "read coalescing"]
+        if settings.idempotency_backend != "redis":
+            per_process.append("idempotency keys (IDEMPOTENCY_BACKEND=memory)")
+        lines += [
+            f"  metrics:          merged across workers from {metrics_dir}",
+            f"  per worker:       {', '.join(per_process)}",
+        ]
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        pool_size, max_overflow = pool_per_worker(args.workers, args.db_connection_budget)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    if args.workers > 1 and settings.events_backend != "redis":
+        # Each worker would only stream the writes it handled itself
+        print(
+            f"error: EVENTS_BACKEND={settings.events_backend} can't fan events out across {args.workers} workers; "
+            "set EVENTS_BACKEND=redis or run --workers 1",
+            file=sys.stderr,
+        )
+        return 2
+    metrics_dir = multiprocess_metrics_dir() if args.workers > 1 else None
+
+    # Workers are fresh interpreters that read their settings from the environment
+    os.environ["DB_POOL_SIZE"] = str(pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = str(max_overflow)
+    settings.db_pool_size, settings.db_max_overflow = pool_size, max_overflow
+
+    config = uvicorn.Config(
+        APP,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        limit_max_requests=args.max_requests,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+    )
+    print(summary(args, pool_size, max_overflow, metrics_dir), flush=True)
+
+    server = uvicorn.Server(config)
+    if args.workers == 1:
+        server.run()
+        return 0
+    sock = config.bind_socket()
+    try:
+        Supervisor(config, target=functools.partial(_run_worker, server, args.max_requests_jitter), sockets=[sock]).run()
+    finally:
+        sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
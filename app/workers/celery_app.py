@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+from celery import Celery, group
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from app.config import settings
+from app.core.sharding import data_urls
+from app.workers.reminder_sinks import create_sink
+from app.workers.task_reminder import check_overdue_tasks, deliver_reminders, purge_expired_tombstones
+
+logger = logging.getLogger(__name__)
+
+celery_app = Celery("todo", broker=settings.redis_url)
+celery_app.conf.update(
+    # Eager mode runs tasks inline, so no broker or worker is needed locally
+    task_always_eager=settings.celery_task_always_eager,
+    task_eager_propagates=True,
+    # A shard lost with its worker is redelivered; rerunning one is safe since
+    # its watermark only moves on commit
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    beat_schedule={
+        "fan-out-reminders": {
+            "task": "app.workers.celery_app.fan_out_reminders",
+            "schedule": float(settings.reminder_interval_seconds),
+            # A fan-out that can't start before the next beat is superseded by it
+            "options": {"expires": settings.reminder_interval_seconds},
+        },
+        "deliver-reminders": {
+            "task": "app.workers.celery_app.deliver_reminder_outbox",
+            "schedule": float(settings.reminder_interval_seconds),
+            "options": {"expires": settings.reminder_interval_seconds},
+        },
+        "purge-tombstones": {
+            "task": "app.workers.celery_app.purge_sync_tombstones",
+            "schedule": float(settings.tombstone_purge_interval_seconds),
+            "options": {"expires": settings.tombstone_purge_interval_seconds},
+        },
+    },
+)
+
+async def _on_each_database(work: Callable[[async_sessionmaker], Awaitable[int]]) -> int:
+    """Run ``work`` on every database holding user data at once (each shard
+    with SHARD_URLS set, otherwise the one database); returns the total"""
+    # Every task runs in a fresh event loop, so pooled connections from a
+    # previous one can't be reused; open and dispose pool-less engines
+    engines = [create_async_engine(url, poolclass=NullPool) for url in data_urls()]
+    try:
+        counts = await asyncio.gather(*(
+            work(async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)) for engine in engines
+        ))
+        return sum(counts)
+    finally:
+        for engine in engines:
+            await engine.dispose()
+
+async def _check_shard(shard: int, shard_count: int) -> int:
+    return await _on_each_database(
+        lambda session_maker: check_overdue_tasks(session_maker, shard=(shard, shard_count))
+    )
+
+async def _deliver() -> int:
+    sink = create_sink()
+    try:
+        return await _on_each_database(lambda session_maker: deliver_reminders(sink, session_maker))
+    finally:
+        await sink.close()
+
+@celery_app.task(name="app.workers.celery_app.check_overdue_shard")
+def check_overdue_shard(shard: int, shard_count: int) -> int:
+    """Queue reminders for one shard of users (``created_by_user_id % shard_count == shard``)"""
+    return asyncio.run(_check_shard(shard, shard_count))
+
+@celery_app.task(name="app.workers.celery_app.fan_out_reminders")
+def fan_out_reminders(shard_count: int = 0) -> int:
+    """Queue one overdue check per shard so workers process them in parallel.
+
+    Each shard keeps its own watermark; changing the shard count starts
+    fresh watermarks, so the first tick after a change rescans the backlog
+    (the outbox drops reminders that were already queued).
+    """
+    shard_count = shard_count or settings.reminder_shards
+    group(check_overdue_shard.s(shard, shard_count) for shard in range(shard_count)).apply_async()
+    logger.info(f"Queued reminder checks for {shard_count} shards")
+    return shard_count
+
+@celery_app.task(name="app.workers.celery_app.deliver_reminder_outbox")
+def deliver_reminder_outbox() -> int:
+    """Deliver queued reminders; several can run at once since claims skip locked rows"""
+    return asyncio.run(_deliver())
+
+@celery_app.task(name="app.workers.celery_app.purge_sync_tombstones")
+def purge_sync_tombstones() -> int:
+    """Delete tombstones past the sync retention on every database"""
+    return asyncio.run(_on_each_database(purge_expired_tombstones))
@@ -0,0 +1,210 @@
+import asyncio
+import fcntl
+import logging
+import os
+import tempfile
+import zlib
+from typing import Awaitable, Callable, Optional, Set
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class LeaderLock:
+    """A lock at most one replica holds; ``acquire`` never blocks"""
+
+    async def acquire(self) -> bool:
+        raise NotImplementedError
+
+    async def still_held(self) -> bool:
+        """Called periodically by the leader; False means leadership was lost"""
+        return True
+
+    async def release(self) -> None:
+        raise NotImplementedError
+
+class AdvisoryLock(LeaderLock):
+    """Postgres session-level advisory lock on a dedicated connection.
+
+    The lock lives as long as the connection, so if the leader dies or its
+    connection drops, Postgres releases it and a standby can take over. The
+    connection is opened outside ``engine``'s pool, which is sized for
+    requests and would otherwise lose one for as long as this replica leads.
+    """
+
+    def __init__(self, engine: AsyncEngine, name: str) -> None:
+        self.engine = create_async_engine(engine.url, poolclass=NullPool)
+        self.key = zlib.crc32(name.encode())
+        self._conn: Optional[AsyncConnection] = None
+
+    async def acquire(self) -> bool:
+        conn = await self.engine.connect()
+        try:
+            acquired = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key})).scalar()
+            # Don't sit idle in a transaction while holding the lock
+            await conn.commit()
+        except Exception:
+            await conn.close()
+            raise
+        if not acquired:
+            await conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    async def still_held(self) -> bool:
+        try:
+            await self._conn.execute(text("SELECT 1"))
+            await self._conn.commit()
+            return True
+        except Exception as e:
+            logger.warning(f"Lost the connection holding the leader lock: {e}")
+            await self._conn.invalidate()
+            self._conn = None
+            return False
+
+    async def release(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            await self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            await self._conn.commit()
+        finally:
+            await self._conn.close()
+            self._conn = None
+
+class FileLock(LeaderLock):
+    """flock() on a local file: elects one process per host (enough for SQLite)"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fd: Optional[int] = None
+
+    async def acquire(self) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    async def release(self) -> None:
+        if self._fd is None:
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+class InMemoryLock(LeaderLock):
+    """Elects one holder among the instances sharing ``name`` in this process"""
+
+    _held: Set[str] = set()
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._holding = False
+
+    async def acquire(self) -> bool:
+        if self.name in self._held:
+            return False
+        self._held.add(self.name)
+        self._holding = True
+        return True
+
+    async def release(self) -> None:
+        if self._holding:
+            self._held.discard(self.name)
+            self._holding = False
+
+class LeaderElection:
+    """Run ``work`` only while holding ``lock``.
+
+    Standbys retry the lock every ``interval`` seconds and the leader checks
+    it still holds it just as often, so failover takes at most about one
+    interval once the old leader is gone. ``work`` gets an event that is set
+    on shutdown and should return soon after; it is cancelled if it takes
+    longer than ``shutdown_timeout`` or when leadership is lost.
+    """
+
+    def __init__(
+        self,
+        lock: LeaderLock,
+        work: Callable[[asyncio.Event], Awaitable[None]],
+        interval: float,
+        shutdown_timeout: float = 10.0
+    ) -> None:
+        self.lock = lock
+        self.work = work
+        self.interval = interval
+        self.shutdown_timeout = shutdown_timeout
+        self.is_leader = False
+        self._stopping = asyncio.Event()
+        self._work_task: Optional[asyncio.Task] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._stopping.clear()
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._runner is not None:
+            await self._runner
+            self._runner = None
+
+    async def _run(self) -> None:
+        try:
+            while not self._stopping.is_set():
+                try:
+                    if not self.is_leader:
+                        if await self.lock.acquire():
+                            logger.info("Acquired the leader lock, starting work")
+                            self.is_leader = True
+                            self._work_task = asyncio.create_task(self.work(self._stopping))
+                    elif not await self.lock.still_held() or self._work_task.done():
+                        await self._step_down()
+                except Exception as e:
+                    logger.error(f"Leader election error: {e}")
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self.is_leader:
+                await self._step_down(graceful=True)
+
+    async def _step_down(self, graceful: bool = False) -> None:
+        work, self._work_task = self._work_task, None
+        if work is not None and not work.done():
+            if graceful:
+                try:
+                    await asyncio.wait_for(asyncio.shield(work), self.shutdown_timeout)
+                except asyncio.TimeoutError:
+                    logger.warning("Work did not stop in time, cancelling it")
+            work.cancel()
+            try:
+                await work
+            except asyncio.CancelledError:
+                pass
+        elif work is not None and not work.cancelled() and work.exception() is not None:
+            logger.error(f"Leader work failed: {work.exception()}")
+        self.is_leader = False
+        try:
+            await self.lock.release()
+        except Exception as e:
+            logger.error(f"Failed to release the leader lock: {e}")
+        logger.info("Gave up the leader lock")
+
+def create_leader_lock(name: str, engine: AsyncEngine) -> LeaderLock:
+    backend = settings.leader_lock_backend
+    if backend == "auto":
+        backend = "advisory" if engine.dialect.name == "postgresql" else "file"
+    if backend == "advisory":
+        return AdvisoryLock(engine, name)
+    if backend == "file":
+        return FileLock(settings.leader_lock_path or os.path.join(tempfile.gettempdir(), f"{name}.lock"))
+    return InMemoryLock(name)
@@ -0,0 +1,241 @@
+import asyncio
+import heapq
+import logging
+import sys
+from datetime import datetime, timedelta, UTC
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.config import settings
+from app.database import async_session_maker
+from app.core.events import broker, Event, EventBroker
+from app.crud.task import get_upcoming_due_dates, get_due_task_keys
+from app.crud.reminder import enqueue_reminders
+from app.workers.reminder_sinks import ReminderSink, create_sink
+from app.workers.task_reminder import deliver_reminders, _as_utc
+
+logger = logging.getLogger(__name__)
+
+# Sorts after every real task id, so (due, MAX_ID) covers everything due at ``due``
+MAX_ID = sys.maxsize
+RETRY_DELAY = timedelta(seconds=30)
+
+class Clock:
+    """Wall clock the scheduler reads and sleeps against"""
+
+    def now(self) -> datetime:
+        return datetime.now(UTC)
+
+    async def sleep_until(self, deadline: datetime, wake: asyncio.Event) -> None:
+        """Return at ``deadline`` or as soon as ``wake`` is set, whichever comes first"""
+        timeout = max((deadline - self.now()).total_seconds(), 0)
+        try:
+            await asyncio.wait_for(wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+class FakeClock(Clock):
+    """Clock that only moves when ``advance`` is called (for tests)"""
+
+    def __init__(self, start: datetime) -> None:
+        self._now = start
+        self._sleepers: List[Tuple[datetime, asyncio.Event]] = []
+
+    def now(self) -> datetime:
+        return self._now
+
+    async def sleep_until(self, deadline: datetime, wake: asyncio.Event) -> None:
+        if deadline <= self._now:
+            return
+        sleeper = (deadline, asyncio.Event())
+        self._sleepers.append(sleeper)
+        waiters = [asyncio.ensure_future(wake.wait()), asyncio.ensure_future(sleeper[1].wait())]
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+            self._sleepers.remove(sleeper)
+
+    def advance(self, seconds: float) -> None:
+        self._now += timedelta(seconds=seconds)
+        for deadline, timer in self._sleepers:
+            if deadline <= self._now:
+                timer.set()
+
+class ReminderScheduler:
+    """Fire reminders at the exact moment tasks become due.
+
+    Upcoming due dates of incomplete tasks are kept in a min-heap of
+    (due_date, task_id), and the scheduler sleeps until the earliest one.
+    Only tasks due within ``horizon`` are held, at most ``max_scheduled`` per
+    window load; when the clock reaches the end of the loaded window the next
+    one is read from the database. Task events from the broker keep the heap
+    current in between: entries are replaced or dropped lazily, and due tasks
+    are re-read (still incomplete, still due) before their reminders are
+    queued in the outbox, so a missed event can't cause a wrong reminder.
+    The outbox is drained right away, and since it is keyed on (task, due
+    date) the polling worker never reminds about the same task again.
+
+    Only tasks due after ``start`` are covered; the polling worker in
+    ``task_reminder`` remains the catch-up for anything due while no
+    scheduler was running.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker = async_session_maker,
+        events: EventBroker = broker,
+        clock: Optional[Clock] = None,
+        horizon: timedelta = timedelta(seconds=settings.reminder_horizon_seconds),
+        max_scheduled: int = settings.reminder_max_scheduled,
+        batch_size: int = settings.reminder_batch_size,
+        concurrency: int = settings.reminder_concurrency,
+        sink: Optional[ReminderSink] = None
+    ) -> None:
+        self.session_maker = session_maker
+        self.events = events
+        self.clock = clock or Clock()
+        self.horizon = horizon
+        self.max_scheduled = max_scheduled
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.sink = sink or create_sink()
+        self._heap: List[Tuple[datetime, int]] = []
+        self._scheduled: Dict[int, datetime] = {}
+        # (due_date, id) key of the last task read from the database; tasks
+        # after it are not in the heap yet and events for them are ignored
+        self._loaded_until: Tuple[datetime, int] = (self.clock.now(), MAX_ID)
+        # Events that arrive while a window is being read, replayed afterwards
+        self._pending: Optional[List[Event]] = None
+        self._wake = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._scheduled)
+
+    async def start(self) -> None:
+        """Load the first window, then keep firing reminders in the background"""
+        self._loaded_until = (self.clock.now(), MAX_ID)
+        self.events.add_listener(self.on_event)
+        await self.tick()
+        self._runner = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        self.events.remove_listener(self.on_event)
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    def on_event(self, event: Event) -> None:
+        if not event.type.startswith("task."):
+            return
+        if self._pending is not None:
+            self._pending.append(event)
+            return
+        self._apply(event)
+        self._wake.set()
+
+    def _apply(self, event: Event) -> None:
+        task_id = event.data["id"]
+        self._scheduled.pop(task_id, None)
+        if event.type == "task.deleted" or event.data.get("is_completed") or not event.data.get("due_date"):
+            return
+        due = _as_utc(datetime.fromisoformat(event.data["due_date"]))
+        if (due, task_id) <= self._loaded_until:
+            self._push(due, task_id)
+
+    def _push(self, due: datetime, task_id: int) -> None:
+        self._scheduled[task_id] = due
+        heapq.heappush(self._heap, (due, task_id))
+        # Superseded entries stay in the heap until popped; rebuild once they dominate
+        if len(self._heap) > 2 * len(self._scheduled) + 64:
+            self._heap = [(due, task_id) for task_id, due in self._scheduled.items()]
+            heapq.heapify(self._heap)
+
+    def next_wakeup(self) -> datetime:
+        while self._heap and self._scheduled.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        window_end = self._loaded_until[0]
+        return min(self._heap[0][0], window_end) if self._heap else window_end
+
+    async def tick(self) -> int:
+        """Queue and deliver reminders for everything due by now, and load the next
+        window when the current one is used up. Returns the number queued."""
+        now = self.clock.now()
+        due_ids = []
+        while self._heap and self._heap[0][0] <= now:
+            due, task_id = heapq.heappop(self._heap)
+            if self._scheduled.get(task_id) == due:
+                del self._scheduled[task_id]
+                due_ids.append(task_id)
+
+        queued = await self._queue_reminders(due_ids, now) if due_ids else 0
+        if queued:
+            await deliver_reminders(
+                self.sink, self.session_maker, batch_size=self.batch_size, concurrency=self.concurrency, now=now
+            )
+        if now >= self._loaded_until[0]:
+            await self._load_window(now)
+        return queued
+
+    async def _queue_reminders(self, task_ids: List[int], now: datetime) -> int:
+        queued = 0
+        async with self.session_maker() as session:
+            for start in range(0, len(task_ids), self.batch_size):
+                keys = await get_due_task_keys(session, task_ids[start:start + self.batch_size], now)
+                queued += await enqueue_reminders(session, keys, now)
+            await session.commit()
+        return queued
+
+    async def _load_window(self, now: datetime) -> None:
+        self._pending = []
+        try:
+            async with self.session_maker() as session:
+                rows = await get_upcoming_due_dates(
+                    session, self._loaded_until, now + self.horizon, self.max_scheduled
+                )
+            for due, task_id in rows:
+                self._push(_as_utc(due), task_id)
+            if len(rows) == self.max_scheduled:
+                # Window cut short: resume right after the last task read
+                self._loaded_until = (_as_utc(rows[-1][0]), rows[-1][1])
+            else:
+                self._loaded_until = (now + self.horizon, MAX_ID)
+        finally:
+            pending, self._pending = self._pending, None
+            for event in pending:
+                self._apply(event)
+
+    async def run(self) -> None:
+        logger.info("Starting reminder scheduler")
+        while True:
+            try:
+                await self.tick()
+                self._wake.clear()
+                wakeup = self.next_wakeup()
+            except Exception as e:
+                logger.error(f"Reminder scheduler error: {e}")
+                self._wake.clear()
+                wakeup = self.clock.now() + RETRY_DELAY
+            await self.clock.sleep_until(wakeup, self._wake)
+
+async def start_scheduler():
+    """Run the scheduler standalone; it only hears about task changes made in
+    other processes when events_backend is "redis"."""
+    await broker.start()
+    scheduler = ReminderScheduler()
+    await scheduler.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await scheduler.stop()
+        await scheduler.sink.close()
+        await broker.stop()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(start_scheduler())
@@ -0,0 +1,86 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime, UTC
+from email.message import EmailMessage
+from typing import Callable, Optional
+import httpx
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Reminder:
+    id: int  # outbox row id, the same on every retry of this reminder
+    task_id: int
+    title: str
+    due_date: datetime
+    owner_email: str
+
+class ReminderSink:
+    """Where reminders claimed from the outbox are delivered; ``send`` raises on failure"""
+
+    async def send(self, reminder: Reminder) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+class LogSink(ReminderSink):
+    async def send(self, reminder: Reminder) -> None:
+        logger.info(
+            f"REMINDER: Task '{reminder.title}' (ID: {reminder.task_id}) "
+            f"for user {reminder.owner_email} was due on {reminder.due_date} "
+            f"and is now {datetime.now(UTC) - reminder.due_date} overdue"
+        )
+
+class WebhookSink(ReminderSink):
+    """POST each reminder as JSON; the receiver can dedupe retries on Idempotency-Key"""
+
+    def __init__(self, url: str, timeout: float = 10.0) -> None:
+        self.url = url
+        self._client = httpx.AsyncClient(timeout=timeout)
+
+    async def send(self, reminder: Reminder) -> None:
+        response = await self._client.post(
+            self.url,
+            json={
+                "task_id": reminder.task_id,
+                "title": reminder.title,
+                "due_date": reminder.due_date.isoformat(),
+                "owner_email": reminder.owner_email,
+            },
+            headers={"Idempotency-Key": f"reminder-{reminder.id}"},
+        )
+        response.raise_for_status()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+def _log_email(message: EmailMessage) -> None:
+    logger.info(f"EMAIL to {message['To']}: {message['Subject']}")
+
+class EmailSink(ReminderSink):
+    """Compose a reminder email and hand it to ``transport`` (logged by default,
+    a stand-in until a mail provider is wired in)"""
+
+    def __init__(self, sender: str, transport: Optional[Callable[[EmailMessage], None]] = None) -> None:
+        self.sender = sender
+        self.transport = transport or _log_email
+
+    async def send(self, reminder: Reminder) -> None:
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = reminder.owner_email
+        message["Subject"] = f"Overdue: {reminder.title}"
+        message["Message-ID"] = f"<reminder-{reminder.id}@{self.sender.split('@')[-1]}>"
+        message.set_content(f"Your task '{reminder.title}' was due on {reminder.due_date:%Y-%m-%d %H:%M} UTC.")
+        self.transport(message)
+
+def create_sink() -> ReminderSink:
+    if settings.reminder_sink == "webhook":
+        if not settings.reminder_webhook_url:
+            raise ValueError("reminder_webhook_url is required for the webhook sink")
+        return WebhookSink(settings.reminder_webhook_url)
+    if settings.reminder_sink == "email":
+        return EmailSink(settings.reminder_email_sender)
+    return LogSink()
@@ -1,49 +1,192 @@
 import asyncio
 import logging
-from datetime import datetime
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import async_session_maker
-from app.crud.task import get_overdue_tasks
+import time
+from datetime import datetime, timedelta, UTC
+from typing import Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.config import settings
+from app.database import async_session_maker, get_engine
+from app.core.query_guard import QueryBudgetExceeded, track_queries
+from app.core.sharding import scatter, sharding_enabled
+from app.crud.task import stream_newly_overdue_tasks
+from app.crud.reminder import enqueue_reminders, claim_reminders
+from app.crud.sync import purge_tombstones
+from app.crud.watermark import get_watermark, set_watermark
+from app.workers.leader import LeaderElection, create_leader_lock
+from app.workers.reminder_sinks import Reminder, ReminderSink, create_sink
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def check_overdue_tasks():
-    """Check for overdue tasks and log reminders"""
-    async with async_session_maker() as session:
-        try:
-            overdue_tasks = await get_overdue_tasks(session)
-            
-            if overdue_tasks:
-                logger.info(f"Found {len(overdue_tasks)} overdue tasks")
+REMINDER_WATERMARK = "task_reminder"
+# Failed deliveries are retried after 30s, 60s, 120s, ...
+RETRY_BACKOFF = timedelta(seconds=30)
+# Statements per unit of work, checked by the query guard. A batch costs the
+# same whatever its size, so a per-row query shows up as soon as it exists.
+SCAN_QUERY_BUDGET = 3  # watermark read, overdue scan, watermark write
+ENQUEUE_QUERY_BUDGET = 1  # one multi-row INSERT per streamed batch
+DELIVERY_QUERY_BUDGET = 4  # claim, then an UPDATE per kind of outcome
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes for timezone-aware columns
+    return value if value.tzinfo else value.replace(tzinfo=UTC)
+
+async def check_overdue_tasks(
+    session_maker: async_sessionmaker = async_session_maker,
+    batch_size: int = settings.reminder_batch_size,
+    shard: Optional[Tuple[int, int]] = None
+) -> int:
+    """Queue reminders for tasks that became overdue since the previous tick.
+    
+    The end of each scanned window is persisted as a watermark, so a tick
+    only looks at tasks whose due date passed since the last one (plus tasks
+    edited back into the past). Matching tasks are streamed in batches of
+    ``batch_size`` into the reminder outbox, in the same transaction that
+    moves the watermark; deliver_reminders sends them. Returns the number of
+    reminders queued.
+    
+    ``shard`` is (index, count): only that shard of users is scanned, with a
+    watermark of its own so shards can run independently.
+    """
+    watermark_name = REMINDER_WATERMARK if shard is None else f"{REMINDER_WATERMARK}:{shard[0]}/{shard[1]}"
+    with track_queries(f"reminder scan {watermark_name}", budget=SCAN_QUERY_BUDGET):
+        async with session_maker() as session:
+            try:
+                now = datetime.now(UTC)
+                watermark = await get_watermark(session, watermark_name)
+                result = await stream_newly_overdue_tasks(
+                    session, since=_as_utc(watermark.value) if watermark else None, until=now,
+                    batch_size=batch_size, shard=shard
+                )
+                
+                queued = 0
+                async for batch in result.partitions():
+                    with track_queries("reminder enqueue batch", budget=ENQUEUE_QUERY_BUDGET):
+                        queued += await enqueue_reminders(session, batch, now)
                 
-                for task in overdue_tasks:
-                    # Load user relationship
-                    await session.refresh(task, ["owner"])
-                    
-                    logger.info(
-                        f"REMINDER: Task '{task.title}' (ID: {task.id}) "
-                        f"for user {task.owner.email} was due on {task.due_date} "
-                        f"and is now {datetime.utcnow() - task.due_date} overdue"
-                    )
-            # Only log when there are overdue tasks (remove noise)
-            # else:
-            #     logger.info("No overdue tasks found")
+                # Only log when there are overdue tasks (remove noise)
+                if queued:
+                    logger.info(f"Queued {queued} reminders for newly overdue tasks")
                 
-        except Exception as e:
-            logger.error(f"Error checking overdue tasks: {e}")
+                set_watermark(session, watermark_name, now, watermark)
+                await session.commit()
+                return queued
+            
+            except QueryBudgetExceeded:
+                raise
+            except Exception as e:
+                logger.error(f"Error checking overdue tasks: {e}")
+                return 0
 
-async def start_background_worker():
-    """Start the background worker that runs every 30 seconds"""
+async def deliver_reminders(
+    sink: ReminderSink,
+    session_maker: async_sessionmaker = async_session_maker,
+    batch_size: int = settings.reminder_batch_size,
+    concurrency: int = settings.reminder_concurrency,
+    max_batches: int = settings.reminder_delivery_batches,
+    max_attempts: int = settings.reminder_max_attempts,
+    now: Optional[datetime] = None
+) -> int:
+    """Hand queued reminders to ``sink``, at most ``max_batches`` batches per call.
+    
+    Each batch is claimed, delivered and marked in one transaction, so a row
+    is only handed out again if delivery failed (with exponential backoff,
+    up to ``max_attempts``) or the process died before committing; sinks get
+    the outbox id to dedupe that case. ``now`` defaults to the wall clock.
+    Returns the number delivered.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    delivered = 0
+    
+    for _ in range(max_batches):
+        with track_queries("reminder delivery batch", budget=DELIVERY_QUERY_BUDGET):
+            async with session_maker() as session:
+                batch_now = now or datetime.now(UTC)
+                rows = await claim_reminders(session, batch_now, batch_size, max_attempts)
+
+                async def deliver(entry, task, owner_email) -> bool:
+                    entry.attempts += 1
+                    if task.is_completed or task.due_date is None or _as_utc(task.due_date) != _as_utc(entry.due_date):
+                        # Completed or rescheduled since it was queued: settle without sending
+                        entry.reminded_at = batch_now
+                        return False
+                    async with semaphore:
+                        try:
+                            await sink.send(
+                                Reminder(entry.id, task.id, task.title, _as_utc(task.due_date), owner_email)
+                            )
+                        except Exception as e:
+                            entry.next_attempt_at = batch_now + RETRY_BACKOFF * 2 ** (entry.attempts - 1)
+                            entry.last_error = str(e)[:500]
+                            logger.warning(f"Reminder {entry.id} delivery failed (attempt {entry.attempts}): {e}")
+                            return False
+                    entry.reminded_at = batch_now
+                    return True
+            
+                results = await asyncio.gather(*(deliver(*row) for row in rows))
+                await session.commit()
+        
+        delivered += sum(results)
+        if len(rows) < batch_size:
+            break
+    
+    return delivered
+
+async def purge_expired_tombstones(
+    session_maker: async_sessionmaker = async_session_maker,
+    now: Optional[datetime] = None
+) -> int:
+    """Delete tombstones older than the sync retention; /sync refuses tokens
+    that old, so no client can still need them. Returns the number purged."""
+    older_than = (now or datetime.now(UTC)) - timedelta(days=settings.sync_tombstone_retention_days)
+    with track_queries("tombstone purge", budget=1):
+        async with session_maker() as session:
+            purged = await purge_tombstones(session, older_than)
+    if purged:
+        logger.info(f"Purged {purged} expired tombstones")
+    return purged
+
+async def start_background_worker(stop: Optional[asyncio.Event] = None):
+    """Start the background worker that runs every 30 seconds, until ``stop`` is set"""
     logger.info("Starting background worker for task reminders")
+    stop = stop or asyncio.Event()
+    sink = create_sink()
+    next_purge = time.monotonic()
     
-    while True:
-        try:
-            await check_overdue_tasks()
-            await asyncio.sleep(30)  # Wait 30 seconds
-        except Exception as e:
-            logger.error(f"Background worker error: {e}")
-            await asyncio.sleep(30)  # Continue running even if there's an error
+    try:
+        while not stop.is_set():
+            try:
+                purge = time.monotonic() >= next_purge
+                if purge:
+                    next_purge = time.monotonic() + settings.tombstone_purge_interval_seconds
+                if sharding_enabled():
+                    # Each shard has its own tasks, outbox and watermark
+                    await scatter(check_overdue_tasks)
+                    await scatter(lambda session_maker: deliver_reminders(sink, session_maker))
+                    if purge:
+                        await scatter(purge_expired_tombstones)
+                else:
+                    await check_overdue_tasks()
+                    await deliver_reminders(sink)
+                    if purge:
+                        await purge_expired_tombstones()
+            except Exception as e:
+                logger.error(f"Background worker error: {e}")  # Continue running even if there's an error
+            try:
+                # Wait for the next tick, returning early on shutdown
+                await asyncio.wait_for(stop.wait(), settings.reminder_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await sink.close()
+
+def create_reminder_election() -> LeaderElection:
+    """Run the background worker in whichever app replica holds the reminder lock"""
+    return LeaderElection(
+        create_leader_lock(REMINDER_WATERMARK, get_engine()),
+        start_background_worker,
+        interval=settings.leader_failover_seconds,
+    )
 
 if __name__ == "__main__":
-    asyncio.run(start_background_worker())
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(start_background_worker())
@@ -0,0 +1,267 @@
+"""Load benchmark for the API's hot endpoints, driven in-process.
+
+Run with ``python -m benchmarks.api [--scale 10k|100k|1m] [--requests 500]
+[--concurrency 10] [--admission] [--save-baseline FILE | --baseline FILE]``.
+
+Seeds users, categories and tasks (``--scale`` tasks, 100 per user, 5
+categories per user) into a throwaway SQLite database, or into
+``--database-url`` if given, then sends requests through httpx's
+ASGITransport so the numbers cover the app and the database, not the
+network. Each scenario reports throughput, p50/p95/p99 latency and SQL
+statements per request as JSON; throughput and latencies only count
+requests that succeeded. With ``--baseline`` the run is compared against a
+stored result and the exit code is 1 if any scenario regressed by more
+than ``--tolerance``.
+
+Admission control is off unless ``--admission`` is given: its fast 503s
+would otherwise pass for served requests. Any failed request makes the run
+invalid: the exit code is 2, no comparison is made and no baseline saved.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, UTC
+from typing import Awaitable, Callable, Dict, List
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+TASKS_PER_USER = 100
+CATEGORIES_PER_USER = 5
+INSERT_CHUNK = 10_000
+PASSWORD = "benchmark-password"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="10k")
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--database-url", help="database to seed and use (default: a temporary SQLite file)")
+    parser.add_argument("--baseline", help="compare against a result saved with --save-baseline")
+    parser.add_argument("--save-baseline", help="write this run's result to a file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, as a fraction")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--admission", action="store_true", help="keep admission control on (off by default)")
+    return parser.parse_args()
+
+
+async def seed(engine, tasks: int, hashed_password: str, rng: random.Random) -> int:
+    from sqlalchemy import insert
+    from app.database import Base
+    from app.models import User, Task, Category
+
+    users = max(tasks // TASKS_PER_USER, 1)
+    now = datetime.now(UTC)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"id": i, "email": f"user{i}@bench.example.com", "hashed_password": hashed_password, "is_active": True}
+            for i in range(1, users + 1)
+        ])
+        await conn.execute(insert(Category), [
+            {"id": (user - 1) * CATEGORIES_PER_USER + n + 1, "name": f"Category {n}", "created_by_user_id": user}
+            for user in range(1, users + 1) for n in range(CATEGORIES_PER_USER)
+        ])
+        for start in range(0, tasks, INSERT_CHUNK):
+            rows = []
+            for i in range(start, min(start + INSERT_CHUNK, tasks)):
+                user = i % users + 1
+                category = rng.randrange(CATEGORIES_PER_USER + 1)
+                rows.append({
+                    "title": f"Task {i}",
+                    "description": "Benchmark task",
+                    "due_date": now + timedelta(hours=rng.randint(-24 * 30, 24 * 30)) if rng.random() < 0.8 else None,
+                    "is_completed": rng.random() < 0.3,
+                    "created_by_user_id": user,
+                    "category_id": (user - 1) * CATEGORIES_PER_USER + category if category else None,
+                })
+            await conn.execute(insert(Task), rows)
+    return users
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def drive(
+    name: str, call: Callable[[int], Awaitable[bool]], requests: int, concurrency: int, statements: List[int]
+) -> dict:
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            ok = await call(i)
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    statements_before = statements[0]
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    # Only successes were timed: a fast 503 would otherwise pass for a quick
+    # response
+    latencies = sorted(latencies) or [0.0]
+    return {
+        "scenario": name,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round((requests - errors) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "queries_per_request": round((statements[0] - statements_before) / requests, 2),
+    }
+
+
+def compare(results: List[dict], baseline: dict, tolerance: float) -> List[dict]:
+    """Per-scenario ratios against the baseline; a regression is lower throughput
+    or a higher p95 beyond ``tolerance``, or more queries per request"""
+    previous = {result["scenario"]: result for result in baseline["results"]}
+    comparison = []
+    for result in results:
+        before = previous.get(result["scenario"])
+        if before is None:
+            continue
+        throughput_ratio = result["throughput_rps"] / before["throughput_rps"]
+        p95_ratio = result["p95_ms"] / before["p95_ms"] if before["p95_ms"] else 1.0
+        comparison.append({
+            "scenario": result["scenario"],
+            "throughput_ratio": round(throughput_ratio, 3),
+            "p95_ratio": round(p95_ratio, 3),
+            "queries_per_request_delta": round(result["queries_per_request"] - before["queries_per_request"], 2),
+            "regressed": (
+                throughput_ratio < 1 - tolerance
+                or p95_ratio > 1 + tolerance
+                or result["queries_per_request"] > before["queries_per_request"]
+            ),
+        })
+    return comparison
+
+
+async def main() -> int:
+    args = parse_args()
+    rng = random.Random(args.seed)
+    database_url = args.database_url or "sqlite+aiosqlite:///" + os.path.join(
+        tempfile.mkdtemp(prefix="api-bench-"), "bench.db"
+    )
+    # Settings are read at import time, so point the app at the benchmark
+    # database before importing it
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["ADMISSION_ENABLED"] = "true" if args.admission else "false"
+    os.environ.setdefault("REDIS_URL", "redis://localhost:6379")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+
+    from httpx import AsyncClient, ASGITransport
+    from sqlalchemy import event
+    from app.main import app
+    from app.database import async_session_maker, get_engine
+    from app.core.security import create_access_token, get_password_hash
+    from app.workers.task_reminder import check_overdue_tasks
+
+    engine = get_engine()
+    engine.echo = False
+    tasks = SCALES[args.scale]
+    users = await seed(engine, tasks, get_password_hash(PASSWORD), rng)
+
+    statements = [0]
+
+    def count_statement(*_):
+        statements[0] += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+
+    tokens: Dict[int, dict] = {}
+
+    def auth(user: int) -> dict:
+        if user not in tokens:
+            token = create_access_token(data={"sub": f"user{user}@bench.example.com"})
+            tokens[user] = {"Authorization": f"Bearer {token}"}
+        return tokens[user]
+
+    def user_for(i: int) -> int:
+        return i * 7919 % users + 1
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        async def login(i: int) -> bool:
+            response = await client.post(
+                "/auth/login", json={"email": f"user{user_for(i)}@bench.example.com", "password": PASSWORD}
+            )
+            return response.status_code == 200
+
+        async def list_tasks(i: int) -> bool:
+            user = user_for(i)
+            params = {"is_completed": "false", "limit": 50}
+            if i % 2:
+                params["category_id"] = (user - 1) * CATEGORIES_PER_USER + i % CATEGORIES_PER_USER + 1
+            response = await client.get("/tasks/", params=params, headers=auth(user))
+            return response.status_code == 200
+
+        async def create_task(i: int) -> bool:
+            due_date = (datetime.now(UTC) + timedelta(days=1)).isoformat()
+            response = await client.post(
+                "/tasks/", json={"title": f"Load {i}", "due_date": due_date}, headers=auth(user_for(i))
+            )
+            return response.status_code == 201
+
+        async def categories_with_count(i: int) -> bool:
+            response = await client.get(
+                "/categories/", params={"with_task_count": "true"}, headers=auth(user_for(i))
+            )
+            return response.status_code == 200
+
+        async def reminder_tick(i: int) -> bool:
+            await check_overdue_tasks(async_session_maker)
+            return True
+
+        # Password hashing dominates logins, and ticks run back to back, so
+        # both get fewer iterations
+        scenarios = [
+            ("login", login, max(args.requests // 10, 10), args.concurrency),
+            ("list_tasks", list_tasks, args.requests, args.concurrency),
+            ("create_task", create_task, args.requests, args.concurrency),
+            ("categories_with_task_count", categories_with_count, args.requests, args.concurrency),
+            ("reminder_tick", reminder_tick, max(args.requests // 50, 5), 1),
+        ]
+        results = [await drive(name, call, requests, concurrency, statements)
+                   for name, call, requests, concurrency in scenarios]
+
+    await engine.dispose()
+
+    report = {
+        "scale": args.scale,
+        "tasks": tasks,
+        "users": users,
+        "concurrency": args.concurrency,
+        "database": engine.dialect.name,
+        "results": results,
+    }
+    errors = sum(result["errors"] for result in results)
+    exit_code = 0
+    if errors:
+        # Numbers from a run with failures aren't comparable to anything
+        report["invalid"] = f"{errors} requests failed"
+        print(json.dumps(report, indent=2))
+        return 2
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(results, json.load(f), args.tolerance)
+        exit_code = int(any(entry["regressed"] for entry in report["comparison"]))
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
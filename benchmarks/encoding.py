@@ -0,0 +1,82 @@
+"""Serialization cost of one task page, per encoding strategy.
+
+Run with ``python -m benchmarks.encoding [--page-size 100] [--rounds 200]``.
+Prints one JSON line per strategy with the encoded size and the CPU time
+spent per page.
+"""
+import argparse
+import gzip
+import json
+import time
+from datetime import datetime, timedelta, UTC
+from types import SimpleNamespace
+from typing import List
+
+import msgpack
+import orjson
+from pydantic import TypeAdapter
+
+from app.core.responses import render
+from app.schemas.task import Task
+
+
+def build_page(page_size: int) -> list:
+    now = datetime.now(UTC)
+    category = SimpleNamespace(
+        id=1, name="Work", description="Work related tasks", color="#FF5733", created_by_user_id=1
+    )
+    return [
+        SimpleNamespace(
+            id=i,
+            title=f"Task {i}",
+            description="Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 4,
+            due_date=now + timedelta(days=i % 30),
+            is_completed=i % 3 == 0,
+            category_id=category.id,
+            created_by_user_id=1,
+            created_at=now,
+            updated_at=now,
+            category=category,
+        )
+        for i in range(page_size)
+    ]
+
+
+def response_model_pass(adapter: TypeAdapter, page: list) -> object:
+    # What FastAPI does for a response_model: validate, then dump to JSON-able python
+    return adapter.dump_python(adapter.validate_python(page, from_attributes=True), mode="json")
+
+
+def measure(name: str, encode, rounds: int) -> dict:
+    body = encode()
+    start = time.process_time()
+    for _ in range(rounds):
+        encode()
+    cpu = time.process_time() - start
+    return {"strategy": name, "bytes": len(body), "cpu_ms_per_page": round(cpu / rounds * 1000, 4)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    page = build_page(args.page_size)
+    adapter = TypeAdapter(List[Task])
+
+    strategies = {
+        "stdlib_json": lambda: json.dumps(
+            response_model_pass(adapter, page), separators=(",", ":")
+        ).encode(),
+        "orjson": lambda: orjson.dumps(response_model_pass(adapter, page)),
+        "render": lambda: render(List[Task], page).body,
+        "render_msgpack": lambda: msgpack.packb(orjson.loads(render(List[Task], page).body)),
+        "render_gzip": lambda: gzip.compress(render(List[Task], page).body, compresslevel=6),
+    }
+    for name, encode in strategies.items():
+        print(json.dumps(measure(name, encode, args.rounds)))
+
+
+if __name__ == "__main__":
+    main()
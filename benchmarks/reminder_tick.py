@@ -0,0 +1,169 @@
+"""Duration and peak memory of one reminder tick over a large overdue backlog.
+
+Run with ``python -m benchmarks.reminder_tick [--tasks 100000] [--legacy]``.
+Seeds a throwaway SQLite database with ``--tasks`` overdue tasks spread over
+a few hundred users, then times a cold ``check_overdue_tasks`` tick (no
+watermark yet, so the whole backlog is scanned and queued in the reminder
+outbox). ``--legacy`` also times the previous implementation: load every
+row, then ``refresh(task, ["owner"])`` per task. Reminder log lines are
+silenced so the numbers reflect the scan.
+
+Each tick runs in a fresh interpreter, and its RSS is sampled from
+``/proc/self/statm`` while it runs. ``ru_maxrss`` is the high-water mark of
+the whole process, so it would already include seeding (and the other
+strategy's tick) and the growth would read about zero.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, UTC
+
+# Always a throwaway database, never an exported DATABASE_URL: seeding
+# inserts rows with fixed ids and the tick writes to the outbox. Children
+# get the parent's database through CHILD_DATABASE_URL.
+CHILD_DATABASE_URL = "REMINDER_BENCH_DATABASE_URL"
+os.environ["DATABASE_URL"] = os.environ.get(CHILD_DATABASE_URL) or "sqlite+aiosqlite:///" + os.path.join(
+    tempfile.mkdtemp(prefix="reminder-bench-"), "bench.db"
+)
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from app.database import Base  # noqa: E402
+from app.models import User, Task, Category  # noqa: E402
+from app.crud.task import get_overdue_tasks  # noqa: E402
+from app.workers import task_reminder  # noqa: E402
+
+USERS = 500
+INSERT_CHUNK = 10_000
+
+
+async def seed(tasks: int) -> None:
+    engine = create_async_engine(os.environ["DATABASE_URL"])
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"id": i, "email": f"user{i}@bench.local", "hashed_password": "x", "is_active": True}
+            for i in range(1, USERS + 1)
+        ])
+        await conn.execute(insert(Category), [
+            {"id": i, "name": f"Category {i}", "created_by_user_id": i} for i in range(1, USERS + 1)
+        ])
+        now = datetime.now(UTC)
+        for start in range(0, tasks, INSERT_CHUNK):
+            await conn.execute(insert(Task), [
+                {
+                    "title": f"Task {i}",
+                    "description": "Benchmark task",
+                    "due_date": now - timedelta(minutes=i % 10_000 + 1),
+                    "is_completed": False,
+                    "created_by_user_id": i % USERS + 1,
+                    "category_id": i % USERS + 1 if i % 2 else None,
+                }
+                for i in range(start, min(start + INSERT_CHUNK, tasks))
+            ])
+    await engine.dispose()
+
+
+async def legacy_tick(session_maker: async_sessionmaker) -> int:
+    async with session_maker() as session:
+        overdue_tasks = await get_overdue_tasks(session)
+        for task in overdue_tasks:
+            await session.refresh(task, ["owner"])
+        return len(overdue_tasks)
+
+
+def rss_mb() -> float:
+    """Current resident set size"""
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize() / 2**20
+
+
+class RssSampler(threading.Thread):
+    """Highest RSS seen while running, sampled every ``interval`` seconds"""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = rss_mb()
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def stop(self) -> float:
+        self._done.set()
+        self.join()
+        self.peak = max(self.peak, rss_mb())
+        return self.peak
+
+
+async def measure(strategy: str) -> dict:
+    """One tick, from inside a fresh interpreter"""
+    logging.getLogger(task_reminder.__name__).setLevel(logging.WARNING)
+    engine = create_async_engine(os.environ["DATABASE_URL"])
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    ticks = {
+        "streamed": lambda: task_reminder.check_overdue_tasks(session_maker),
+        "legacy": lambda: legacy_tick(session_maker),
+    }
+    rss_before = rss_mb()
+    sampler = RssSampler()
+    sampler.start()
+    start = time.perf_counter()
+    reminded = await ticks[strategy]()
+    duration = time.perf_counter() - start
+    peak = sampler.stop()
+    await engine.dispose()
+    return {
+        "strategy": strategy,
+        "reminders": reminded,
+        "tick_seconds": round(duration, 3),
+        "peak_rss_mb": round(peak, 1),
+        "peak_rss_growth_mb": round(peak - rss_before, 1),
+    }
+
+
+def run_child(strategy: str) -> dict:
+    # Hand the seeded database down; the child would otherwise make a new one
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.reminder_tick", "--child", strategy],
+        capture_output=True, text=True, check=True,
+        env=dict(os.environ, **{CHILD_DATABASE_URL: os.environ["DATABASE_URL"]}),
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--legacy", action="store_true", help="also time the previous implementation")
+    parser.add_argument("--child", choices=("streamed", "legacy"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(measure(args.child))))
+        return
+
+    asyncio.run(seed(args.tasks))
+
+    # The streamed tick queues the whole backlog in the outbox; the legacy
+    # one only reads, so it still sees the same overdue tasks afterwards
+    print(json.dumps(run_child("streamed")))
+    if args.legacy:
+        print(json.dumps(run_child("legacy")))
+
+
+if __name__ == "__main__":
+    main()
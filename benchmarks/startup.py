@@ -0,0 +1,121 @@
+"""Startup benchmark: import time and time to first request, cold and warmed.
+
+Run with ``python -m benchmarks.startup [--runs 5]``.
+
+Each run starts a fresh interpreter, the way an autoscaled pod does, that
+imports ``app.main``, runs the lifespan startup and then sends
+``GET /tasks/`` for a seeded user twice through httpx's ASGITransport. The
+medians are reported as JSON, with ``WARMUP_ENABLED`` off and on, so the
+first request's extra cost and what warmup moves into startup are both
+visible.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+EMAIL = "startup@bench.example.com"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", help="database to use (default: a temporary SQLite file)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def child() -> None:
+    """One cold start, timed from inside the new interpreter"""
+    start = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+
+    async def run():
+        from httpx import AsyncClient, ASGITransport
+        from app.core.security import create_access_token
+
+        headers = {"Authorization": f"Bearer {create_access_token(data={'sub': EMAIL})}"}
+        async with app.router.lifespan_context(app):
+            started = time.perf_counter()
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+                latencies = []
+                for _ in range(2):
+                    request_start = time.perf_counter()
+                    response = await client.get("/tasks/", headers=headers)
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - request_start)
+        return started, latencies
+
+    started, (first, second) = asyncio.run(run())
+    print(json.dumps({
+        "import_s": imported - start,
+        "startup_s": started - imported,
+        "first_request_ms": first * 1000,
+        "second_request_ms": second * 1000,
+        "time_to_first_response_s": started - start + first,
+    }))
+
+
+async def seed(database_url: str) -> None:
+    from sqlalchemy import insert
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.database import Base
+    from app.models import Task, User
+
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User).values(id=1, email=EMAIL, hashed_password="-", is_active=True))
+        await conn.execute(insert(Task), [
+            {"title": f"Task {i}", "created_by_user_id": 1, "is_completed": False} for i in range(100)
+        ])
+    await engine.dispose()
+
+
+def measure(runs: int, env: dict) -> dict:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child"],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        sample["process_s"] = time.perf_counter() - start
+        samples.append(sample)
+    return {key: round(statistics.median(sample[key] for sample in samples), 4) for key in samples[0]}
+
+
+def main() -> int:
+    args = parse_args()
+    if args.child:
+        child()
+        return 0
+
+    database_url = args.database_url or "sqlite+aiosqlite:///" + os.path.join(
+        tempfile.mkdtemp(prefix="startup-bench-"), "bench.db"
+    )
+    env = dict(os.environ, DATABASE_URL=database_url)
+    env.setdefault("REDIS_URL", "redis://localhost:6379")
+    env.setdefault("SECRET_KEY", "benchmark")
+    os.environ.update(env)
+    if not args.database_url:
+        asyncio.run(seed(database_url))
+
+    report = {
+        "runs": args.runs,
+        "cold": measure(args.runs, dict(env, WARMUP_ENABLED="false")),
+        "warmed": measure(args.runs, dict(env, WARMUP_ENABLED="true")),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""Seed a database with a large synthetic dataset for capacity testing.
+
+Run with ``python -m scripts.setup_test_db --users 100000 [--workers 4]
+[--database-url URL] [--create-schema]``.
+
+Generates users with their categories and tasks. Tasks per user follow a
+Zipf distribution over a fixed ranking of the users, so a few heavy users
+own most of the tasks. Each user's data comes from a random generator
+seeded with ``--seed`` and the user id, so the same arguments (and
+``--anchor`` date) always produce the same dataset, however the work is
+split.
+
+Users are written ``--chunk-users`` at a time, one transaction per chunk
+holding the users, their categories and their tasks: COPY on PostgreSQL,
+multi-row INSERTs elsewhere. Users that already exist are skipped, so an
+interrupted run resumes by running it again. ``--workers`` splits the
+user range between processes; ``--first-user`` and ``--total-users`` let
+several machines seed disjoint ranges of one population.
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time as dt_time, timedelta, UTC
+from typing import List, Optional, Sequence, Tuple
+
+USER_COLUMNS = ["id", "email", "hashed_password", "is_active"]
+CATEGORY_COLUMNS = ["id", "name", "color", "created_by_user_id"]
+TASK_COLUMNS = ["title", "description", "due_date", "is_completed", "created_by_user_id", "category_id"]
+COLORS = ["#e74c3c", "#3498db", "#2ecc71", "#f1c40f", "#9b59b6", "#34495e"]
+DEFAULT_PASSWORD = "password"
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"),
+                        help="database to seed (default: $DATABASE_URL)")
+    parser.add_argument("--create-schema", action="store_true",
+                        help="create missing tables first; otherwise run the Alembic migrations beforehand")
+    parser.add_argument("--users", type=int, default=10_000, help="users to seed")
+    parser.add_argument("--first-user", type=int, default=1, help="id of the first user to seed")
+    parser.add_argument("--total-users", type=int,
+                        help="size of the whole population when seeding part of it (default: the last user id)")
+    parser.add_argument("--max-tasks", type=int, default=1000, help="tasks of the heaviest user")
+    parser.add_argument("--min-tasks", type=int, default=1, help="tasks of the lightest users")
+    parser.add_argument("--zipf-exponent", type=float, default=1.0,
+                        help="skew of tasks per user: the user ranked r gets max-tasks / r**exponent")
+    parser.add_argument("--categories", type=int, default=5, help="categories per user")
+    parser.add_argument("--uncategorized-ratio", type=float, default=0.2)
+    parser.add_argument("--completed-ratio", type=float, default=0.3)
+    parser.add_argument("--no-due-date-ratio", type=float, default=0.2)
+    parser.add_argument("--due-past-days", type=int, default=30, help="due dates spread this far before --anchor")
+    parser.add_argument("--due-future-days", type=int, default=60, help="and this far after it")
+    parser.add_argument("--anchor", type=date.fromisoformat, default=datetime.now(UTC).date(),
+                        help="date due dates are spread around (default: today; pass it when resuming another day)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="password of every seeded user")
+    parser.add_argument("--chunk-users", type=int, default=500, help="users per transaction")
+    parser.add_argument("--batch-rows", type=int, default=1000, help="rows per INSERT when COPY is unavailable")
+    parser.add_argument("--workers", type=int, default=1, help="processes, each seeding a slice of the users")
+    args = parser.parse_args(argv)
+    if not args.database_url:
+        parser.error("--database-url or $DATABASE_URL is required")
+    if args.total_users is None:
+        args.total_users = args.first_user + args.users - 1
+    return args
+
+
+def zipf_rank(user: int, total_users: int) -> int:
+    """Rank of a user among ``total_users``, from 1 (heaviest) to ``total_users``.
+
+    Ranks are a fixed permutation of the ids, so heavy users are spread over
+    the id range and every slice of it gets a similar share of the tasks.
+    """
+    multiplier = 2654435761 % total_users or 1
+    while math.gcd(multiplier, total_users) != 1:
+        multiplier += 1
+    return (user - 1) * multiplier % total_users + 1
+
+
+def tasks_for_user(user: int, args: argparse.Namespace) -> int:
+    rank = zipf_rank(user, args.total_users)
+    return max(args.min_tasks, int(args.max_tasks / rank ** args.zipf_exponent))
+
+
+def generate_user(
+    user: int, args: argparse.Namespace, hashed_password: str
+) -> Tuple[tuple, List[tuple], List[tuple]]:
+    """The user, category and task rows of one user, in column order"""
+    rng = random.Random(f"{args.seed}:{user}")
+    anchor = datetime.combine(args.anchor, dt_time(), tzinfo=UTC)
+    user_row = (user, f"user{user}@seed.example.com", hashed_password, True)
+    first_category = (user - 1) * args.categories + 1
+    category_rows = [
+        (first_category + n, f"Category {n + 1}", COLORS[n % len(COLORS)], user)
+        for n in range(args.categories)
+    ]
+    task_rows = []
+    for n in range(tasks_for_user(user, args)):
+        due_date = None
+        if rng.random() >= args.no_due_date_ratio:
+            due_date = anchor + timedelta(
+                minutes=rng.randint(-args.due_past_days * 24 * 60, args.due_future_days * 24 * 60)
+            )
+        category_id = None
+        if args.categories and rng.random() >= args.uncategorized_ratio:
+            category_id = first_category + rng.randrange(args.categories)
+        task_rows.append((
+            f"Task {n + 1}",
+            f"Seeded task {n + 1} of user {user}" if rng.random() < 0.5 else None,
+            due_date,
+            rng.random() < args.completed_ratio,
+            user,
+            category_id,
+        ))
+    return user_row, category_rows, task_rows
+
+
+async def write_rows(conn, table, columns: List[str], rows: List[tuple], batch_rows: int) -> None:
+    if not rows:
+        return
+    if conn.dialect.name == "postgresql":
+        # COPY through asyncpg on the same connection, inside the chunk's transaction
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(table.name, records=rows, columns=columns)
+        return
+    # Multi-row INSERT built once per batch size. insert().values(rows)
+    # spends more time building the statement than the database spends
+    # running it, so values go through the column types' bind processors
+    # (dates, booleans) and straight to the driver
+    dialect = conn.dialect
+    processors = [table.c[name].type.dialect_impl(dialect).bind_processor(dialect) for name in columns]
+    mark = "?" if dialect.paramstyle == "qmark" else "%s"
+    row_marks = "(" + ", ".join([mark] * len(columns)) + ")"
+    # Stay under SQLite's limit of 32766 bound parameters per statement
+    batch_rows = min(batch_rows, 32766 // len(columns))
+    for start in range(0, len(rows), batch_rows):
+        batch = rows[start:start + batch_rows]
+        values = [
+            process(value) if process else value
+            for row in batch for process, value in zip(processors, row)
+        ]
+        await conn.exec_driver_sql(
+            f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES " + ", ".join([row_marks] * len(batch)),
+            tuple(values),
+        )
+
+
+async def seed_users(first: int, last: int, args: argparse.Namespace, hashed_password: str) -> dict:
+    """Seed users ``first`` to ``last`` inclusive; returns the rows written"""
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+    from app.models import Category, Task, User
+
+    # Parallel workers on SQLite take turns writing; wait for the lock rather than fail
+    connect_args = {"timeout": 600} if args.database_url.startswith("sqlite") else {}
+    engine = create_async_engine(args.database_url, poolclass=NullPool, connect_args=connect_args)
+    written = {"users": 0, "categories": 0, "tasks": 0, "skipped_users": 0}
+    try:
+        for chunk_start in range(first, last + 1, args.chunk_users):
+            chunk = range(chunk_start, min(chunk_start + args.chunk_users, last + 1))
+            # A chunk commits all of its users' rows or none, so a user that
+            # exists already has its categories and tasks
+            async with engine.connect() as conn:
+                existing = set((await conn.execute(
+                    select(User.id).where(User.id.between(chunk.start, chunk.stop - 1))
+                )).scalars())
+            users, categories, tasks = [], [], []
+            for user in chunk:
+                if user in existing:
+                    continue
+                user_row, category_rows, task_rows = generate_user(user, args, hashed_password)
+                users.append(user_row)
+                categories.extend(category_rows)
+                tasks.extend(task_rows)
+            if not users:
+                written["skipped_users"] += len(existing)
+                continue
+            async with engine.begin() as conn:
+                if engine.dialect.name == "postgresql":
+                    # Rerunning the chunk is the recovery from a crash anyway;
+                    # this also begins the transaction COPY runs in
+                    await conn.exec_driver_sql("SET LOCAL synchronous_commit = off")
+                await write_rows(conn, User.__table__, USER_COLUMNS, users, args.batch_rows)
+                await write_rows(conn, Category.__table__, CATEGORY_COLUMNS, categories, args.batch_rows)
+                await write_rows(conn, Task.__table__, TASK_COLUMNS, tasks, args.batch_rows)
+            written["users"] += len(users)
+            written["categories"] += len(categories)
+            written["tasks"] += len(tasks)
+            written["skipped_users"] += len(existing)
+    finally:
+        await engine.dispose()
+    return written
+
+
+def _run_worker(first: int, last: int, args: argparse.Namespace, hashed_password: str) -> dict:
+    return asyncio.run(seed_users(first, last, args, hashed_password))
+
+
+async def prepare(args: argparse.Namespace) -> None:
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.database import Base
+    import app.models  # noqa: F401 - registers the tables
+
+    engine = create_async_engine(args.database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+
+
+async def reset_sequences(args: argparse.Namespace) -> None:
+    """Users and categories are written with explicit ids; move the
+    PostgreSQL sequences past them so the API can insert again"""
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(args.database_url)
+    if engine.dialect.name == "postgresql":
+        async with engine.begin() as conn:
+            for table in ("users", "categories"):
+                await conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT coalesce(max(id), 1) FROM {table}))"
+                ))
+    await engine.dispose()
+
+
+def split(first: int, last: int, parts: int) -> List[Tuple[int, int]]:
+    size = math.ceil((last - first + 1) / parts)
+    return [(start, min(start + size - 1, last)) for start in range(first, last + 1, size)]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    # Settings are read at import time; the seeder only needs the models
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("REDIS_URL", "redis://localhost:6379")
+    os.environ.setdefault("SECRET_KEY", "seeder")
+    from app.core.security import get_password_hash
+
+    first, last = args.first_user, args.first_user + args.users - 1
+    planned = sum(tasks_for_user(user, args) for user in range(first, last + 1))
+    print(f"Seeding users {first}-{last} of {args.total_users}: {planned} tasks, "
+          f"{args.users * args.categories} categories, {args.workers} worker(s)")
+
+    if args.create_schema:
+        asyncio.run(prepare(args))
+    hashed_password = get_password_hash(args.password)
+
+    start = time.perf_counter()
+    ranges = split(first, last, args.workers)
+    if len(ranges) == 1:
+        results = [_run_worker(first, last, args, hashed_password)]
+    else:
+        with ProcessPoolExecutor(len(ranges)) as pool:
+            futures = [pool.submit(_run_worker, a, b, args, hashed_password) for a, b in ranges]
+            results = [future.result() for future in futures]
+    asyncio.run(reset_sequences(args))
+    elapsed = time.perf_counter() - start
+
+    totals = {key: sum(result[key] for result in results) for key in results[0]}
+    rows = totals["users"] + totals["categories"] + totals["tasks"]
+    print(f"Wrote {totals['users']} users, {totals['categories']} categories and {totals['tasks']} tasks "
+          f"in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s); skipped {totals['skipped_users']} existing users")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
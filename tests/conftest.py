@@ -2,12 +2,16 @@ import asyncio
 import pytest
 import pytest_asyncio
 import warnings
+from fastapi import Request
+from fastapi.routing import APIRoute
 from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.main import app
-from app.database import get_async_session, Base
+from app.config import settings
+from app.database import get_async_session, get_shared_session, instrument_engine, Base
 from app.models import User, Task, Category
 
 # Test database URL - menggunakan SQLite untuk testing
@@ -23,16 +27,25 @@ test_engine = create_async_engine(
     },
 )
 
+instrument_engine(test_engine)
+
 test_async_session = async_sessionmaker(
     test_engine, class_=AsyncSession, expire_on_commit=False
 )
 
-async def override_get_async_session():
+async def override_get_async_session(request: Request):
+    shared_session = get_shared_session(request)
+    if shared_session is not None:
+        yield shared_session
+        return
     async with test_async_session() as session:
         yield session
 
 app.dependency_overrides[get_async_session] = override_get_async_session
 
+# Requests over their route's query budget, or repeating a statement, fail the test
+settings.query_guard_mode = "raise"
+
 @pytest.fixture(scope="session")
 def event_loop():
     """Create an instance of the default event loop for the test session."""
@@ -60,4 +73,47 @@ async def client(setup_database):
 async def db_session(setup_database):
     """Create test database session"""
     async with test_async_session() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+@pytest_asyncio.fixture
+async def session_maker(setup_database):
+    """Session factory for code that opens its own sessions (background workers)"""
+    return test_async_session
+
+@pytest.fixture
+def user_token(client):
+    """Register and log in a user through the API; ``await user_token(email)`` gives their access token"""
+    async def create(email: str, password: str = "password") -> str:
+        await client.post("/auth/register", json={"email": email, "password": password})
+        response = await client.post("/auth/login", json={"email": email, "password": password})
+        return response.json()["access_token"]
+    return create
+
+@pytest.fixture
+def database_url():
+    """URL of the test database, for code that creates its own engine"""
+    return TEST_DATABASE_URL
+
+@pytest.fixture
+def query_counter():
+    """Collect the SQL statements executed against the test database"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(test_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+@pytest.fixture
+def route_budgets():
+    """Declared query budget of each route under a path prefix, keyed by "METHOD path" """
+    def collect(prefix: str) -> dict:
+        return {
+            f"{method} {route.path}": getattr(route.endpoint, "query_budget", None)
+            for route in app.routes
+            if isinstance(route, APIRoute) and route.path.startswith(prefix)
+            for method in route.methods
+        }
+    return collect
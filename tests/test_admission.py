@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from app.config import settings
+from app.core.admission import (
+    ADMISSION_SHED, AUTH_MIN_LIMIT, AdmissionMiddleware, AdmissionQueue, Overloaded, admission_class, default_limits,
+)
+
+
+def test_requests_are_classified_by_path_and_method():
+    def classify(method, path):
+        return admission_class({"method": method, "path": path})
+
+    assert classify("POST", "/auth/login") == "auth"
+    assert classify("POST", "/batch") == "bulk"
+    # Routine polling by every offline client, not a bulk operation
+    assert classify("GET", "/sync") == "reads"
+    assert classify("GET", "/tasks/") == "reads"
+    assert classify("PATCH", "/tasks/1") == "writes"
+    assert classify("GET", "/health") is None
+    assert classify("GET", "/events/stream") is None
+    assert classify("GET", "/authors") == "reads"
+
+
+def test_default_limits_fit_the_connection_pool(monkeypatch):
+    monkeypatch.setattr(settings, "batch_max_concurrency", 5)
+    limits = default_limits(15)
+    assert limits == {"reads": 5, "writes": 2, "auth": AUTH_MIN_LIMIT, "bulk": 1}
+    assert limits["reads"] + limits["writes"] + limits["bulk"] * 6 <= 15
+    assert default_limits(100) == {"reads": 50, "writes": 25, "auth": AUTH_MIN_LIMIT, "bulk": 2}
+    assert default_limits(1000)["auth"] == 125
+
+
+@pytest.mark.asyncio
+async def test_queue_hands_slots_over_and_sheds():
+    queue = AdmissionQueue("test", limit=1, queue_size=1, target=0.01, interval=0.2)
+    await queue.acquire()
+    waiting = asyncio.ensure_future(queue.acquire())
+    await asyncio.sleep(0)
+    with pytest.raises(Overloaded) as e:
+        await queue.acquire()
+    assert e.value.reason == "queue_full"
+
+    queue.release()
+    await waiting
+    assert queue.active == 1
+
+    # A waiter that isn't handed a slot in time is shed
+    with pytest.raises(Overloaded) as e:
+        await queue.acquire()
+    assert e.value.reason == "timeout"
+    queue.release()
+    assert queue.active == 0
+
+
+@pytest.mark.asyncio
+async def test_standing_queue_shortens_the_wait():
+    queue = AdmissionQueue("test", limit=1, queue_size=10, target=0.01, interval=0.1)
+    await queue.acquire()
+    # Drained recently: a burst may wait up to the interval
+    assert queue._timeout() == 0.1
+    waiters = [asyncio.ensure_future(queue.acquire())]
+    await asyncio.sleep(0.08)
+    waiters.append(asyncio.ensure_future(queue.acquire()))
+    await asyncio.sleep(0.04)
+    # Non-empty for longer than the interval: newcomers get only the target
+    assert queue._timeout() == 0.01
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(result, Overloaded) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_overload_is_shed_with_retry_after_and_health_still_answers():
+    release = asyncio.Event()
+    inner = FastAPI()
+
+    @inner.get("/tasks/")
+    async def slow():
+        await release.wait()
+        return []
+
+    @inner.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    queues = {"reads": AdmissionQueue("reads", limit=1, queue_size=1, target=0.01, interval=0.5)}
+    app = AdmissionMiddleware(inner, queues)
+    shed_before = ADMISSION_SHED.labels("reads", "queue_full")._value.get()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        running = asyncio.ensure_future(client.get("/tasks/"))
+        queued = asyncio.ensure_future(client.get("/tasks/"))
+        await asyncio.sleep(0.05)
+
+        shed = await client.get("/tasks/")
+        assert shed.status_code == 503
+        assert shed.headers["retry-after"] == "1"
+        assert ADMISSION_SHED.labels("reads", "queue_full")._value.get() - shed_before == 1
+        assert (await client.get("/health")).status_code == 200
+
+        release.set()
+        assert [(await r).status_code for r in (running, queued)] == [200, 200]
+    assert queues["reads"].active == 0
+
+
+@pytest.mark.asyncio
+async def test_login_burst_is_admitted_at_the_default_limits(client: AsyncClient):
+    """Test that concurrent logins through the app's own admission control all succeed"""
+    credentials = {"email": "login_burst@example.com", "password": "password"}
+    assert (await client.post("/auth/register", json=credentials)).status_code == 201
+    shed_before = sum(ADMISSION_SHED.labels("auth", reason)._value.get() for reason in ("timeout", "queue_full"))
+
+    logins = await asyncio.gather(*(client.post("/auth/login", json=credentials) for _ in range(10)))
+    assert [login.status_code for login in logins] == [200] * 10
+    assert sum(ADMISSION_SHED.labels("auth", reason)._value.get() for reason in ("timeout", "queue_full")) == shed_before
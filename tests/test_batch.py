@@ -0,0 +1,64 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.user import create_user
+from app.schemas.user import UserCreate
+from app.core.security import create_access_token
+
+
+async def create_user_and_get_headers(db_session: AsyncSession, email: str) -> dict:
+    user = await create_user(db_session, UserCreate(email=email, password="testpassword"))
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': user.email})}"}
+
+
+@pytest.mark.asyncio
+async def test_batch_mixed_requests(client: AsyncClient, db_session: AsyncSession, query_counter: list):
+    """Test running writes and reads in one batch"""
+    headers = await create_user_and_get_headers(db_session, "batch@example.com")
+
+    query_counter.clear()
+    response = await client.post(
+        "/batch",
+        json={"requests": [
+            {"method": "POST", "path": "/categories/", "body": {"name": "Batch"}},
+            {"method": "POST", "path": "/tasks/", "body": {"title": "Batched task"}},
+            {"method": "GET", "path": "/tasks/?fields=title"},
+            {"method": "GET", "path": "/categories/?fields=name"},
+            {"method": "GET", "path": "/tasks/99999"},
+        ]},
+        headers=headers
+    )
+
+    assert response.status_code == 200
+    responses = response.json()["responses"]
+    assert [item["status"] for item in responses] == [201, 201, 200, 200, 404]
+    assert responses[1]["body"]["title"] == "Batched task"
+    assert responses[2]["body"] == [{"title": "Batched task"}]
+    assert responses[3]["body"] == [{"name": "Batch"}]
+    # The user is looked up once for the whole batch
+    assert sum("FROM users" in statement for statement in query_counter) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_limits(client: AsyncClient, db_session: AsyncSession):
+    """Test that oversized, too costly and disallowed batches are rejected"""
+    headers = await create_user_and_get_headers(db_session, "batchlimits@example.com")
+
+    too_many = [{"method": "GET", "path": "/tasks/"}] * 21
+    response = await client.post("/batch", json={"requests": too_many}, headers=headers)
+    assert response.status_code == 400
+
+    too_costly = [{"method": "POST", "path": "/auth/login", "body": {}}] * 5
+    response = await client.post("/batch", json={"requests": too_costly}, headers=headers)
+    assert response.status_code == 400
+
+    nested = [{"method": "POST", "path": "/batch", "body": {"requests": []}}]
+    response = await client.post("/batch", json={"requests": nested}, headers=headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_batch_requires_auth(client: AsyncClient):
+    response = await client.post("/batch", json={"requests": [{"method": "GET", "path": "/tasks/"}]})
+    assert response.status_code == 403
@@ -116,7 +116,7 @@ async def test_create_task_with_category(client: AsyncClient, db_session: AsyncS
 
 
 @pytest.mark.asyncio
-async def test_get_tasks_by_category_filter(client: AsyncClient, db_session: AsyncSession):
+async def test_get_tasks_by_category_filter(client: AsyncClient, db_session: AsyncSession, query_counter: list):
     """Test filtering tasks by category"""
     # Create test user
     user_data = UserCreate(email="test4@example.com", password="testpassword")
@@ -158,6 +158,7 @@ async def test_get_tasks_by_category_filter(client: AsyncClient, db_session: Asy
     )
     
     # Get tasks filtered by work category
+    query_counter.clear()
     response = await client.get(
         f"/tasks/?category_id={work_category_id}",
         headers={"Authorization": f"Bearer {access_token}"}
@@ -167,6 +168,21 @@ async def test_get_tasks_by_category_filter(client: AsyncClient, db_session: Asy
     data = response.json()
     assert len(data) == 2
     assert all(task["category"]["name"] == "Work" for task in data)
+    # Categories are joined into the task query: user lookup + tasks
+    assert len(query_counter) == 2
+    
+    # Category tasks reuse the category loaded for the ownership check
+    query_counter.clear()
+    response = await client.get(
+        f"/categories/{work_category_id}/tasks",
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 2
+    assert all(task["category"]["name"] == "Work" for task in data)
+    assert len(query_counter) == 3
 
 
 @pytest.mark.asyncio
@@ -211,3 +227,60 @@ async def test_delete_category_sets_tasks_to_none(client: AsyncClient, db_sessio
     task_data = task_get_response.json()
     assert task_data["category_id"] is None
     assert task_data["category"] is None
+
+
+@pytest.mark.asyncio
+async def test_get_categories_sparse_fields(client: AsyncClient, db_session: AsyncSession):
+    """Test requesting a subset of category and category task fields"""
+    # Create test user
+    user_data = UserCreate(email="test6@example.com", password="testpassword")
+    user = await create_user(db_session, user_data)
+    
+    # Create access token
+    access_token = create_access_token(data={"sub": user.email})
+    
+    # Create category with one task
+    category_response = await client.post(
+        "/categories/",
+        json={"name": "Sparse", "description": "Long description"},
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    category_id = category_response.json()["id"]
+    await client.post(
+        "/tasks/",
+        json={"title": "Sparse task", "category_id": category_id},
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    
+    response = await client.get(
+        "/categories/?with_task_count=true&fields=name,task_count",
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    assert response.status_code == 200
+    assert response.json() == [{"name": "Sparse", "task_count": 1}]
+    
+    response = await client.get(
+        "/categories/?fields=id,name",
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    assert response.status_code == 200
+    assert response.json() == [{"id": category_id, "name": "Sparse"}]
+    
+    response = await client.get(
+        f"/categories/{category_id}/tasks?fields=title,category",
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data[0]["title"] == "Sparse task"
+    assert data[0]["category"]["name"] == "Sparse"
+    assert set(data[0]) == {"title", "category"}
+
+def test_category_routes_have_query_budgets(route_budgets):
+    """Every category route declares a query budget, enforced on each request by the query guard"""
+    budgets = route_budgets("/categories")
+    assert budgets and None not in budgets.values()
+    # Current user, categories with counts in one grouped statement
+    assert budgets["GET /categories/"] == 2
+    # Current user, category, its tasks
+    assert budgets["GET /categories/{category_id}/tasks"] == 3
@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta, UTC
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.crud.user import create_user
+from app.schemas.user import UserCreate
+from app.models.task import Task
+from app.models.reminder import ReminderOutbox
+from app.models.tombstone import Tombstone
+from app.workers.celery_app import celery_app, check_overdue_shard, fan_out_reminders, purge_sync_tombstones
+
+
+@pytest.mark.asyncio
+async def test_sharded_reminders_run_eagerly(db_session: AsyncSession, database_url: str, monkeypatch):
+    """Test that shards together queue every overdue task exactly once, without a broker"""
+    monkeypatch.setitem(celery_app.conf, "task_always_eager", True)
+    monkeypatch.setattr(settings, "database_url", database_url)
+
+    earlier = datetime.now(UTC) - timedelta(hours=2)
+    tasks = []
+    for i in range(4):
+        user = await create_user(db_session, UserCreate(email=f"shard{i}@example.com", password="testpassword"))
+        task = Task(title=f"Overdue {i}", due_date=earlier, created_by_user_id=user.id)
+        task.created_at = task.updated_at = earlier
+        tasks.append(task)
+    db_session.add_all(tasks)
+    await db_session.commit()
+
+    # Eager tasks call asyncio.run, so run them off the test's event loop
+    assert await asyncio.to_thread(lambda: fan_out_reminders.delay(3).get()) == 3
+    queued = await db_session.execute(
+        select(ReminderOutbox.task_id, func.count())
+        .where(ReminderOutbox.task_id.in_([task.id for task in tasks]))
+        .group_by(ReminderOutbox.task_id)
+    )
+    assert sorted(queued.all()) == sorted((task.id, 1) for task in tasks)
+
+    # Each shard advanced its own watermark
+    assert await asyncio.to_thread(lambda: check_overdue_shard.delay(0, 3).get()) == 0
+
+
+@pytest.mark.asyncio
+async def test_beat_purges_expired_tombstones(db_session: AsyncSession, database_url: str, monkeypatch):
+    """Test that the scheduled purge deletes tombstones older than the sync retention"""
+    monkeypatch.setitem(celery_app.conf, "task_always_eager", True)
+    monkeypatch.setattr(settings, "database_url", database_url)
+    user = await create_user(db_session, UserCreate(email="beatpurge@example.com", password="testpassword"))
+    expired = datetime.now(UTC) - timedelta(days=settings.sync_tombstone_retention_days + 1)
+    db_session.add(Tombstone(entity_type="category", entity_id=1, created_by_user_id=user.id, created_at=expired))
+    await db_session.commit()
+
+    assert "purge-tombstones" in celery_app.conf.beat_schedule
+    assert await asyncio.to_thread(lambda: purge_sync_tombstones.delay().get()) >= 1
+    remaining = await db_session.scalar(
+        select(func.count()).select_from(Tombstone).where(Tombstone.created_by_user_id == user.id)
+    )
+    assert remaining == 0
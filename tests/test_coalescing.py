@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from fastapi import Response
+from httpx import AsyncClient
+
+from app.core.coalescing import COALESCED_REQUESTS, SingleFlight
+from app.routers import tasks as tasks_router
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_reads_compute_once():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return Response(content=b"[1]", media_type="application/json")
+
+    results = await asyncio.gather(*(flight.run(1, "key", compute) for _ in range(5)))
+    assert len(calls) == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert {response.body for response, _ in results} == {b"[1]"}
+
+    # Another user, or the same key after a write, computes again
+    first = asyncio.ensure_future(flight.run(1, "key", compute))
+    await asyncio.sleep(0)
+    flight.invalidate(1)
+    (_, shared_after_write), (_, shared_other_user), _ = await asyncio.gather(
+        flight.run(1, "key", compute), flight.run(2, "key", compute), first
+    )
+    assert not shared_after_write and not shared_other_user
+    assert len(calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_failures_are_shared_and_not_cached():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad fieldset")
+
+    results = await asyncio.gather(flight.run(1, "key", fail), flight.run(1, "key", fail), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_task_list_is_coalesced_until_a_write(client: AsyncClient, user_token, monkeypatch):
+    token = await user_token("coalesce@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    calls = []
+    get_tasks = tasks_router.get_tasks
+
+    async def slow_get_tasks(**kwargs):
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return await get_tasks(**kwargs)
+
+    monkeypatch.setattr(tasks_router, "get_tasks", slow_get_tasks)
+    shared_before = COALESCED_REQUESTS.labels("/tasks/", "shared")._value.get()
+
+    # Same parameters in a different order are the same read
+    responses = await asyncio.gather(
+        client.get("/tasks/?skip=0&limit=10", headers=headers),
+        client.get("/tasks/?limit=10&skip=0", headers=headers),
+        client.get("/tasks/?skip=0&limit=10", headers=headers),
+    )
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert len({response.content for response in responses}) == 1
+    assert len(calls) == 1
+    assert COALESCED_REQUESTS.labels("/tasks/", "shared")._value.get() - shared_before == 2
+
+    # A read in flight during a write doesn't answer reads sent after it
+    in_flight = asyncio.ensure_future(client.get("/tasks/", headers=headers))
+    await asyncio.sleep(0.01)
+    created = await client.post("/tasks/", json={"title": "Fresh"}, headers=headers)
+    assert created.status_code == 201
+    after_write = await client.get("/tasks/", headers=headers)
+    await in_flight
+    assert [task["title"] for task in after_write.json()] == ["Fresh"]
+    assert len(calls) == 3
@@ -0,0 +1,149 @@
+import asyncio
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.user import create_user
+from app.schemas.user import UserCreate
+from app.core.security import create_access_token
+from app.core import events as events_module
+from app.core.events import EventBroker, RedisEventBroker, broker
+
+
+@pytest.mark.asyncio
+async def test_broker_resume_from_last_event_id():
+    events = EventBroker(queue_size=10, history_size=3)
+    for i in range(4):
+        await events.publish(1, "task.created", {"id": i})
+    first_kept = events._history[1].events[0].id
+
+    # Resuming inside the history window replays only newer events
+    subscription = events.subscribe(1, last_event_id=first_kept)
+    assert [subscription.queue.get_nowait().data["id"] for _ in range(2)] == [2, 3]
+    assert not subscription.reset
+
+    # Resuming from before the evicted events forces a resync
+    assert events.subscribe(1, last_event_id=events._history[1].evicted_id - 1).reset
+    # So does an id issued before this process started
+    assert events.subscribe(1, last_event_id=1).reset
+
+
+@pytest.mark.asyncio
+async def test_broker_slow_subscriber_is_bounded():
+    events = EventBroker(queue_size=2, history_size=10)
+    subscription = events.subscribe(1)
+    other_user = events.subscribe(2)
+    for i in range(5):
+        await events.publish(1, "task.updated", {"id": i})
+
+    assert subscription.queue.qsize() == 2
+    assert subscription.reset
+    assert other_user.queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_broker_history_is_capped_by_user():
+    events = EventBroker(queue_size=10, history_size=10, history_users=2)
+    listening = events.subscribe(1)
+    for user_id in (1, 2):
+        await events.publish(user_id, "task.created", {"id": user_id})
+    last_of_2 = events._history[2].events[-1].id
+    await events.publish(3, "task.created", {"id": 3})
+
+    # User 1 is the least recently active but still has a subscriber
+    assert list(events._history) == [1, 3]
+    assert [listening.queue.get_nowait().data["id"]] == [1]
+    # A client of the dropped user can't resume from before what was dropped
+    assert events.subscribe(2, last_event_id=last_of_2 - 1).reset
+    assert not events.subscribe(2, last_event_id=last_of_2).reset
+
+
+class FakePubSub:
+    """Redis pub/sub that delivers ``messages`` and then loses the connection"""
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def subscribe(self, channel):
+        pass
+
+    async def listen(self):
+        for message in self.messages:
+            yield message
+        raise ConnectionError("Connection reset by peer")
+
+    async def reset(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self, subscriptions):
+        self.subscriptions = subscriptions
+
+    def pubsub(self):
+        return self.subscriptions.pop(0)
+
+    async def get(self, key):
+        return b"0"
+
+
+@pytest.mark.asyncio
+async def test_redis_listener_resubscribes_and_resets_subscribers(monkeypatch):
+    monkeypatch.setattr(events_module, "RECONNECT_DELAY", 0)
+    message = {"type": "message", "data": b'{"id": 1, "user_id": 1, "type": "task.created", "data": {}}'}
+    resubscribed = asyncio.Event()
+
+    class LastPubSub(FakePubSub):
+        async def listen(self):
+            resubscribed.set()
+            await asyncio.Event().wait()
+            yield
+
+    events = RedisEventBroker("redis://unused", queue_size=10, history_size=10)
+    events._redis = FakeRedis([FakePubSub([message]), LastPubSub([])])
+    subscription = events.subscribe(1)
+    await events.start()
+    try:
+        await asyncio.wait_for(resubscribed.wait(), 1)
+        # The event before the disconnect arrived, then the stream was told to resync
+        assert subscription.queue.get_nowait().id == 1
+        assert subscription.reset
+    finally:
+        await events.stop()
+
+
+@pytest.mark.asyncio
+async def test_task_writes_publish_events(client: AsyncClient, db_session: AsyncSession):
+    """Test that task create, update and delete are published to the user's subscribers"""
+    user = await create_user(db_session, UserCreate(email="events@example.com", password="testpassword"))
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': user.email})}"}
+    subscription = broker.subscribe(user.id)
+    try:
+        response = await client.post("/tasks/", json={"title": "Evented"}, headers=headers)
+        task_id = response.json()["id"]
+        await client.patch(f"/tasks/{task_id}", json={"is_completed": True}, headers=headers)
+        await client.delete(f"/tasks/{task_id}", headers=headers)
+
+        events = [subscription.queue.get_nowait() for _ in range(3)]
+        assert [event.type for event in events] == ["task.created", "task.updated", "task.deleted"]
+        assert all(event.data["id"] == task_id for event in events)
+        assert events[1].data["is_completed"] is True
+        assert events[0].id < events[1].id < events[2].id
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@pytest.mark.asyncio
+async def test_stream_events_reset_on_stale_last_event_id(client: AsyncClient, db_session: AsyncSession):
+    """Test that a client resuming from an unknown event is told to resync"""
+    user = await create_user(db_session, UserCreate(email="eventstream@example.com", password="testpassword"))
+    headers = {
+        "Authorization": f"Bearer {create_access_token(data={'sub': user.email})}",
+        "Last-Event-ID": "1",
+    }
+
+    response = await client.get("/events", headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: reset" in response.text
@@ -0,0 +1,111 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.config import settings
+from app.core.group_commit import GroupCommitter
+from app.crud.task import create_task
+from app.database import Base
+from app.models import Category, Task, User
+from app.schemas.task import TaskCreate
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    # Its own pooled engine, so the committer writes on a connection of its own
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/group.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User).values(id=1, email="group@example.com", hashed_password="-", is_active=True))
+    yield engine
+    await engine.dispose()
+
+
+def count_commits(engine) -> list:
+    commits = []
+
+    @event.listens_for(engine.sync_engine, "commit")
+    def commit(conn):
+        commits.append(conn)
+    return commits
+
+
+@pytest.mark.asyncio
+async def test_concurrent_inserts_share_one_commit(engine):
+    committer = GroupCommitter(async_sessionmaker(engine, expire_on_commit=False), Task, max_rows=100, max_delay=0.01)
+    commits = count_commits(engine)
+    tasks = await asyncio.gather(*(
+        committer.insert({"title": f"Task {i}", "created_by_user_id": 1}) for i in range(5)
+    ))
+    # Each caller gets its own row back
+    assert [task.title for task in tasks] == [f"Task {i}" for i in range(5)]
+    assert len({task.id for task in tasks}) == 5
+    # One multi-row INSERT on PostgreSQL; SQLite can't order RETURNING rows, so
+    # SQLAlchemy sends them one by one, still in the one transaction
+    assert len(commits) == 1
+
+
+@pytest.mark.asyncio
+async def test_a_full_batch_is_written_without_waiting(engine):
+    committer = GroupCommitter(async_sessionmaker(engine, expire_on_commit=False), Task, max_rows=2, max_delay=60)
+    tasks = await asyncio.wait_for(asyncio.gather(
+        committer.insert({"title": "A", "created_by_user_id": 1}),
+        committer.insert({"title": "B", "created_by_user_id": 1}),
+    ), timeout=5)
+    assert [task.title for task in tasks] == ["A", "B"]
+
+
+@pytest.mark.asyncio
+async def test_a_bad_row_only_fails_itself(engine):
+    committer = GroupCommitter(async_sessionmaker(engine, expire_on_commit=False), Task, max_rows=100, max_delay=0.01)
+    results = await asyncio.gather(
+        committer.insert({"title": "Good 1", "created_by_user_id": 1}),
+        committer.insert({"title": None, "created_by_user_id": 1}),
+        committer.insert({"title": "Good 2", "created_by_user_id": 1}),
+        return_exceptions=True,
+    )
+    assert isinstance(results[1], IntegrityError)
+    assert [results[0].title, results[2].title] == ["Good 1", "Good 2"]
+    async with engine.connect() as conn:
+        assert await conn.scalar(select(func.count()).select_from(Task)) == 2
+
+
+@pytest.mark.asyncio
+async def test_create_task_uses_group_commit(client: AsyncClient, user_token, monkeypatch):
+    token = await user_token("group_commit@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    monkeypatch.setattr(settings, "group_commit_enabled", True)
+
+    responses = await asyncio.gather(*(
+        client.post("/tasks/", json={"title": f"Grouped {i}"}, headers=headers) for i in range(3)
+    ))
+    assert [response.status_code for response in responses] == [201, 201, 201]
+    assert sorted(response.json()["title"] for response in responses) == ["Grouped 0", "Grouped 1", "Grouped 2"]
+
+    listed = await client.get("/tasks/", headers=headers)
+    assert sorted(task["title"] for task in listed.json()) == ["Grouped 0", "Grouped 1", "Grouped 2"]
+
+
+@pytest.mark.asyncio
+async def test_create_task_leaves_the_committer_a_connection(tmp_path, monkeypatch):
+    """Test that a request holding the only pooled connection doesn't starve the committer"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/one.db", pool_size=1, max_overflow=0, pool_timeout=1)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(User).values(id=1, email="one@example.com", hashed_password="-", is_active=True))
+            await conn.execute(insert(Category).values(id=1, name="Work", created_by_user_id=1))
+        monkeypatch.setattr(settings, "group_commit_enabled", True)
+
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            # As get_current_user does, before the route runs
+            user = await db.get(User, 1)
+            task = await asyncio.wait_for(create_task(db, TaskCreate(title="Pooled", category_id=1), user.id), 5)
+        assert task.title == "Pooled"
+        assert task.category.name == "Work"
+    finally:
+        await engine.dispose()
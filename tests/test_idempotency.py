@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from fastapi import FastAPI, Response
+from httpx import AsyncClient, ASGITransport
+
+from app.config import settings
+from app.core.idempotency import IdempotencyMiddleware, IdempotencyStore
+from app.core.security import create_access_token
+from app.routers import tasks as tasks_router
+
+
+@pytest.mark.asyncio
+async def test_retry_replays_the_stored_response(client: AsyncClient, user_token):
+    token = await user_token("idempotent@example.com")
+    headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "create-1"}
+
+    first = await client.post("/tasks/", json={"title": "Once"}, headers=headers)
+    retry = await client.post("/tasks/", json={"title": "Once"}, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+
+    listed = await client.get("/tasks/", headers={"Authorization": f"Bearer {token}"})
+    assert [task["title"] for task in listed.json()] == ["Once"]
+
+    # The same key for a different request is refused
+    other = await client.post("/tasks/", json={"title": "Twice"}, headers=headers)
+    assert other.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_wait_for_the_first(client: AsyncClient, user_token, monkeypatch):
+    token = await user_token("idempotent_race@example.com")
+    headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "create-race"}
+    calls = []
+    create_task = tasks_router.create_task
+
+    async def slow_create_task(**kwargs):
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return await create_task(**kwargs)
+
+    monkeypatch.setattr(tasks_router, "create_task", slow_create_task)
+    responses = await asyncio.gather(*(
+        client.post("/tasks/", json={"title": "Raced"}, headers=headers) for _ in range(3)
+    ))
+    assert [response.status_code for response in responses] == [201, 201, 201]
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_server_errors_are_not_stored_and_slow_duplicates_conflict(monkeypatch):
+    inner = FastAPI()
+    attempts = []
+    release = asyncio.Event()
+
+    @inner.post("/flaky")
+    async def flaky():
+        attempts.append(1)
+        return Response(status_code=503 if len(attempts) == 1 else 201)
+
+    @inner.post("/slow")
+    async def slow():
+        await release.wait()
+        return Response(status_code=201)
+
+    app = IdempotencyMiddleware(inner, IdempotencyStore(ttl=60, lock_ttl=60))
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': 'flaky@example.com'})}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        statuses = [
+            (await client.post("/flaky", headers={**headers, "Idempotency-Key": "k"})).status_code for _ in range(3)
+        ]
+        assert statuses == [503, 201, 201]
+        assert len(attempts) == 2
+
+        # Without a token there is no one to scope the key to; it's ignored
+        await client.post("/flaky", headers={"Idempotency-Key": "k"})
+        assert len(attempts) == 3
+
+        monkeypatch.setattr(settings, "idempotency_wait_seconds", 0)
+        first = asyncio.ensure_future(client.post("/slow", headers={**headers, "Idempotency-Key": "s"}))
+        await asyncio.sleep(0.01)
+        duplicate = await client.post("/slow", headers={**headers, "Idempotency-Key": "s"})
+        assert duplicate.status_code == 409
+        release.set()
+        assert (await first).status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_memory_store_is_bounded():
+    store = IdempotencyStore(ttl=60, lock_ttl=60, max_entries=2)
+    for key in ("a", "b", "c"):
+        assert await store.claim(key, "fingerprint") is None
+        await store.complete(key, {"fingerprint": "fingerprint", "status": 201, "headers": [], "body": ""})
+    # The oldest was evicted; a retry of it runs again
+    assert list(store._records) == ["b", "c"]
+    assert await store.claim("a", "fingerprint") is None
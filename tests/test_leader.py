@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.workers.leader import AdvisoryLock, FileLock, InMemoryLock, LeaderElection
+
+
+def _worker(running: list, name: str):
+    async def work(stop: asyncio.Event):
+        running.append(name)
+        try:
+            await stop.wait()
+        finally:
+            running.remove(name)
+    return work
+
+
+@pytest.mark.asyncio
+async def test_file_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "leader.lock")
+    first, second = FileLock(path), FileLock(path)
+
+    assert await first.acquire()
+    assert not await second.acquire()
+    await first.release()
+    assert await second.acquire()
+    await second.release()
+
+
+@pytest.mark.asyncio
+async def test_only_leader_runs_and_standby_takes_over():
+    """Test that one of two replicas does the work and the other takes over after it stops"""
+    running = []
+    first = LeaderElection(InMemoryLock("reminders-test"), _worker(running, "first"), interval=0.05)
+    second = LeaderElection(InMemoryLock("reminders-test"), _worker(running, "second"), interval=0.05)
+    await first.start()
+    await asyncio.sleep(0.01)
+    await second.start()
+    await asyncio.sleep(0.2)
+    assert running == ["first"]
+    assert first.is_leader and not second.is_leader
+
+    # Graceful shutdown: the work sees the stop event and exits, then the lock is released
+    await first.stop()
+    assert not first.is_leader
+    await asyncio.sleep(0.2)
+    assert running == ["second"]
+    await second.stop()
+    assert running == []
+
+
+@pytest.mark.asyncio
+async def test_leader_steps_down_when_lock_is_lost():
+    """Test that the work is cancelled as soon as the leader finds its lock gone"""
+    class FlakyLock(InMemoryLock):
+        held = True
+
+        async def acquire(self):
+            return self.held and await super().acquire()
+
+        async def still_held(self):
+            return self.held
+
+    running = []
+    lock = FlakyLock("reminders-flaky")
+    election = LeaderElection(lock, _worker(running, "leader"), interval=0.05)
+    await election.start()
+    await asyncio.sleep(0.1)
+    assert running == ["leader"]
+
+    lock.held = False
+    await asyncio.sleep(0.1)
+    assert not election.is_leader
+    assert running == []
+    await election.stop()
+    assert running == []
+
+
+@pytest.mark.asyncio
+async def test_cancelled_work_is_stepped_down_from():
+    """Test that work cancelled from elsewhere ends the term instead of the election"""
+    started = []
+
+    async def work(stop: asyncio.Event):
+        started.append(1)
+        if len(started) == 1:
+            raise asyncio.CancelledError
+        await stop.wait()
+
+    election = LeaderElection(InMemoryLock("reminders-cancelled"), work, interval=0.05)
+    await election.start()
+    await asyncio.sleep(0.2)
+    # The election survived and a new term started
+    assert len(started) == 2 and election.is_leader
+    await election.stop()
+    assert not election.is_leader
+
+
+@pytest.mark.asyncio
+async def test_advisory_lock_stays_out_of_the_app_pool(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/app.db", pool_size=1, max_overflow=0)
+    lock = AdvisoryLock(engine, "reminders")
+    assert lock.engine is not engine
+    assert isinstance(lock.engine.pool, NullPool)
+    assert lock.engine.url == engine.url
+    await engine.dispose()
@@ -0,0 +1,66 @@
+import os
+import pytest
+import subprocess
+import sys
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.user import create_user
+from app.schemas.user import UserCreate
+from app.config import settings
+from app.core.security import create_access_token
+
+
+@pytest.mark.asyncio
+async def test_server_timing_reports_queries(client: AsyncClient, db_session: AsyncSession):
+    """Test that each response carries its query count and DB/app time split"""
+    user = await create_user(db_session, UserCreate(email="metrics@example.com", password="testpassword"))
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': user.email})}"}
+    await client.post("/tasks/", json={"title": "Timed"}, headers=headers)
+
+    response = await client.get("/tasks/", headers=headers)
+
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    # Current user, then tasks with their categories
+    assert 'desc="2 queries"' in timing
+    assert "db;dur=" in timing and "app;dur=" in timing and "total;dur=" in timing
+
+
+@pytest.mark.asyncio
+async def test_metrics_are_labeled_by_route_template(client: AsyncClient, db_session: AsyncSession, monkeypatch):
+    """Test that /metrics exposes histograms labeled by route template, not by raw path"""
+    user = await create_user(db_session, UserCreate(email="metricsroute@example.com", password="testpassword"))
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': user.email})}"}
+    response = await client.post("/tasks/", json={"title": "Labeled"}, headers=headers)
+    await client.get(f"/tasks/{response.json()['id']}", headers=headers)
+
+    monkeypatch.setattr(settings, "metrics_token", "scrape-secret")
+    response = await client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+
+    assert response.status_code == 200
+    assert 'http_request_queries_count{method="GET",route="/tasks/{task_id}"}' in response.text
+    assert 'http_request_db_duration_seconds_bucket{le="0.005",method="POST",route="/tasks/"}' in response.text
+
+
+@pytest.mark.asyncio
+async def test_metrics_need_the_metrics_token(client: AsyncClient, monkeypatch):
+    """Test that /metrics is hidden without METRICS_TOKEN and refuses other tokens"""
+    monkeypatch.setattr(settings, "metrics_token", None)
+    assert (await client.get("/metrics")).status_code == 404
+
+    monkeypatch.setattr(settings, "metrics_token", "scrape-secret")
+    assert (await client.get("/metrics")).status_code == 401
+    assert (await client.get("/metrics", headers={"Authorization": "Bearer wrong"})).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_metrics_merge_every_worker(client: AsyncClient, monkeypatch, tmp_path):
+    """Test that with PROMETHEUS_MULTIPROC_DIR set (app.serve --workers N) samples of other workers are served"""
+    worker = "from prometheus_client import Counter; Counter('worker_requests', 'Requests').inc(3)"
+    subprocess.run([sys.executable, "-c", worker], env={**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}, check=True)
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "metrics_token", "scrape-secret")
+
+    response = await client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert "worker_requests_total 3.0" in response.text
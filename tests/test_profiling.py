@@ -0,0 +1,52 @@
+import os
+import pstats
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.config import settings
+from app.core.profiling import ProfilingMiddleware
+from app.main import app
+
+
+@pytest.fixture
+def profiled_client(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "profiling_token", "let-me-profile")
+    monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+    return AsyncClient(transport=ASGITransport(app=ProfilingMiddleware(app)), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_profile_on_demand(profiled_client: AsyncClient, tmp_path):
+    """Test that only the configured token turns a request into its profile report"""
+    async with profiled_client as client:
+        response = await client.get("/health")
+        assert response.json() == {"status": "healthy"}
+        response = await client.get("/health", headers={"X-Profile": "wrong"})
+        assert response.json() == {"status": "healthy"}
+
+        response = await client.get("/health", headers={"X-Profile": "let-me-profile"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert response.headers["x-profile-route"] == "/health"
+        assert response.text.startswith("GET /health -> 200 in ")
+        assert "function calls" in response.text and "Ordered by: cumulative time" in response.text
+
+        response = await client.get(
+            "/health", params={"profile": "let-me-profile"}, headers={"X-Profile-Format": "pstats"}
+        )
+        path = tmp_path / "from-response.prof"
+        path.write_bytes(response.content)
+        assert any(func[2] == "health_check" for func in pstats.Stats(str(path)).stats)
+        # Also kept in PROFILING_DIR
+        assert os.path.exists(response.headers["x-profile-path"])
+
+
+@pytest.mark.asyncio
+async def test_sampled_profiles_are_saved(profiled_client: AsyncClient, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "profiling_sample_rate", 1.0)
+    async with profiled_client as client:
+        response = await client.get("/health")
+    assert response.json() == {"status": "healthy"}
+    [name] = os.listdir(tmp_path)
+    assert "-GET-health-" in name and name.endswith(".prof")
+    pstats.Stats(str(tmp_path / name))
@@ -0,0 +1,43 @@
+import logging
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.query_guard import QueryBudgetExceeded, QueryBudgetWarning, track_queries
+from app.models.user import User
+
+
+async def _n_plus_one(db_session: AsyncSession, count: int) -> None:
+    for user_id in range(count):
+        await db_session.execute(select(User).where(User.id == user_id))
+
+
+@pytest.mark.asyncio
+async def test_repeated_statement_is_flagged(db_session: AsyncSession):
+    with pytest.raises(QueryBudgetExceeded, match="N\\+1"):
+        with track_queries("reminder tick"):
+            await _n_plus_one(db_session, settings.query_guard_repeat_threshold)
+
+
+@pytest.mark.asyncio
+async def test_budget_and_modes(db_session: AsyncSession, monkeypatch, caplog):
+    """Test that a unit of work over budget raises, warns or logs depending on the mode"""
+    with track_queries("within budget", budget=2) as stats:
+        await _n_plus_one(db_session, 2)
+    assert stats.queries == 2
+
+    with pytest.raises(QueryBudgetExceeded, match="ran 3 queries, budget is 2"):
+        with track_queries("over budget", budget=2):
+            await _n_plus_one(db_session, 3)
+
+    monkeypatch.setattr(settings, "query_guard_mode", "warn")
+    with pytest.warns(QueryBudgetWarning):
+        with track_queries("over budget", budget=2):
+            await _n_plus_one(db_session, 3)
+
+    monkeypatch.setattr(settings, "query_guard_mode", "log")
+    with caplog.at_level(logging.WARNING, logger="app.core.query_guard"):
+        with track_queries("over budget", budget=2):
+            await _n_plus_one(db_session, 3)
+    assert "over budget ran 3 queries" in caplog.text
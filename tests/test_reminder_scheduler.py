@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta, UTC
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.crud.user import create_user
+from app.schemas.user import UserCreate
+from app.core.security import create_access_token
+from app.core.events import EventBroker
+from app.models.task import Task
+from app.workers.reminder_scheduler import ReminderScheduler, FakeClock
+from app.workers.reminder_sinks import ReminderSink
+
+
+class RecordingSink(ReminderSink):
+    """Records reminders for one user (the outbox may hold other tests' reminders)"""
+
+    def __init__(self, owner_email: str):
+        self.owner_email = owner_email
+        self.sent = []
+        self.queue = asyncio.Queue()
+
+    async def send(self, reminder):
+        if reminder.owner_email != self.owner_email:
+            return
+        self.sent.append((reminder.task_id, reminder.owner_email))
+        self.queue.put_nowait(reminder.task_id)
+
+
+async def _add_tasks(db_session: AsyncSession, user_id: int, tasks: list) -> list:
+    for task in tasks:
+        task.created_by_user_id = user_id
+    db_session.add_all(tasks)
+    await db_session.commit()
+    return tasks
+
+
+@pytest.mark.asyncio
+async def test_scheduler_wakes_at_next_due_date(db_session: AsyncSession, session_maker: async_sessionmaker):
+    """Test that the scheduler holds only the look-ahead window and fires each task when it is due"""
+    user = await create_user(db_session, UserCreate(email="scheduler@example.com", password="testpassword"))
+    start = datetime.now(UTC).replace(microsecond=0) + timedelta(days=30)
+    first, second, later, done = await _add_tasks(db_session, user.id, [
+        Task(title="First", due_date=start + timedelta(seconds=10)),
+        Task(title="Second", due_date=start + timedelta(seconds=20)),
+        Task(title="Beyond horizon", due_date=start + timedelta(hours=2)),
+        Task(title="Done", due_date=start + timedelta(seconds=5), is_completed=True),
+    ])
+    sink = RecordingSink("scheduler@example.com")
+    clock = FakeClock(start)
+    scheduler = ReminderScheduler(
+        session_maker, events=EventBroker(10, 10), clock=clock, horizon=timedelta(hours=1), sink=sink
+    )
+
+    assert await scheduler.tick() == 0
+    assert len(scheduler) == 2
+    assert scheduler.next_wakeup() == first.due_date.replace(tzinfo=UTC)
+
+    clock.advance(10)
+    assert await scheduler.tick() == 1
+    assert sink.sent == [(first.id, "scheduler@example.com")]
+    assert scheduler.next_wakeup() == second.due_date.replace(tzinfo=UTC)
+
+    # Reaching the end of the window loads the next one
+    clock.advance(3600)
+    assert await scheduler.tick() == 1
+    assert len(scheduler) == 1
+    clock.advance(3600)
+    assert await scheduler.tick() == 1
+    assert [task_id for task_id, _ in sink.sent] == [first.id, second.id, later.id]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_window_is_bounded(db_session: AsyncSession, session_maker: async_sessionmaker):
+    """Test that a window holds at most max_scheduled tasks and the rest are still reminded"""
+    user = await create_user(db_session, UserCreate(email="schedulerbound@example.com", password="testpassword"))
+    start = datetime.now(UTC).replace(microsecond=0) + timedelta(days=60)
+    tasks = await _add_tasks(db_session, user.id, [
+        Task(title=f"Same time {i}", due_date=start + timedelta(seconds=10)) for i in range(5)
+    ])
+    sink = RecordingSink("schedulerbound@example.com")
+    clock = FakeClock(start)
+    scheduler = ReminderScheduler(
+        session_maker, events=EventBroker(10, 10), clock=clock, max_scheduled=2, sink=sink
+    )
+    await scheduler.tick()
+    assert len(scheduler) == 2
+
+    clock.advance(10)
+    for _ in range(3):
+        await scheduler.tick()
+        assert len(scheduler) <= 2
+    assert sorted(task_id for task_id, _ in sink.sent) == sorted(task.id for task in tasks)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_follows_task_events(client: AsyncClient, db_session: AsyncSession, session_maker: async_sessionmaker):
+    """Test that created, completed and deleted tasks update the schedule without polling"""
+    user = await create_user(db_session, UserCreate(email="schedulerevents@example.com", password="testpassword"))
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': user.email})}"}
+    start = datetime.now(UTC).replace(microsecond=0) + timedelta(days=90)
+    sink = RecordingSink("schedulerevents@example.com")
+    clock = FakeClock(start)
+    scheduler = ReminderScheduler(session_maker, clock=clock, sink=sink)
+    await scheduler.start()
+    try:
+        created = []
+        for offset in (30, 40, 50):
+            response = await client.post(
+                "/tasks/", json={"title": f"Due in {offset}s", "due_date": (start + timedelta(seconds=offset)).isoformat()},
+                headers=headers,
+            )
+            created.append(response.json()["id"])
+        assert len(scheduler) == 3
+
+        await client.patch(f"/tasks/{created[1]}", json={"is_completed": True}, headers=headers)
+        await client.delete(f"/tasks/{created[2]}", headers=headers)
+        assert len(scheduler) == 1
+
+        clock.advance(30)
+        assert await asyncio.wait_for(sink.queue.get(), timeout=5) == created[0]
+        clock.advance(60)
+        await asyncio.sleep(0.1)
+        assert sink.queue.empty()
+    finally:
+        await scheduler.stop()
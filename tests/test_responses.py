@@ -0,0 +1,56 @@
+import msgpack
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.user import create_user
+from app.schemas.user import UserCreate
+from app.core.security import create_access_token
+from app.core.responses import prefers_msgpack
+
+
+async def create_user_and_get_headers(db_session: AsyncSession, email: str) -> dict:
+    user = await create_user(db_session, UserCreate(email=email, password="testpassword"))
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': user.email})}"}
+
+
+def test_prefers_msgpack():
+    assert prefers_msgpack("application/msgpack")
+    assert prefers_msgpack("application/json;q=0.5, application/x-msgpack")
+    assert not prefers_msgpack("application/json, application/msgpack;q=0.5")
+    assert not prefers_msgpack("*/*")
+    assert not prefers_msgpack(None)
+
+
+@pytest.mark.asyncio
+async def test_tasks_msgpack_negotiation(client: AsyncClient, db_session: AsyncSession):
+    """Test that list endpoints answer in msgpack when the client asks for it"""
+    headers = await create_user_and_get_headers(db_session, "msgpack@example.com")
+    await client.post("/tasks/", json={"title": "Packed"}, headers=headers)
+
+    response = await client.get("/tasks/", headers={**headers, "Accept": "application/msgpack"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert "Accept" in response.headers["vary"]
+    data = msgpack.unpackb(response.content)
+    assert data[0]["title"] == "Packed"
+
+
+@pytest.mark.asyncio
+async def test_tasks_gzip_above_threshold(client: AsyncClient, db_session: AsyncSession):
+    """Test that large pages are gzipped and small ones are not"""
+    headers = await create_user_and_get_headers(db_session, "gzip@example.com")
+    gzip_headers = {**headers, "Accept-Encoding": "gzip"}
+
+    small = await client.get("/tasks/", headers=gzip_headers)
+    assert small.status_code == 200
+    assert "content-encoding" not in small.headers
+
+    for i in range(20):
+        await client.post("/tasks/", json={"title": f"Task {i}", "description": "x" * 100}, headers=headers)
+
+    large = await client.get("/tasks/", headers=gzip_headers)
+    assert large.status_code == 200
+    assert large.headers["content-encoding"] == "gzip"
+    assert len(large.json()) == 20
@@ -0,0 +1,56 @@
+import pytest
+from types import SimpleNamespace
+
+from app.config import settings
+from app.database import create_app_engine
+from app.serve import _run_worker, main, multiprocess_metrics_dir, parse_args, pool_per_worker, summary
+
+
+def test_connection_budget_is_split_between_workers():
+    assert pool_per_worker(workers=8, budget=100) == (12, 0)
+    assert pool_per_worker(workers=4, budget=4) == (1, 0)
+    with pytest.raises(ValueError):
+        pool_per_worker(workers=8, budget=5)
+
+
+def test_summary_shows_the_connection_ceiling():
+    args = parse_args(["--workers", "8", "--db-connection-budget", "100", "--max-requests", "1000",
+                       "--max-requests-jitter", "100"])
+    text = summary(args, *pool_per_worker(args.workers, args.db_connection_budget), metrics_dir="/tmp/metrics")
+    assert "workers:          8 on a shared socket" in text
+    assert "at most 96 (budget 100)" in text
+    assert "after 1000-1100 requests" in text
+    assert "merged across workers from /tmp/metrics" in text
+    assert "per worker:       admission limits and queues, read coalescing" in text
+
+
+def test_several_workers_need_the_redis_event_broker(monkeypatch, capsys):
+    monkeypatch.setattr(settings, "events_backend", "memory")
+    assert main(["--workers", "2"]) == 2
+    assert "EVENTS_BACKEND=redis" in capsys.readouterr().err
+
+
+def test_workers_share_an_emptied_metrics_directory(monkeypatch, tmp_path):
+    (tmp_path / "counter_123.db").write_bytes(b"stale")
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    assert multiprocess_metrics_dir() == str(tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_engine_uses_the_worker_pool_size(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "db_pool_size", 3)
+    monkeypatch.setattr(settings, "db_max_overflow", 0)
+    engine = create_app_engine(f"sqlite+aiosqlite:///{tmp_path}/pool.db")
+    assert engine.pool.size() == 3
+    assert engine.pool._max_overflow == 0
+    await engine.dispose()
+
+
+def test_workers_get_their_own_request_limit():
+    limits = set()
+    for _ in range(20):
+        server = SimpleNamespace(config=SimpleNamespace(limit_max_requests=1000), run=lambda sockets: None)
+        _run_worker(server, jitter=100)
+        limits.add(server.config.limit_max_requests)
+    assert all(1000 <= limit <= 1100 for limit in limits) and len(limits) > 1
@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.models import Task
+from scripts.setup_test_db import generate_user, parse_args, prepare, seed_users, tasks_for_user
+
+
+def test_tasks_per_user_follow_zipf():
+    args = parse_args(["--database-url", "sqlite+aiosqlite://", "--users", "1000", "--max-tasks", "500"])
+    counts = sorted((tasks_for_user(user, args) for user in range(1, 1001)), reverse=True)
+    assert counts[:3] == [500, 250, 166]
+    assert counts[-1] == args.min_tasks
+    # Rows depend only on the seed and the user
+    assert generate_user(7, args, "hash") == generate_user(7, args, "hash")
+    assert generate_user(7, args, "hash") != generate_user(8, args, "hash")
+
+
+@pytest.mark.asyncio
+async def test_seeding_resumes_where_it_stopped(tmp_path):
+    """Test that a rerun skips seeded users, and chunking doesn't change the data"""
+    url = f"sqlite+aiosqlite:///{tmp_path}/seed.db"
+    args = parse_args(["--database-url", url, "--users", "40", "--max-tasks", "50", "--chunk-users", "7"])
+    await prepare(args)
+
+    # An interrupted run got through the first 20 users
+    first = await seed_users(1, 20, args, "hash")
+    assert first["users"] == 20 and first["skipped_users"] == 0
+    rest = await seed_users(1, 40, args, "hash")
+    assert rest["users"] == 20 and rest["skipped_users"] == 20
+    assert first["tasks"] + rest["tasks"] == sum(tasks_for_user(user, args) for user in range(1, 41))
+
+    engine = create_async_engine(url)
+    async with engine.connect() as conn:
+        per_user = dict((await conn.execute(
+            select(Task.created_by_user_id, func.count()).group_by(Task.created_by_user_id)
+        )).all())
+    await engine.dispose()
+    assert per_user == {user: tasks_for_user(user, args) for user in range(1, 41)}
@@ -0,0 +1,109 @@
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta, UTC
+from httpx import AsyncClient
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import settings
+from app.core.sharding import scatter, shard_for
+from app.database import Base, dispose_engine, shard_session_maker
+from app.models import ReminderOutbox, Task, User
+from app.workers.task_reminder import check_overdue_tasks
+
+
+@pytest_asyncio.fixture
+async def shards(tmp_path, monkeypatch):
+    """Two SQLite files as shards; the test database is the directory"""
+    urls = [f"sqlite+aiosqlite:///{tmp_path}/shard{index}.db" for index in range(2)]
+    for url in urls:
+        engine = create_async_engine(url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+    monkeypatch.setattr(settings, "shard_urls", urls)
+    monkeypatch.setattr(settings, "shard_directory", {})
+    yield urls
+    await dispose_engine()
+
+
+async def count(session_maker, query) -> int:
+    async with session_maker() as session:
+        return await session.scalar(query)
+
+
+def test_users_are_hashed_to_shards_unless_in_the_directory(monkeypatch):
+    monkeypatch.setattr(settings, "shard_urls", ["sqlite://", "sqlite://", "sqlite://"])
+    monkeypatch.setattr(settings, "shard_directory", {7: 0})
+    assert [shard_for(user_id) for user_id in (3, 4, 5)] == [0, 1, 2]
+    assert shard_for(7) == 0
+
+
+@pytest.mark.asyncio
+async def test_user_data_lives_on_the_owners_shard(client: AsyncClient, shards):
+    users = []
+    for name in ("shard_a", "shard_b"):
+        email = f"{name}@example.com"
+        registered = await client.post("/auth/register", json={"email": email, "password": "password"})
+        login = await client.post("/auth/login", json={"email": email, "password": "password"})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        users.append((registered.json()["id"], headers))
+
+    for user_id, headers in users:
+        created = await client.post("/tasks/", json={"title": f"Task of {user_id}"}, headers=headers)
+        assert created.status_code == 201
+        listed = await client.get("/tasks/", headers=headers)
+        assert [task["title"] for task in listed.json()] == [f"Task of {user_id}"]
+
+    # Consecutive ids land on different shards; each has only its owner's data
+    assert {shard_for(user_id) for user_id, _ in users} == {0, 1}
+    for user_id, _ in users:
+        home = shard_session_maker(shard_for(user_id))
+        other = shard_session_maker(1 - shard_for(user_id))
+        owned = select(func.count()).select_from(Task).where(Task.created_by_user_id == user_id)
+        assert await count(home, owned) == 1
+        assert await count(other, owned) == 0
+        assert await count(home, select(func.count()).select_from(User).where(User.id == user_id)) == 1
+
+
+@pytest.mark.asyncio
+async def test_reminder_scan_gathers_every_shard(shards):
+    due = datetime.now(UTC) - timedelta(minutes=5)
+    for index in range(2):
+        async with shard_session_maker(index)() as session:
+            await session.execute(insert(User).values(id=100 + index, email=f"r{index}@example.com", hashed_password="-"))
+            await session.execute(insert(Task).values(title="Overdue", due_date=due, created_by_user_id=100 + index))
+            await session.commit()
+
+    assert await scatter(check_overdue_tasks) == [1, 1]
+    for index in range(2):
+        assert await count(shard_session_maker(index), select(func.count()).select_from(ReminderOutbox)) == 1
+
+
+@pytest.mark.asyncio
+async def test_registration_is_undone_when_the_shard_is_unreachable(client: AsyncClient, tmp_path, monkeypatch):
+    credentials = {"email": "unreachable_shard@example.com", "password": "password"}
+    monkeypatch.setattr(settings, "shard_directory", {})
+    monkeypatch.setattr(settings, "shard_urls", [f"sqlite+aiosqlite:///{tmp_path}/missing/dir/shard.db"])
+    try:
+        failed = await client.post("/auth/register", json=credentials)
+        assert failed.status_code == 503
+        login = await client.post("/auth/login", json=credentials)
+        assert login.status_code == 401
+    finally:
+        await dispose_engine()
+
+    # Once the shard is back, registering again works and the copy is in place
+    url = f"sqlite+aiosqlite:///{tmp_path}/shard.db"
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+    monkeypatch.setattr(settings, "shard_urls", [url])
+    try:
+        registered = await client.post("/auth/register", json=credentials)
+        assert registered.status_code == 201
+        user_id = registered.json()["id"]
+        assert await count(shard_session_maker(0), select(func.count()).select_from(User).where(User.id == user_id)) == 1
+    finally:
+        await dispose_engine()
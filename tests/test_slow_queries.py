@@ -0,0 +1,98 @@
+import logging
+import pytest
+from types import SimpleNamespace
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.metrics import RequestStats, _request_stats
+from app.core.slow_queries import SlowQueryLog, parameter_shape, safe_to_analyze
+from app.database import Base, instrument_engine
+from app.models import Task, User
+
+
+def test_parameter_shape_has_no_values():
+    assert parameter_shape((7, "secret@example.com", None)) == "(int, str, NoneType)"
+    assert parameter_shape({"user_id": 7}) == "{user_id: int}"
+    assert parameter_shape([(1, "a"), (2, "b")], executemany=True) == "2 x (int, str)"
+
+
+@pytest.mark.asyncio
+async def test_slow_selects_are_logged_and_explained_once(tmp_path, caplog):
+    """Test that slow statements are logged with their request and one plan is kept per fingerprint"""
+    # Its own file and pool, so the plan is captured on a real second connection
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/slow.db", poolclass=NullPool)
+    slow_query_log = SlowQueryLog(engine, threshold=0, sample_rate=1, explain_interval=60)
+    instrument_engine(engine, slow_query_log)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User).values(id=7, email="slow@example.com", hashed_password="x"))
+
+    scope = {"method": "GET", "route": SimpleNamespace(path="/tasks/"), "state": {"user_id": 7}}
+    token = _request_stats.set(RequestStats(scope=scope))
+    try:
+        with caplog.at_level(logging.WARNING, logger="app.core.slow_queries"):
+            async with engine.connect() as conn:
+                for _ in range(3):
+                    await conn.execute(select(Task).where(Task.created_by_user_id == 7))
+            await slow_query_log.drain()
+    finally:
+        _request_stats.reset(token)
+    await engine.dispose()
+
+    slow = [r.message for r in caplog.records if "route=GET /tasks/ user=7 params=(int)" in r.message]
+    assert len(slow) == 3
+    assert "FROM tasks WHERE tasks.created_by_user_id = ?" in slow[0]
+    # The plan capture's own EXPLAIN isn't logged as a slow query
+    assert not any("EXPLAIN" in r.message for r in caplog.records if r.message.startswith("Slow query"))
+
+    # Same fingerprint three times: a single plan capture
+    assert len(slow_query_log.plans) == 1
+    assert sum(r.message.startswith("Plan of slow query") for r in caplog.records) == 1
+    plan = next(iter(slow_query_log.plans.values()))
+    assert "ix_tasks_user_updated_at" in plan
+
+
+def test_side_effecting_selects_are_not_analyzed():
+    assert safe_to_analyze("SELECT count(*), max(tasks.due_date) FROM tasks WHERE tasks.id IN (SELECT 1)")
+    assert not safe_to_analyze("SELECT reminder_outbox.id FROM reminder_outbox LIMIT $1 FOR UPDATE SKIP LOCKED")
+    assert not safe_to_analyze("SELECT tasks.id FROM tasks FOR NO KEY UPDATE")
+    assert not safe_to_analyze("SELECT pg_try_advisory_lock($1)")
+    assert not safe_to_analyze("SELECT nextval('tasks_id_seq')")
+
+
+class RecordingConnection:
+    """Stands in for a Postgres connection; records what the plan capture runs"""
+
+    def __init__(self, executed):
+        self.executed = executed
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def exec_driver_sql(self, statement, parameters):
+        self.executed.append(statement)
+        return SimpleNamespace(fetchall=lambda: [("Seq Scan on reminder_outbox",)])
+
+    async def rollback(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_locking_select_is_planned_without_running_it():
+    """Test that a slow FOR UPDATE isn't executed again by EXPLAIN ANALYZE"""
+    executed = []
+    engine = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"), connect=lambda: RecordingConnection(executed))
+    slow_query_log = SlowQueryLog(engine, threshold=0, sample_rate=1, explain_interval=60)
+
+    slow_query_log.observe("SELECT id FROM reminder_outbox FOR UPDATE SKIP LOCKED", (), 1.0)
+    slow_query_log.observe("SELECT id FROM tasks WHERE id = $1", (1,), 1.0)
+    await slow_query_log.drain()
+
+    assert executed == [
+        "EXPLAIN SELECT id FROM reminder_outbox FOR UPDATE SKIP LOCKED",
+        "EXPLAIN (ANALYZE, BUFFERS) SELECT id FROM tasks WHERE id = $1",
+    ]
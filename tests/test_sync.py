@@ -0,0 +1,97 @@
+import pytest
+from datetime import datetime, timedelta, UTC
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.task import Task
+
+from app.crud.user import create_user
+from app.schemas.user import UserCreate
+from app.core.security import create_access_token
+
+
+@pytest.mark.asyncio
+async def test_delta_sync(client: AsyncClient, db_session: AsyncSession):
+    """Test full sync, then a delta with an update and a delete"""
+    user = await create_user(db_session, UserCreate(email="sync@example.com", password="testpassword"))
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': user.email})}"}
+    
+    kept = (await client.post("/tasks/", json={"title": "Kept"}, headers=headers)).json()
+    removed = (await client.post("/tasks/", json={"title": "Removed"}, headers=headers)).json()
+    
+    full = await client.get("/sync", headers=headers)
+    assert full.status_code == 200
+    data = full.json()
+    assert data["full"] is True
+    assert {task["title"] for task in data["tasks"]} == {"Kept", "Removed"}
+    assert data["deleted"] == []
+    
+    await client.patch(f"/tasks/{kept['id']}", json={"is_completed": True}, headers=headers)
+    await client.delete(f"/tasks/{removed['id']}", headers=headers)
+    
+    delta = await client.get("/sync", params={"since": data["sync_token"]}, headers=headers)
+    assert delta.status_code == 200
+    changes = delta.json()
+    assert changes["full"] is False
+    assert any(task["id"] == kept["id"] and task["is_completed"] for task in changes["tasks"])
+    assert {"entity_type": "task", "entity_id": removed["id"]} in changes["deleted"]
+    assert changes["sync_token"]
+
+
+@pytest.mark.asyncio
+async def test_delta_sync_leaves_out_unchanged_tasks(client: AsyncClient, db_session: AsyncSession):
+    """Test that a delta only has what changed after the previous sync"""
+    user = await create_user(db_session, UserCreate(email="syncdelta@example.com", password="testpassword"))
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': user.email})}"}
+    unchanged = (await client.post("/tasks/", json={"title": "Unchanged"}, headers=headers)).json()
+    edited = (await client.post("/tasks/", json={"title": "Edited"}, headers=headers)).json()
+    # Both last changed well before the first sync, beyond SYNC_LAG_SECONDS
+    await db_session.execute(
+        update(Task).where(Task.created_by_user_id == user.id).values(updated_at=datetime.now(UTC) - timedelta(hours=1))
+    )
+    await db_session.commit()
+
+    token = (await client.get("/sync", headers=headers)).json()["sync_token"]
+    await client.patch(f"/tasks/{edited['id']}", json={"title": "Edited again"}, headers=headers)
+    changes = (await client.get("/sync", params={"since": token}, headers=headers)).json()
+    assert [task["id"] for task in changes["tasks"]] == [edited["id"]]
+    assert unchanged["id"] not in {task["id"] for task in changes["tasks"]}
+
+
+@pytest.mark.asyncio
+async def test_sync_is_paged(client: AsyncClient, db_session: AsyncSession):
+    """Test that a sync larger than limit comes in pages that together hold everything once"""
+    user = await create_user(db_session, UserCreate(email="syncpages@example.com", password="testpassword"))
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': user.email})}"}
+    created = [
+        (await client.post("/tasks/", json={"title": f"Page {i}"}, headers=headers)).json()["id"] for i in range(5)
+    ]
+    category = (await client.post("/categories/", json={"name": "Paged"}, headers=headers)).json()
+
+    pages = []
+    token = None
+    while True:
+        params = {"limit": 2, **({"since": token} if token else {})}
+        page = (await client.get("/sync", params=params, headers=headers)).json()
+        pages.append(page)
+        token = page["sync_token"]
+        if not page["has_more"]:
+            break
+    assert [len(page["tasks"]) for page in pages] == [2, 2, 1]
+    assert all(page["full"] for page in pages)
+    assert [task["id"] for page in pages for task in page["tasks"]] == created
+    assert [c["id"] for page in pages for c in page["categories"]] == [category["id"]]
+
+    # The last token is an ordinary one: the next sync is a delta
+    delta = await client.get("/sync", params={"since": token}, headers=headers)
+    assert delta.json()["full"] is False
+
+
+@pytest.mark.asyncio
+async def test_sync_invalid_token(client: AsyncClient, db_session: AsyncSession):
+    user = await create_user(db_session, UserCreate(email="syncinvalid@example.com", password="testpassword"))
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': user.email})}"}
+    
+    response = await client.get("/sync", params={"since": "not-a-token"}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,176 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta, UTC
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.crud.user import create_user
+from app.crud.reminder import enqueue_reminders
+from app.schemas.user import UserCreate
+from app.models.task import Task
+from app.models.reminder import ReminderOutbox
+from app.models.tombstone import Tombstone
+from app.core.query_guard import QueryBudgetExceeded
+from app.database import dispose_engine
+from app.models.user import User
+from app.workers import task_reminder
+from app.workers.reminder_sinks import ReminderSink
+from app.workers.task_reminder import check_overdue_tasks, deliver_reminders, start_background_worker
+
+
+class RecordingSink(ReminderSink):
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.sent = []
+
+    async def send(self, reminder):
+        if self.fail:
+            raise RuntimeError("sink unavailable")
+        self.sent.append(reminder.task_id)
+
+
+async def _add_overdue_tasks(db_session: AsyncSession, email: str, tasks: list) -> list:
+    user = await create_user(db_session, UserCreate(email=email, password="testpassword"))
+    earlier = datetime.now(UTC) - timedelta(hours=2)
+    for task in tasks:
+        task.created_by_user_id = user.id
+        task.created_at = task.updated_at = earlier
+    db_session.add_all(tasks)
+    await db_session.commit()
+    return tasks
+
+
+@pytest.mark.asyncio
+async def test_reminder_scan_uses_watermark(
+    db_session: AsyncSession, session_maker: async_sessionmaker, query_counter: list
+):
+    """Test that each tick only queues tasks that became overdue since the previous one"""
+    now = datetime.now(UTC)
+    tasks = await _add_overdue_tasks(db_session, "reminder@example.com", [
+        Task(title="Overdue", due_date=now - timedelta(hours=1)),
+        Task(title="Upcoming", due_date=now + timedelta(days=1)),
+        Task(title="Done", due_date=now - timedelta(hours=1), is_completed=True),
+    ])
+
+    # The first tick queues the backlog, the next one nothing new
+    assert await check_overdue_tasks(session_maker) >= 1
+    assert await check_overdue_tasks(session_maker) == 0
+
+    # A due date edited back into the past is still caught
+    tasks[1].due_date = now - timedelta(days=2)
+    await db_session.commit()
+    # Watermark read, overdue scan, outbox insert, watermark write
+    query_counter.clear()
+    assert await check_overdue_tasks(session_maker) == 1
+    assert len(query_counter) == 4
+
+
+@pytest.mark.asyncio
+async def test_outbox_delivers_each_reminder_once(db_session: AsyncSession, session_maker: async_sessionmaker):
+    """Test that queued reminders are delivered once, retried on failure and dropped when stale"""
+    now = datetime.now(UTC)
+    overdue, flaky, completed = await _add_overdue_tasks(db_session, "outbox@example.com", [
+        Task(title="Overdue", due_date=now - timedelta(hours=1)),
+        Task(title="Flaky", due_date=now - timedelta(hours=1)),
+        Task(title="Completed later", due_date=now - timedelta(hours=1)),
+    ])
+    keys = [(task.id, task.due_date) for task in (overdue, flaky, completed)]
+    async with session_maker() as session:
+        assert await enqueue_reminders(session, keys, now) == 3
+        # Seen again by another scan: nothing new is queued
+        assert await enqueue_reminders(session, keys, now) == 0
+        await session.commit()
+
+    completed.is_completed = True
+    await db_session.commit()
+    async with session_maker() as session:
+        entry = (await session.execute(
+            select(ReminderOutbox).where(ReminderOutbox.task_id == flaky.id)
+        )).scalar_one()
+        entry.next_attempt_at = now + timedelta(minutes=5)
+        await session.commit()
+
+    sink = RecordingSink()
+    await deliver_reminders(sink, session_maker)
+    assert overdue.id in sink.sent
+    assert flaky.id not in sink.sent and completed.id not in sink.sent
+
+    # Delivered and settled rows are never handed out again
+    sink.sent.clear()
+    await deliver_reminders(sink, session_maker)
+    assert overdue.id not in sink.sent
+
+    # A failed delivery is retried later, with the attempt recorded
+    async with session_maker() as session:
+        entry = await session.get(ReminderOutbox, entry.id)
+        entry.next_attempt_at = now - timedelta(seconds=1)
+        await session.commit()
+    await deliver_reminders(RecordingSink(fail=True), session_maker)
+    async with session_maker() as session:
+        entry = await session.get(ReminderOutbox, entry.id)
+        assert entry.attempts == 1
+        assert entry.reminded_at is None
+        assert entry.last_error == "sink unavailable"
+
+
+@pytest.mark.asyncio
+async def test_reminder_ticks_stay_within_their_query_budget(
+    db_session: AsyncSession, session_maker: async_sessionmaker, monkeypatch
+):
+    """Test that the query guard covers scan and delivery batches, whatever their size"""
+    now = datetime.now(UTC)
+    await _add_overdue_tasks(db_session, "guarded@example.com", [
+        Task(title=f"Guarded {i}", due_date=now - timedelta(minutes=i + 1), is_completed=i % 5 == 0) for i in range(12)
+    ])
+    # Several batches of each; a per-row statement would be over budget and
+    # repeated, and raise here. A shard of its own starts from no watermark.
+    assert await check_overdue_tasks(session_maker, batch_size=4, shard=(0, 1)) >= 9
+    assert await deliver_reminders(RecordingSink(), session_maker, batch_size=4) >= 9
+
+    claim_reminders = task_reminder.claim_reminders
+
+    async def claim_then_load_owners(session, *args):
+        rows = await claim_reminders(session, *args)
+        for _, task, _ in rows:
+            await session.get(User, task.created_by_user_id, populate_existing=True)
+        return rows
+
+    async with session_maker() as session:
+        entries = (await session.scalars(select(ReminderOutbox))).all()
+        for entry in entries:
+            entry.reminded_at = None
+        await session.commit()
+    monkeypatch.setattr(task_reminder, "claim_reminders", claim_then_load_owners)
+    with pytest.raises(QueryBudgetExceeded, match="reminder delivery batch"):
+        await deliver_reminders(RecordingSink(), session_maker, batch_size=10)
+
+
+@pytest.mark.asyncio
+async def test_worker_purges_expired_tombstones(db_session: AsyncSession, database_url: str, monkeypatch):
+    """Test that the worker tick deletes tombstones past the sync retention, and only those"""
+    user = await create_user(db_session, UserCreate(email="purge@example.com", password="testpassword"))
+    expired = datetime.now(UTC) - timedelta(days=settings.sync_tombstone_retention_days, hours=1)
+    db_session.add_all([
+        Tombstone(entity_type="task", entity_id=1, created_by_user_id=user.id, created_at=expired),
+        Tombstone(entity_type="task", entity_id=2, created_by_user_id=user.id),
+    ])
+    await db_session.commit()
+    monkeypatch.setattr(settings, "database_url", database_url)
+
+    stop = asyncio.Event()
+    worker = asyncio.create_task(start_background_worker(stop))
+    try:
+        for _ in range(100):
+            remaining = await db_session.scalar(
+                select(func.count()).select_from(Tombstone).where(Tombstone.created_by_user_id == user.id)
+            )
+            if remaining == 1:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        stop.set()
+        await worker
+        await dispose_engine()
+    kept = await db_session.scalars(select(Tombstone.entity_id).where(Tombstone.created_by_user_id == user.id))
+    assert kept.all() == [2]
@@ -30,7 +30,7 @@ async def test_create_task(client: AsyncClient):
     assert data["is_completed"] == False
 
 @pytest.mark.asyncio
-async def test_get_tasks(client: AsyncClient):
+async def test_get_tasks(client: AsyncClient, query_counter: list):
     token = await create_user_and_get_token(client, "get_tasks@example.com")
     
     # Create a task first
@@ -41,6 +41,7 @@ async def test_get_tasks(client: AsyncClient):
     )
     
     # Get tasks
+    query_counter.clear()
     response = await client.get(
         "/tasks/",
         headers={"Authorization": f"Bearer {token}"}
@@ -49,6 +50,8 @@ async def test_get_tasks(client: AsyncClient):
     data = response.json()
     assert len(data) >= 1
     assert data[0]["title"] == "Test Task 1"
+    # One query for the current user, one for the tasks with their categories
+    assert len(query_counter) == 2
 
 @pytest.mark.asyncio
 async def test_update_task(client: AsyncClient):
@@ -186,4 +189,59 @@ async def test_create_task_invalid_data(client: AsyncClient):
         json={"description": "Task without title"},
         headers={"Authorization": f"Bearer {token}"}
     )
-    assert response.status_code == 422  # Validation error
\ No newline at end of file
+    assert response.status_code == 422  # Validation error
+
+@pytest.mark.asyncio
+async def test_get_tasks_sparse_fields(client: AsyncClient):
+    token = await create_user_and_get_token(client, "sparse@example.com")
+    
+    await client.post(
+        "/tasks/",
+        json={"title": "Sparse Task", "description": "Not returned"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    # Only the requested fields come back
+    response = await client.get(
+        "/tasks/?fields=id,title,is_completed",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data == [{"id": data[0]["id"], "title": "Sparse Task", "is_completed": False}]
+    
+    # Unknown fields are rejected
+    response = await client.get(
+        "/tasks/?fields=id,password",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 400
+
+def test_task_routes_have_query_budgets(route_budgets):
+    """Every task route declares a query budget, enforced on each request by the query guard"""
+    budgets = route_budgets("/tasks")
+    assert budgets and None not in budgets.values()
+    # Current user, then the tasks with their categories in one statement
+    assert budgets["GET /tasks/"] == 2
+    # Current user, insert, one refresh (the category is reused, not reloaded)
+    assert budgets["POST /tasks/"] <= 4
+
+@pytest.mark.asyncio
+async def test_create_and_update_task_refresh_once(client: AsyncClient, query_counter: list):
+    token = await create_user_and_get_token(client, "refresh_once@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    category = await client.post("/categories/", json={"name": "Refreshed"}, headers=headers)
+
+    query_counter.clear()
+    response = await client.post(
+        "/tasks/", json={"title": "Refreshed", "category_id": category.json()["id"]}, headers=headers
+    )
+    assert response.json()["category"]["name"] == "Refreshed"
+    # Current user, category check, insert, refresh
+    assert len(query_counter) == 4
+
+    query_counter.clear()
+    response = await client.patch(f"/tasks/{response.json()['id']}", json={"title": "Renamed"}, headers=headers)
+    assert response.json()["category"]["name"] == "Refreshed"
+    # Current user, task with category, update, refresh
+    assert len(query_counter) == 4
@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.responses import get_type_adapter
+from app.core.warmup import RESPONSE_TYPES, warmup
+from app.main import app
+
+
+@pytest.mark.asyncio
+async def test_warmup_opens_connections_and_builds_schemas(database_url, setup_database):
+    # Its own pooled engine: the shared test engine has a single static connection
+    engine = create_async_engine(database_url, pool_size=3)
+    app.openapi_schema = None
+    get_type_adapter.cache_clear()
+    try:
+        await warmup(app, engine, connections=5)
+        # Capped at the pool size, and left open in the pool
+        assert engine.pool.checkedin() == 3
+    finally:
+        await engine.dispose()
+    assert app.openapi_schema is not None
+    assert get_type_adapter.cache_info().currsize == len(RESPONSE_TYPES)
+
+
+@pytest.mark.asyncio
+async def test_warmup_survives_an_unreachable_database(tmp_path):
+    """Test that a database that can't be reached only skips the database steps"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/missing/dir/app.db")
+    app.openapi_schema = None
+    await warmup(app, engine, connections=2)
+    await engine.dispose()
+    assert app.openapi_schema is not None